@@ -0,0 +1,165 @@
+"""
+Единая точка входа: python -m src.cli <команда> (или settlement <команда>).
+Модули с SQLAlchemy, asyncpg, Rich и NumPy импортируются только внутри выбранной
+команды, поэтому --help и разбор аргументов не платят за их загрузку.
+"""
+
+import argparse
+import importlib
+
+from src.config import (
+    DATAGEN_PRESETS,
+    DATAGEN_SEED,
+    EXPORT_CHUNK_SIZE,
+    EXPORT_DIR,
+    EXPORT_FORMATS,
+    REDISTRIBUTION_MODE,
+    RESET_MODES,
+)
+
+# Бенчмарки и тесты: "модуль:функция", функция возвращает awaitable
+BENCHMARKS = {
+    "tests": "src.test.run_all_tests:run_all_tests",
+    "stress": "src.test.stress_test:main",
+    "load": "src.test.load_test:main",
+    "prepared": "src.test.prepared_test:main",
+    "spatial": "src.test.spatial_test:main",
+    "telemetry": "src.test.telemetry_test:main",
+    "startup": "src.test.startup_test:main",
+    "replica": "src.test.replica_test:main",
+    "upsert": "src.test.upsert_test:main",
+    "plans": "src.test.plans_test:main",
+    "forecast": "src.test.forecast_test:main",
+    "energy": "src.test.energy_grid_test:main",
+}
+
+
+def load(target: str):
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def run(coroutine):
+    from src.core import db
+
+    return db.run(coroutine)
+
+
+def seed(args):
+    if args.preset is None:
+        run(load("src.test.insert_test:main")())
+    else:
+        run(load("src.core.datagen:main")(args.preset, args.seed))
+
+
+def reset(args):
+    run(load("src.erase:main")(args.mode, args.snapshot, args.restore))
+
+
+def migrate(args):
+    run(load("src.core.migrations:main")(args.target, args.status))
+
+
+def bench(args):
+    options = {}
+    if args.update_baseline:
+        if args.name != "stress":
+            raise SystemExit("--update-baseline поддерживает только bench stress")
+        options["update_baseline"] = True
+    run(load(BENCHMARKS[args.name])(**options))
+
+
+def export(args):
+    run(
+        load("src.core.export:main")(
+            args.tables or None, args.dir, args.format, args.chunk_size
+        )
+    )
+
+
+def sweep(args):
+    run(load("src.core.sweeper:main")(args.watch))
+
+
+async def serve_loops():
+    """Фоновые задачи сервиса: уведомления, сводки, просрочки и перераспределение."""
+    import asyncio
+
+    from src.core.alerts import AlertConsumer
+    from src.core.redistribution import redistribution_loop
+    from src.core.rollups import refresh_loop
+    from src.core.sweeper import sweeper_loop
+
+    loops = [AlertConsumer().run(), refresh_loop(), sweeper_loop()]
+    if REDISTRIBUTION_MODE == "engine":
+        loops.append(redistribution_loop())
+    await asyncio.gather(*loops)
+
+
+def serve(args):
+    run(serve_loops())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="settlement", description="Система управления поселениями"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("seed", help="заполнить базу тестовыми данными")
+    command.add_argument(
+        "--preset",
+        choices=DATAGEN_PRESETS,
+        help="синтетический набор заданного масштаба вместо тестовых данных",
+    )
+    command.add_argument("--seed", type=int, default=DATAGEN_SEED)
+    command.set_defaults(handler=seed)
+
+    command = commands.add_parser("reset", help="очистка базы и снимки состояния")
+    command.add_argument("--mode", choices=RESET_MODES, default="truncate")
+    group = command.add_mutually_exclusive_group()
+    group.add_argument("--snapshot", metavar="NAME", help="сохранить снимок базы")
+    group.add_argument("--restore", metavar="NAME", help="восстановить базу из снимка")
+    command.set_defaults(handler=reset)
+
+    command = commands.add_parser("migrate", help="версионные миграции схемы")
+    command.add_argument("--target", type=int, help="применить миграции до версии")
+    command.add_argument(
+        "--status", action="store_true", help="только показать примененные версии"
+    )
+    command.set_defaults(handler=migrate)
+
+    command = commands.add_parser("bench", help="бенчмарки и прогон тестов")
+    command.add_argument("name", choices=BENCHMARKS)
+    command.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="stress: сохранить результаты как базовую линию для сравнения",
+    )
+    command.set_defaults(handler=bench)
+
+    command = commands.add_parser("export", help="потоковая выгрузка таблиц")
+    command.add_argument("tables", nargs="*", help="таблицы (по умолчанию все)")
+    command.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    command.add_argument("--dir", default=EXPORT_DIR)
+    command.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser("sweep", help="эскалация просроченных задач")
+    command.add_argument(
+        "--watch", action="store_true", help="обходить задачи по расписанию"
+    )
+    command.set_defaults(handler=sweep)
+
+    command = commands.add_parser("serve", help="фоновые задачи сервиса")
+    command.set_defaults(handler=serve)
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime
+
+from rich.console import Console
+
+from src.config import ALERT_COALESCE_WINDOW
+from src.core.db import dedicated_connection, raw_connection, run
+
+ALERT_CHANNEL = "settlement_alerts"
+NOTIFICATION_COLUMNS = ("type", "message", "timestamp", "status")
+
+console = Console()
+
+
+class AlertConsumer:
+    """
+    Слушает канал settlement_alerts (LISTEN) и накапливает уведомления триггеров.
+    Раз в window секунд одинаковые уведомления (тип + текст, то есть один ресурс или
+    устройство) сворачиваются в одно с числом повторов и записываются одним COPY.
+    """
+
+    def __init__(self, window: float = ALERT_COALESCE_WINDOW):
+        self.window = window
+        self.pending: Counter[tuple[str, str]] = Counter()
+        self.received = 0
+        self.written = 0
+        self._listening = asyncio.Event()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        alert = json.loads(payload)
+        self.pending[(alert["t"], alert["m"])] += 1
+        self.received += 1
+
+    async def wait_listening(self):
+        await self._listening.wait()
+
+    async def flush(self) -> int:
+        pending, self.pending = self.pending, Counter()
+        if not pending:
+            return 0
+        now = datetime.now()
+        records = [
+            (
+                alert_type,
+                message if count == 1 else f"{message} (повторов: {count})",
+                now,
+                "unread",
+            )
+            for (alert_type, message), count in pending.items()
+        ]
+        try:
+            async with raw_connection() as conn:
+                await conn.copy_records_to_table(
+                    "notifications", records=records, columns=NOTIFICATION_COLUMNS
+                )
+        except BaseException:
+            # Свернутые уведомления возвращаются в очередь и уйдут следующим flush
+            self.pending.update(pending)
+            raise
+        self.written += len(records)
+        return len(records)
+
+    async def run(self):
+        async with dedicated_connection() as conn:
+            await conn.add_listener(ALERT_CHANNEL, self._on_notify)
+            self._listening.set()
+            try:
+                while True:
+                    await asyncio.sleep(self.window)
+                    try:
+                        await self.flush()
+                    except Exception as e:
+                        # Сбой записи (таймаут пула, разрыв соединения) не останавливает
+                        # слушателя: накопленное повторится в следующем окне
+                        console.print(
+                            f"[red]✖ Уведомления не записаны ({sum(self.pending.values())} "
+                            f"в очереди): {e}[/]"
+                        )
+            finally:
+                # Уже полученные уведомления не теряются при остановке
+                await conn.remove_listener(ALERT_CHANNEL, self._on_notify)
+                await self.flush()
+
+
+async def main():
+    consumer = AlertConsumer()
+    console.print(
+        f"[bold cyan]Слушаем канал {ALERT_CHANNEL}, окно свертки {consumer.window} с[/]"
+    )
+    try:
+        await consumer.run()
+    finally:
+        console.print(
+            f"[green]✔[/] Получено уведомлений: {consumer.received}, "
+            f"записано: {consumer.written}"
+        )
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,133 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+from typing import Any, AsyncIterable, Iterable, Mapping, Sequence
+
+import asyncpg
+
+from src.config import BULK_CHUNK_SIZE
+from src.core.db import raw_connection
+
+OPERATION_COLUMNS = (
+    "resource_id",
+    "settlement_id",
+    "date",
+    "quantity",
+    "operation_type",
+)
+
+OperationRow = Sequence[Any] | Mapping[str, Any]
+
+
+@dataclass
+class CopyStats:
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _to_record(row: OperationRow) -> tuple:
+    if isinstance(row, Mapping):
+        record = tuple(row.get(column) for column in OPERATION_COLUMNS)
+    else:
+        record = tuple(row)
+        if len(record) != len(OPERATION_COLUMNS):
+            raise ValueError(
+                f"Ожидается {len(OPERATION_COLUMNS)} полей операции, получено {len(record)}"
+            )
+    if record[2] is None:
+        # COPY не применяет DEFAULT now() к явно переданному NULL
+        record = record[:2] + (datetime.now(),) + record[3:]
+    return record
+
+
+async def _chunks(rows: Iterable[OperationRow] | AsyncIterable[OperationRow], size):
+    if isinstance(rows, AsyncIterable):
+        chunk = []
+        async for row in rows:
+            chunk.append(_to_record(row))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    iterator = iter(rows)
+    while chunk := [_to_record(row) for row in islice(iterator, size)]:
+        yield chunk
+
+
+async def _apply_balance_deltas(conn: asyncpg.Connection, chunk: list[tuple]):
+    deltas = defaultdict(int)
+    for resource_id, settlement_id, _, quantity, _ in chunk:
+        if resource_id is not None and settlement_id is not None:
+            deltas[(resource_id, settlement_id)] += quantity
+    if not deltas:
+        return
+    resource_ids, settlement_ids = zip(*deltas)
+    await conn.execute(
+        """
+        INSERT INTO resource_balances (resource_id, settlement_id, quantity, updated_at)
+        SELECT resource_id, settlement_id, quantity, now()
+        FROM unnest($1::int[], $2::int[], $3::bigint[])
+            AS d(resource_id, settlement_id, quantity)
+        ON CONFLICT (resource_id, settlement_id) DO UPDATE
+        SET quantity = resource_balances.quantity + EXCLUDED.quantity,
+            updated_at = EXCLUDED.updated_at
+        """,
+        list(resource_ids),
+        list(settlement_ids),
+        list(deltas.values()),
+    )
+
+
+async def copy_resource_operations(
+    rows: Iterable[OperationRow] | AsyncIterable[OperationRow],
+    *,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    triggers: bool = True,
+    conn: asyncpg.Connection | None = None,
+) -> CopyStats:
+    """
+    Потоково загружает операции с ресурсами через COPY порциями по chunk_size строк.
+
+    Строки — кортежи в порядке OPERATION_COLUMNS или словари с этими ключами.
+    Каждая порция копируется в родительскую таблицу одной транзакцией: PostgreSQL сам
+    распределяет строки по партициям, а сортировка по дате держит подряд идущие строки
+    в одной партиции. С triggers=True срабатывают триггеры resource_operations
+    (статементные — один раз на порцию). С triggers=False триггеры отключаются на время
+    транзакции (session_replication_role = replica, без проверки внешних ключей),
+    а остатки resource_balances обновляются одной агрегированной вставкой на порцию.
+    """
+    if conn is None:
+        async with raw_connection() as conn:
+            return await copy_resource_operations(
+                rows, chunk_size=chunk_size, triggers=triggers, conn=conn
+            )
+
+    stats = CopyStats()
+    start_time = time.perf_counter()
+    try:
+        async for chunk in _chunks(rows, chunk_size):
+            chunk.sort(key=itemgetter(2))
+            async with conn.transaction():
+                if not triggers:
+                    await conn.execute("SET LOCAL session_replication_role = replica")
+                await conn.copy_records_to_table(
+                    "resource_operations", records=chunk, columns=OPERATION_COLUMNS
+                )
+                if not triggers:
+                    await _apply_balance_deltas(conn, chunk)
+            stats.rows += len(chunk)
+            stats.chunks += 1
+    finally:
+        stats.seconds = time.perf_counter() - start_time
+    return stats
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+import asyncpg
+from rich.console import Console
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import CACHE_MAXSIZE, CACHE_RECONNECT_DELAY, CACHE_TTL
+from src.core.db import dedicated_connection
+from src.core.models import Infrastructure, Resource, Settlement
+
+CACHE_CHANNEL = "reference_changed"
+
+console = Console()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    coalesced: int = 0  # Промахи, дождавшиеся чужой загрузки того же ключа
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class AsyncTTLCache:
+    """
+    Асинхронный кэш с ограничением размера (LRU) и временем жизни записей.
+    Одновременные промахи по одному ключу ждут одну загрузку (single-flight).
+    """
+
+    def __init__(self, maxsize: int = CACHE_MAXSIZE, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # Растет при каждой инвалидации: загрузка, начатая до нее, не попадет в кэш
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.stats.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили загружавшую задачу, а не эту: пробуем загрузить сами
+                if not future.cancelled():
+                    raise
+
+        self.stats.misses += 1
+        self.stats.loads += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        epoch = self._epoch
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Ожидающих может не быть: помечаем исключение полученным
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        if epoch == self._epoch:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Удаляет запись по ключу или весь кэш (key=None)."""
+        self._epoch += 1
+        self.stats.invalidations += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+# Кэши справочных таблиц; ключ таблицы совпадает с полезной нагрузкой NOTIFY
+REFERENCE_CACHES = {
+    "settlements": AsyncTTLCache(),
+    "resources": AsyncTTLCache(),
+    "infrastructure": AsyncTTLCache(),
+}
+
+
+async def _fetch_one(session: AsyncSession, model, *criteria):
+    # В кэш попадает неизменяемая строка Row, не привязанная к сессии
+    result = await session.execute(select(*model.__table__.columns).where(*criteria))
+    return result.first()
+
+
+async def settlement_by_name(session: AsyncSession, name: str):
+    return await REFERENCE_CACHES["settlements"].get(
+        ("name", name), lambda: _fetch_one(session, Settlement, Settlement.name == name)
+    )
+
+
+async def settlement_by_id(session: AsyncSession, settlement_id: int):
+    return await REFERENCE_CACHES["settlements"].get(
+        ("id", settlement_id),
+        lambda: _fetch_one(session, Settlement, Settlement.id == settlement_id),
+    )
+
+
+async def resource_by_id(session: AsyncSession, resource_id: int):
+    return await REFERENCE_CACHES["resources"].get(
+        ("id", resource_id),
+        lambda: _fetch_one(session, Resource, Resource.id == resource_id),
+    )
+
+
+async def infrastructure_by_id(session: AsyncSession, infrastructure_id: int):
+    return await REFERENCE_CACHES["infrastructure"].get(
+        ("id", infrastructure_id),
+        lambda: _fetch_one(
+            session, Infrastructure, Infrastructure.id == infrastructure_id
+        ),
+    )
+
+
+def invalidate_all() -> None:
+    for cache in REFERENCE_CACHES.values():
+        cache.invalidate()
+
+
+def cache_stats() -> dict[str, dict]:
+    return {
+        table: {**asdict(cache.stats), "size": len(cache)}
+        for table, cache in REFERENCE_CACHES.items()
+    }
+
+
+class CacheInvalidator:
+    """
+    Слушает канал reference_changed: статементные триггеры справочных таблиц
+    присылают имя измененной таблицы, и ее кэш сбрасывается целиком.
+    Пока соединение потеряно, уведомления пропускаются, поэтому после
+    переподключения сбрасываются все кэши.
+    """
+
+    def __init__(self, reconnect_delay: float = CACHE_RECONNECT_DELAY):
+        self.reconnect_delay = reconnect_delay
+        self.received = 0
+        self._listening = asyncio.Event()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.received += 1
+        cache = REFERENCE_CACHES.get(payload)
+        if cache is not None:
+            cache.invalidate()
+
+    async def wait_listening(self):
+        await self._listening.wait()
+
+    async def run(self):
+        while True:
+            try:
+                async with dedicated_connection() as conn:
+                    closed = asyncio.Event()
+                    conn.add_termination_listener(lambda _: closed.set())
+                    await conn.add_listener(CACHE_CHANNEL, self._on_notify)
+                    invalidate_all()
+                    self._listening.set()
+                    await closed.wait()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                console.print(f"[yellow]⚠ Канал {CACHE_CHANNEL} недоступен: {e}[/]")
+            self._listening.clear()
+            invalidate_all()
+            await asyncio.sleep(self.reconnect_delay)
+
+
+@asynccontextmanager
+async def cache_invalidation():
+    """Держит CacheInvalidator запущенным на время блока."""
+    invalidator = CacheInvalidator()
+    task = asyncio.create_task(invalidator.run())
+    try:
+        try:
+            await asyncio.wait_for(invalidator.wait_listening(), CACHE_RECONNECT_DELAY)
+        except TimeoutError:
+            # Кэш остается рабочим: устаревание ограничено CACHE_TTL
+            console.print("[yellow]⚠ Инвалидация кэша по NOTIFY не запущена[/]")
+        yield invalidator
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
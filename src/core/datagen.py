@@ -0,0 +1,608 @@
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+import asyncpg
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from src.config import DATAGEN_END, DATAGEN_PRESET, DATAGEN_SEED, PARTITION_INTERVAL
+from src.core.bulk import CopyStats
+from src.core.cache import invalidate_all
+from src.core.db import raw_connection, run
+from src.core.partitions import create_partition, next_period, period_start
+from src.core.rollups import rebuild_rollups
+from src.erase import clear_tables_and_reset_sequences
+
+# Строк в блоке генерации (и в порции COPY). Не настраивается: генератор каждого
+# блока получает свое зерно, поэтому от размера блока зависят сами данные
+BLOCK_ROWS = 100_000
+
+
+@dataclass(frozen=True)
+class Preset:
+    settlements: int
+    resources: int  # на поселение
+    infrastructure: int  # на поселение
+    sensors: int  # на объект инфраструктуры
+    energy_systems: int  # на объект инфраструктуры
+    operations: int
+    readings: int
+    vehicles: int
+    geozones: int
+    days: int  # глубина истории операций и показаний
+    personnel: int  # на объект инфраструктуры
+    incidents: int
+    notifications: int
+    tasks: int
+
+
+PRESETS = {
+    "small": Preset(
+        10, 5, 3, 4, 1, 100_000, 100_000, 1_000, 500, 90, 5, 1_000, 10_000, 1_000
+    ),
+    "medium": Preset(
+        100,
+        20,
+        10,
+        10,
+        2,
+        5_000_000,
+        2_000_000,
+        10_000,
+        5_000,
+        365,
+        20,
+        100_000,
+        500_000,
+        100_000,
+    ),
+    "large": Preset(
+        1_000,
+        50,
+        20,
+        10,
+        2,
+        100_000_000,
+        20_000_000,
+        100_000,
+        50_000,
+        730,
+        20,
+        1_000_000,
+        10_000_000,
+        1_000_000,
+    ),
+}
+
+REGIONS = np.array(["North Pole", "Siberia", "Sahara", "Amazon", "Alps", "Atoll"])
+CLIMATES = np.array(["Arctic", "Desert", "Tropical", "Temperate", "Alpine"])
+RESOURCE_CATALOG = np.array(
+    [
+        ("Water", "Liters", "Liquid"),
+        ("Food", "Kg", "Solid"),
+        ("Fuel", "Liters", "Liquid"),
+        ("Medicine", "Units", "Solid"),
+        ("Oxygen", "Liters", "Gas"),
+        ("Timber", "Kg", "Solid"),
+        ("Steel", "Kg", "Solid"),
+        ("Seeds", "Kg", "Solid"),
+        ("Batteries", "Units", "Solid"),
+        ("Coal", "Kg", "Solid"),
+    ]
+)
+INFRASTRUCTURE_TYPES = np.array(
+    ["Energy", "Water", "Housing", "Medical", "Transport", "Storage"]
+)
+SENSOR_TYPES = np.array(["Temperature", "Humidity", "Power", "Pressure", "Radiation"])
+ENERGY_TYPES = np.array(["Solar", "Wind", "Diesel", "Geothermal"])
+VEHICLE_TYPES = np.array(["Truck", "Rover", "Drone", "Snowmobile"])
+ZONE_TYPES = np.array(["Conservation", "Industrial", "Residential", "Agricultural"])
+POSITIONS = np.array(["Руководитель", "Инженер", "Техник", "Оператор", "Врач"])
+INCIDENT_TYPES = np.array(["Leak", "Shortage", "Spoilage", "Theft", "Breakdown"])
+NOTIFICATION_TYPES = np.array(["info", "warning", "alert", "critical"])
+
+
+@dataclass(frozen=True)
+class Period:
+    start: datetime
+    end: datetime
+
+    def slice(self, index: np.ndarray, total: int, rng) -> np.ndarray:
+        """Упорядоченные моменты внутри доли периода, приходящейся на строки блока."""
+        span_us = int((self.end - self.start).total_seconds() * 1e6)
+        # Целые Python: на 100M строк произведение не помещается в int64
+        lower = int(index[0]) * span_us // total
+        upper = (int(index[-1]) + 1) * span_us // total
+        offsets = np.sort(rng.integers(lower, max(upper, lower + 1), len(index)))
+        return np.datetime64(self.start, "us") + offsets.astype("timedelta64[us]")
+
+
+def _suffixed(names: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+    return np.char.add(np.char.add(names, " "), numbers.astype(str))
+
+
+def settlements_block(rng, index, total, preset, period) -> pd.DataFrame:
+    ids = index + 1
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "name": np.char.add("Settlement ", np.char.zfill(ids.astype(str), 5)),
+            "region": rng.choice(REGIONS, len(index)),
+            "climate_type": rng.choice(CLIMATES, len(index)),
+        }
+    )
+
+
+def resources_block(rng, index, total, preset, period) -> pd.DataFrame:
+    number = index % preset.resources
+    base = RESOURCE_CATALOG[number % len(RESOURCE_CATALOG)]
+    # Water, Food, ... затем Water 2, Food 2, ...: имена уникальны в поселении
+    series = number // len(RESOURCE_CATALOG) + 1
+    names = np.where(series > 1, _suffixed(base[:, 0], series), base[:, 0])
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": names,
+            "unit": base[:, 1],
+            "type": base[:, 2],
+            "settlement_id": index // preset.resources + 1,
+        }
+    )
+
+
+def infrastructure_block(rng, index, total, preset, period) -> pd.DataFrame:
+    number = index % preset.infrastructure
+    kinds = INFRASTRUCTURE_TYPES[number % len(INFRASTRUCTURE_TYPES)]
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(kinds, number + 1),
+            "type": kinds,
+            "settlement_id": index // preset.infrastructure + 1,
+        }
+    )
+
+
+def sensors_block(rng, index, total, preset, period) -> pd.DataFrame:
+    kinds = rng.choice(SENSOR_TYPES, len(index))
+    age_us = rng.integers(0, 86_400 * 10**6, len(index)).astype("timedelta64[us]")
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(np.char.add(kinds, " Sensor"), index + 1),
+            "type": kinds,
+            "infrastructure_id": index // preset.sensors + 1,
+            "status": rng.choice(
+                ["active", "inactive", "faulty"], len(index), p=[0.9, 0.07, 0.03]
+            ),
+            "last_update": np.datetime64(period.end, "us") - age_us,
+            # Медиана ~100, хвост выше ENERGY_LIMIT у малой доли устройств
+            "energy_consumption": rng.lognormal(np.log(100), 0.6, len(index)).astype(
+                int
+            ),
+        }
+    )
+
+
+def energy_systems_block(rng, index, total, preset, period) -> pd.DataFrame:
+    kinds = rng.choice(ENERGY_TYPES, len(index))
+    capacity = rng.integers(500, 5_000, len(index))
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(kinds, index + 1),
+            "type": kinds,
+            "capacity": capacity,
+            "current_load": (capacity * rng.beta(2, 3, len(index)) * 1.3).astype(int),
+            "status": rng.choice(
+                ["operational", "offline"], len(index), p=[0.97, 0.03]
+            ),
+            "infrastructure_id": index // preset.energy_systems + 1,
+        }
+    )
+
+
+def operations_block(rng, index, total, preset, period) -> pd.DataFrame:
+    resources = preset.settlements * preset.resources
+    resource = rng.integers(0, resources, len(index))
+    consumption = rng.random(len(index)) < 0.75
+    quantity = np.where(
+        consumption,
+        -rng.integers(1, 500, len(index)),
+        rng.integers(1, 1_500, len(index)),
+    )
+    return pd.DataFrame(
+        {
+            "resource_id": resource + 1,
+            "settlement_id": resource // preset.resources + 1,
+            "date": period.slice(index, total, rng),
+            "quantity": quantity,
+            "operation_type": np.where(consumption, "consumption", "replenishment"),
+        }
+    )
+
+
+def readings_block(rng, index, total, preset, period) -> pd.DataFrame:
+    sensors = preset.settlements * preset.infrastructure * preset.sensors
+    return pd.DataFrame(
+        {
+            "sensor_id": rng.integers(1, sensors + 1, len(index)),
+            "recorded_at": period.slice(index, total, rng),
+            "energy_consumption": rng.lognormal(np.log(100), 0.6, len(index)).astype(
+                int
+            ),
+        }
+    )
+
+
+def _coordinates(rng, count: int) -> tuple[np.ndarray, np.ndarray]:
+    # Без полярных областей, как в spatial_test
+    return rng.uniform(-178, 178, count), rng.uniform(-78, 78, count)
+
+
+def _fmt(values: np.ndarray) -> np.ndarray:
+    return np.char.mod("%.6f", values)
+
+
+def vehicles_block(rng, index, total, preset, period) -> pd.DataFrame:
+    x, y = _coordinates(rng, len(index))
+    kinds = rng.choice(VEHICLE_TYPES, len(index))
+    points = np.char.add(
+        np.char.add(np.char.add("SRID=4326;POINT(", _fmt(x)), " "),
+        np.char.add(_fmt(y), ")"),
+    )
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(kinds, index + 1),
+            "type": kinds,
+            "status": rng.choice(
+                ["available", "in_use", "maintenance"], len(index), p=[0.6, 0.3, 0.1]
+            ),
+            "current_location": points,
+            "fuel_reserve": rng.integers(0, 200, len(index)),
+        }
+    )
+
+
+def geozones_block(rng, index, total, preset, period) -> pd.DataFrame:
+    x, y = _coordinates(rng, len(index))
+    size = rng.uniform(0.1, 2, len(index))
+    x0, y0, x1, y1 = _fmt(x), _fmt(y), _fmt(x + size), _fmt(y + size)
+    corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+    ring = np.char.add(np.char.add(corners[0][0], " "), corners[0][1])
+    for cx, cy in corners[1:]:
+        ring = np.char.add(
+            np.char.add(ring, ", "), np.char.add(np.char.add(cx, " "), cy)
+        )
+    kinds = rng.choice(ZONE_TYPES, len(index))
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(np.char.add(kinds, " Zone"), index + 1),
+            "type": kinds,
+            "coordinates": np.char.add(np.char.add("SRID=4326;POLYGON((", ring), "))"),
+            "description": "Synthetic zone",
+            "usage_type": rng.choice(["Restricted", "Open"], len(index)),
+        }
+    )
+
+
+def personnel_block(rng, index, total, preset, period) -> pd.DataFrame:
+    positions = rng.choice(POSITIONS, len(index), p=[0.02, 0.3, 0.38, 0.2, 0.1])
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "full_name": _suffixed(np.array("Employee"), index + 1),
+            "position": positions,
+            "infrastructure_id": index // preset.personnel + 1,
+        }
+    )
+
+
+# Доли статусов ниже держат частичные индексы миграции 1 избирательными:
+# открытых инцидентов, непрочитанных уведомлений и pending-задач немного
+def incidents_block(rng, index, total, preset, period) -> pd.DataFrame:
+    kinds = rng.choice(INCIDENT_TYPES, len(index))
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "type": kinds,
+            "description": np.char.add("Synthetic incident: ", kinds),
+            "date_time": period.slice(index, total, rng),
+            "status": rng.choice(
+                ["open", "in_progress", "resolved"], len(index), p=[0.03, 0.02, 0.95]
+            ),
+            "resource_id": rng.integers(
+                1, preset.settlements * preset.resources + 1, len(index)
+            ),
+        }
+    )
+
+
+def notifications_block(rng, index, total, preset, period) -> pd.DataFrame:
+    kinds = rng.choice(NOTIFICATION_TYPES, len(index), p=[0.6, 0.25, 0.1, 0.05])
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "type": kinds,
+            "message": np.char.add("Synthetic notification: ", kinds),
+            "timestamp": period.slice(index, total, rng),
+            "status": rng.choice(["unread", "read"], len(index), p=[0.05, 0.95]),
+        }
+    )
+
+
+def tasks_block(rng, index, total, preset, period) -> pd.DataFrame:
+    # Сроки — в пределах месяца после момента постановки задачи
+    due_us = rng.integers(0, 30 * 86_400 * 10**6, len(index)).astype("timedelta64[us]")
+    return pd.DataFrame(
+        {
+            "id": index + 1,
+            "name": _suffixed(np.array("Task"), index + 1),
+            "description": "Synthetic task",
+            "status": rng.choice(
+                ["pending", "overdue", "completed"], len(index), p=[0.03, 0.02, 0.95]
+            ),
+            "assignee": rng.choice(POSITIONS[1:], len(index)),
+            "deadline": period.slice(index, total, rng) + due_us,
+        }
+    )
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    table: str
+    columns: tuple[str, ...]
+    rows: Callable[[Preset], int]
+    block: Callable[..., pd.DataFrame]
+
+
+# Порядок загрузки совпадает с порядком внешних ключей
+TABLE_SPECS = [
+    TableSpec(
+        "settlements",
+        ("id", "name", "region", "climate_type"),
+        lambda p: p.settlements,
+        settlements_block,
+    ),
+    TableSpec(
+        "resources",
+        ("id", "name", "unit", "type", "settlement_id"),
+        lambda p: p.settlements * p.resources,
+        resources_block,
+    ),
+    TableSpec(
+        "infrastructure",
+        ("id", "name", "type", "settlement_id"),
+        lambda p: p.settlements * p.infrastructure,
+        infrastructure_block,
+    ),
+    TableSpec(
+        "sensors_devices",
+        (
+            "id",
+            "name",
+            "type",
+            "infrastructure_id",
+            "status",
+            "last_update",
+            "energy_consumption",
+        ),
+        lambda p: p.settlements * p.infrastructure * p.sensors,
+        sensors_block,
+    ),
+    TableSpec(
+        "energy_systems",
+        (
+            "id",
+            "name",
+            "type",
+            "capacity",
+            "current_load",
+            "status",
+            "infrastructure_id",
+        ),
+        lambda p: p.settlements * p.infrastructure * p.energy_systems,
+        energy_systems_block,
+    ),
+    TableSpec(
+        "resource_operations",
+        ("resource_id", "settlement_id", "date", "quantity", "operation_type"),
+        lambda p: p.operations,
+        operations_block,
+    ),
+    TableSpec(
+        "sensor_readings",
+        ("sensor_id", "recorded_at", "energy_consumption"),
+        lambda p: p.readings,
+        readings_block,
+    ),
+    TableSpec(
+        "transport_vehicles",
+        ("id", "name", "type", "status", "current_location", "fuel_reserve"),
+        lambda p: p.vehicles,
+        vehicles_block,
+    ),
+    TableSpec(
+        "geozones",
+        ("id", "name", "type", "coordinates", "description", "usage_type"),
+        lambda p: p.geozones,
+        geozones_block,
+    ),
+    TableSpec(
+        "personnel",
+        ("id", "full_name", "position", "infrastructure_id"),
+        lambda p: p.settlements * p.infrastructure * p.personnel,
+        personnel_block,
+    ),
+    TableSpec(
+        "incidents",
+        ("id", "type", "description", "date_time", "status", "resource_id"),
+        lambda p: p.incidents,
+        incidents_block,
+    ),
+    TableSpec(
+        "notifications",
+        ("id", "type", "message", "timestamp", "status"),
+        lambda p: p.notifications,
+        notifications_block,
+    ),
+    TableSpec(
+        "tasks",
+        ("id", "name", "description", "status", "assignee", "deadline"),
+        lambda p: p.tasks,
+        tasks_block,
+    ),
+]
+
+# Справочники под кэшем src/core/cache.py: их NOTIFY-триггеры при загрузке отключены
+REFERENCE_TABLES = ("settlements", "resources", "infrastructure")
+
+console = Console()
+
+
+def build_block(
+    spec_index: int, block: int, preset: Preset, seed: int, period: Period
+) -> tuple[int, bytes]:
+    """Блок таблицы как CSV; генератор блока зависит только от (seed, таблица, блок)."""
+    spec = TABLE_SPECS[spec_index]
+    total = spec.rows(preset)
+    index = np.arange(block * BLOCK_ROWS, min(total, (block + 1) * BLOCK_ROWS))
+    rng = np.random.default_rng([seed, spec_index, block])
+    frame = spec.block(rng, index, total, preset, period)[list(spec.columns)]
+    csv = frame.to_csv(header=False, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    return len(frame), csv.encode()
+
+
+async def _csv_stream(spec_index, preset, seed, period, stats: CopyStats):
+    blocks = -(-TABLE_SPECS[spec_index].rows(preset) // BLOCK_ROWS)
+    if not blocks:
+        return
+    # Следующий блок строится в потоке, пока COPY отправляет текущий
+    pending = asyncio.create_task(
+        asyncio.to_thread(build_block, spec_index, 0, preset, seed, period)
+    )
+    for block in range(blocks):
+        rows, data = await pending
+        if block + 1 < blocks:
+            pending = asyncio.create_task(
+                asyncio.to_thread(
+                    build_block, spec_index, block + 1, preset, seed, period
+                )
+            )
+        stats.rows += rows
+        stats.chunks += 1
+        yield data
+
+
+async def _create_partitions(conn: asyncpg.Connection, period: Period):
+    for table in ("resource_operations", "sensor_readings"):
+        start = period_start(period.start, PARTITION_INTERVAL)
+        while start < period.end:
+            await create_partition(conn, table, start, PARTITION_INTERVAL)
+            start = next_period(start, PARTITION_INTERVAL)
+
+
+async def finalize(conn: asyncpg.Connection):
+    """То, что при обычной вставке делают последовательности и триггеры."""
+    for spec in TABLE_SPECS:
+        if "id" in spec.columns:
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{spec.table}', 'id'), "
+                f"GREATEST(max(id), 1), max(id) IS NOT NULL) FROM {spec.table}"
+            )
+    await conn.execute("CALL rebuild_resource_balances()")
+    await rebuild_rollups(conn)
+    await conn.execute("ANALYZE")
+    for table in REFERENCE_TABLES:
+        await conn.execute("SELECT pg_notify('reference_changed', $1)", table)
+    invalidate_all()
+
+
+async def generate(
+    preset: str = DATAGEN_PRESET,
+    *,
+    seed: int = DATAGEN_SEED,
+    end: datetime | None = None,
+    conn: asyncpg.Connection | None = None,
+) -> dict[str, CopyStats]:
+    """
+    Заменяет содержимое базы синтетическим набором пресета. Столбцы строит NumPy,
+    блоки потоком уходят в COPY: в памяти только текущий и следующий блок. При
+    одинаковых seed и end данные совпадают побайтно. Триггеры на время COPY
+    отключены; остатки, сводки и последовательности пересчитываются после загрузки.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Неизвестный пресет: {preset}")
+    if conn is None:
+        async with raw_connection() as conn:
+            return await generate(preset, seed=seed, end=end, conn=conn)
+
+    params = PRESETS[preset]
+    end = end or datetime.fromisoformat(DATAGEN_END)
+    period = Period(end - timedelta(days=params.days), end)
+
+    await clear_tables_and_reset_sequences()
+    await _create_partitions(conn, period)
+
+    results = {}
+    for spec_index, spec in enumerate(TABLE_SPECS):
+        stats = CopyStats()
+        start_time = time.perf_counter()
+        async with conn.transaction():
+            await conn.execute("SET LOCAL session_replication_role = replica")
+            await conn.copy_to_table(
+                spec.table,
+                source=_csv_stream(spec_index, params, seed, period, stats),
+                columns=list(spec.columns),
+                format="csv",
+            )
+        stats.seconds = time.perf_counter() - start_time
+        results[spec.table] = stats
+        console.print(
+            f"[green]✔[/] {spec.table}: {stats.rows:,} строк, "
+            f"{stats.rows_per_sec:,.0f} строк/с"
+        )
+
+    start_time = time.perf_counter()
+    await finalize(conn)
+    console.print(
+        f"[green]✔[/] Остатки, сводки и статистика пересчитаны за "
+        f"{time.perf_counter() - start_time:.1f} с"
+    )
+    return results
+
+
+def print_stats(preset: str, seed: int, results: dict[str, CopyStats]):
+    table = Table(title=f"Синтетический набор {preset} (seed={seed})")
+    for column in ("Таблица", "Строк", "Блоков", "Время, с", "Строк/с"):
+        table.add_column(column)
+    for name, stats in results.items():
+        table.add_row(
+            name,
+            f"{stats.rows:,}",
+            str(stats.chunks),
+            f"{stats.seconds:.2f}",
+            f"{stats.rows_per_sec:,.0f}",
+        )
+    console.print(table)
+
+
+async def main(preset: str = DATAGEN_PRESET, seed: int = DATAGEN_SEED):
+    results = await generate(preset, seed=seed)
+    print_stats(preset, seed, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация синтетического набора")
+    parser.add_argument("--preset", choices=PRESETS, default=DATAGEN_PRESET)
+    parser.add_argument("--seed", type=int, default=DATAGEN_SEED)
+    args = parser.parse_args()
+    run(main(args.preset, args.seed))
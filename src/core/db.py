@@ -0,0 +1,232 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+
+import asyncpg
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.config import (
+    ALERT_DELIVERY,
+    DATABASE_URL,
+    DB_EXECUTEMANY_MODE,
+    DB_INSERTMANYVALUES_PAGE_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER,
+    DB_POOL_PRE_PING,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    REPLICA_URLS,
+    TRACK_FUNCTIONS,
+)
+
+EXECUTEMANY_MODES = ("values", "executemany")
+
+
+@dataclass
+class PoolStats:
+    connects: int = 0
+    checkouts: int = 0
+    checkins: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    checked_out_max: int = 0
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, считающий выдачи соединений и время ожидания свободного."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        wait = time.perf_counter() - start
+        self.stats.checkouts += 1
+        self.stats.wait_total += wait
+        self.stats.wait_max = max(self.stats.wait_max, wait)
+        self.stats.checked_out_max = max(self.stats.checked_out_max, self.checkedout())
+        return connection
+
+    def _create_connection(self):
+        self.stats.connects += 1
+        return super()._create_connection()
+
+    def _do_return_conn(self, record):
+        self.stats.checkins += 1
+        super()._do_return_conn(record)
+
+
+def build_engine(url: str = DATABASE_URL, **overrides) -> AsyncEngine:
+    """Создает движок с настройками пула из src/config.py; overrides заменяют их."""
+    if DB_EXECUTEMANY_MODE not in EXECUTEMANY_MODES:
+        raise ValueError(f"Неизвестный режим executemany: {DB_EXECUTEMANY_MODE}")
+
+    # Кэш подготовленных выражений SQLAlchemy и собственный кэш asyncpg
+    cache_size = 0 if DB_PGBOUNCER else DB_STATEMENT_CACHE_SIZE
+    url = make_url(url).update_query_dict(
+        {"prepared_statement_cache_size": str(cache_size)}
+    )
+    connect_args = {
+        "statement_cache_size": cache_size,
+        "server_settings": {
+            # Режим доставки уведомлений читается функцией emit_alert() в db.sql
+            "settlement.alert_delivery": ALERT_DELIVERY,
+            # Время триггеров для отчета src/core/instrumentation.py
+            "track_functions": TRACK_FUNCTIONS,
+        },
+    }
+    if DB_PGBOUNCER:
+        # Уникальные имена: за pgbouncer имена выражений разных клиентов не пересекаются
+        connect_args["prepared_statement_name_func"] = (
+            lambda: f"__asyncpg_{uuid.uuid4()}__"
+        )
+    options = dict(
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        use_insertmanyvalues=DB_EXECUTEMANY_MODE == "values",
+        insertmanyvalues_page_size=DB_INSERTMANYVALUES_PAGE_SIZE,
+        connect_args=connect_args,
+    )
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+_engine: AsyncEngine | None = None
+_replica_engines: list[AsyncEngine] | None = None
+_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+_engine_options: dict = {}
+_replica_urls: list[str] = list(REPLICA_URLS)
+
+
+def configure_engine(replica_urls: list[str] | None = None, **options) -> None:
+    """
+    Задает аргументы build_engine (url, pool_size, ...) для общего движка до его создания.
+    Реплики REPLICA_URLS копируют рабочую базу, поэтому при другом url они
+    не подключаются, если явно не переданы replica_urls.
+    """
+    global _replica_urls
+    if _engine is not None or _replica_engines is not None:
+        raise RuntimeError("Общий движок уже создан, сначала вызовите dispose_engine()")
+    _engine_options.clear()
+    _engine_options.update(options)
+    if replica_urls is None:
+        replica_urls = [] if "url" in options else REPLICA_URLS
+    _replica_urls = list(replica_urls)
+
+
+def get_engine() -> AsyncEngine:
+    """Общий движок процесса; создается при первом обращении."""
+    global _engine
+    if _engine is None:
+        _engine = build_engine(**_engine_options)
+    return _engine
+
+
+def get_replica_engines() -> list[AsyncEngine]:
+    """Движки реплик с теми же настройками пула, что у общего; пусто без реплик."""
+    global _replica_engines
+    if _replica_engines is None:
+        options = {k: v for k, v in _engine_options.items() if k != "url"}
+        _replica_engines = [build_engine(url, **options) for url in _replica_urls]
+    return _replica_engines
+
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(get_engine(), expire_on_commit=False)
+    return _sessionmaker
+
+
+def get_session() -> AsyncSession:
+    return get_sessionmaker()()
+
+
+@asynccontextmanager
+async def raw_connection():
+    """asyncpg-соединение из общего пула (COPY, executemany и прочие нативные вызовы)."""
+    async with get_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        yield raw.driver_connection
+
+
+@asynccontextmanager
+async def dedicated_connection():
+    """Отдельное asyncpg-соединение вне пула к той же базе (LISTEN и долгие сессии)."""
+    url = get_engine().url
+    conn = await asyncpg.connect(
+        user=url.username,
+        password=url.password,
+        host=url.host,
+        port=url.port,
+        database=url.database,
+    )
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def dispose_engine() -> None:
+    """Закрывает пулы; следующий get_engine() создаст движок заново."""
+    global _engine, _replica_engines, _sessionmaker
+    # Фоновый опрос реплик держит их движки; routed_session() запустит его заново
+    from src.core.routing import stop_monitor
+
+    await stop_monitor()
+    if _engine is not None:
+        await _engine.dispose()
+    for engine in _replica_engines or ():
+        await engine.dispose()
+    _engine = _replica_engines = _sessionmaker = None
+
+
+def run(main):
+    """asyncio.run для скриптов: по завершении закрывает пул в том же цикле событий."""
+
+    async def _run():
+        try:
+            return await main
+        finally:
+            await dispose_engine()
+
+    return asyncio.run(_run())
+
+
+def pool_status() -> dict:
+    """Текущее состояние пула и накопленные метрики выдачи соединений."""
+    pool = get_engine().sync_engine.pool
+    stats = pool.stats
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **asdict(stats),
+        "wait_avg": stats.wait_avg,
+    }
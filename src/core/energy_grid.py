@@ -0,0 +1,385 @@
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    ENERGY_CASCADE_STEPS,
+    ENERGY_DEMAND_SIGMA,
+    ENERGY_OUTAGE_PROBABILITY,
+    ENERGY_SCENARIOS,
+    ENERGY_TRIP_RATIO,
+)
+from src.core.db import get_session, raw_connection, run
+from src.core.models import EnergySystem, Infrastructure, SensorDevice, Settlement
+
+console = Console()
+
+# Один UPDATE на все изменившиеся системы; offline не трогаем
+UPDATE_STATUS_SQL = """
+UPDATE energy_systems e SET status = v.status
+FROM unnest($1::int[], $2::varchar[]) AS v(id, status)
+WHERE e.id = v.id AND e.status <> v.status AND e.status <> 'offline'
+"""
+
+
+@dataclass
+class GridSnapshot:
+    """Энергосистемы в виде массивов; группы — объекты инфраструктуры."""
+
+    ids: np.ndarray
+    names: list[str]
+    status: np.ndarray
+    capacity: np.ndarray
+    metered_load: np.ndarray  # current_load из energy_systems
+    load: np.ndarray  # max(current_load, доля потребления устройств объекта)
+    group: np.ndarray  # индекс объекта инфраструктуры для каждой системы
+    group_names: list[str]
+    group_demand: np.ndarray  # суммарное потребление активных устройств объекта
+    group_settlement: np.ndarray  # индекс поселения для каждого объекта
+    settlement_names: list[str]
+
+    @property
+    def online(self) -> np.ndarray:
+        return self.status != "offline"
+
+    @property
+    def groups(self) -> int:
+        return len(self.group_names)
+
+    @property
+    def demand(self) -> np.ndarray:
+        """
+        Спрос по объектам: нагрузка работающих систем, но не меньше потребления
+        устройств — у объекта без работающих систем спрос не обслуживается, а не пропадает.
+        """
+        return np.maximum(
+            group_sum(self.load, self.group, self.groups), self.group_demand
+        )
+
+
+@dataclass
+class SimulationResult:
+    scenarios: int
+    overload_probability: np.ndarray  # по системам: доля сценариев с перегрузкой
+    trip_probability: np.ndarray  # по системам: отказ или срабатывание защиты
+    expected_shed: np.ndarray  # по объектам: средняя неотданная нагрузка
+    total_shed: np.ndarray  # по сценариям: неотданная нагрузка всей сети
+
+
+def group_sum(values: np.ndarray, group: np.ndarray, groups: int) -> np.ndarray:
+    """Суммы по группам для вектора (N) или построчно для матрицы сценариев (S x N)."""
+    if values.ndim == 1:
+        return np.bincount(group, weights=values, minlength=groups)
+    rows = values.shape[0]
+    keys = group[None, :] + groups * np.arange(rows)[:, None]
+    return np.bincount(
+        keys.ravel(), weights=values.ravel(), minlength=rows * groups
+    ).reshape(rows, groups)
+
+
+def load_ratio(demand: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Нагрузка / мощность; спрос без мощности — inf, нет спроса — 0."""
+    ratio = np.zeros_like(demand, dtype=float)
+    np.divide(demand, capacity, out=ratio, where=capacity > 0)
+    ratio[(capacity <= 0) & (demand > 0)] = np.inf
+    return ratio
+
+
+async def load_grid(session: AsyncSession) -> GridSnapshot:
+    systems = await session.execute(
+        select(
+            EnergySystem.id,
+            EnergySystem.name,
+            EnergySystem.status,
+            EnergySystem.capacity,
+            EnergySystem.current_load,
+            EnergySystem.infrastructure_id,
+            Infrastructure.name.label("infrastructure"),
+            Settlement.name.label("settlement"),
+        )
+        .outerjoin(Infrastructure, Infrastructure.id == EnergySystem.infrastructure_id)
+        .outerjoin(Settlement, Settlement.id == Infrastructure.settlement_id)
+        .order_by(EnergySystem.id)
+    )
+    systems = pd.DataFrame(
+        systems.all(),
+        columns=[
+            "id",
+            "name",
+            "status",
+            "capacity",
+            "current_load",
+            "infrastructure_id",
+            "infrastructure",
+            "settlement",
+        ],
+    )
+    # Потребление суммируется в базе: из sensors_devices приходит строка на объект
+    devices = await session.execute(
+        select(
+            SensorDevice.infrastructure_id,
+            func.sum(SensorDevice.energy_consumption),
+        )
+        .where(SensorDevice.status == "active")
+        .group_by(SensorDevice.infrastructure_id)
+    )
+    consumption = dict(devices.all())
+
+    # Система без объекта инфраструктуры образует отдельную группу
+    group_key = systems["infrastructure_id"].fillna(-systems["id"]).astype(int)
+    group, keys = pd.factorize(group_key)
+    first = systems.groupby(group).first()
+    settlement_group, settlement_names = pd.factorize(
+        first["settlement"].fillna("—"), sort=True
+    )
+    group_demand = np.array(
+        [float(consumption.get(key, 0) or 0) for key in keys], dtype=float
+    )
+
+    status = systems["status"].to_numpy(dtype=object)
+    capacity = systems["capacity"].to_numpy(dtype=float)
+    metered = systems["current_load"].to_numpy(dtype=float)
+    online = status != "offline"
+    # Потребление устройств объекта делится между работающими системами по мощности
+    online_capacity = group_sum(np.where(online, capacity, 0.0), group, len(keys))
+    share = np.zeros_like(capacity)
+    np.divide(
+        group_demand[group] * capacity,
+        online_capacity[group],
+        out=share,
+        where=online & (online_capacity[group] > 0),
+    )
+    return GridSnapshot(
+        ids=systems["id"].to_numpy(dtype=int),
+        names=systems["name"].tolist(),
+        status=status,
+        capacity=capacity,
+        metered_load=metered,
+        load=np.where(online, np.maximum(metered, share), 0.0),
+        group=group,
+        group_names=first["infrastructure"].fillna(first["name"]).tolist(),
+        group_demand=group_demand,
+        group_settlement=settlement_group,
+        settlement_names=list(settlement_names),
+    )
+
+
+def grid_utilisation(grid: GridSnapshot) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Загрузка и запас мощности по объектам инфраструктуры и по поселениям."""
+    capacity = group_sum(
+        np.where(grid.online, grid.capacity, 0.0), grid.group, grid.groups
+    )
+    load = grid.demand
+    infrastructure = pd.DataFrame(
+        {
+            "infrastructure": grid.group_names,
+            "settlement": [grid.settlement_names[i] for i in grid.group_settlement],
+            "capacity": capacity,
+            "load": load,
+            "devices": grid.group_demand,
+            "utilisation": load_ratio(load, capacity),
+            "headroom": capacity - load,
+        }
+    )
+    settlements = (
+        infrastructure.groupby("settlement")[["capacity", "load", "devices"]]
+        .sum()
+        .reset_index()
+    )
+    settlements["utilisation"] = load_ratio(
+        settlements["load"].to_numpy(), settlements["capacity"].to_numpy()
+    )
+    settlements["headroom"] = settlements["capacity"] - settlements["load"]
+    return (
+        infrastructure.sort_values("utilisation", ascending=False),
+        settlements.sort_values("utilisation", ascending=False),
+    )
+
+
+def redistribute_load(
+    load: np.ndarray, alive: np.ndarray, demand: np.ndarray, grid: GridSnapshot
+) -> np.ndarray:
+    """
+    Нагрузка систем (сценарии x системы) после перераспределения: то, что несли
+    отключенные системы, делится между работающими системами объекта по мощности.
+    Если на объекте не осталось мощности, нагрузка остается необслуженной.
+    """
+    load = np.where(alive, load, 0.0)
+    orphan = demand - group_sum(load, grid.group, grid.groups)
+    capacity = alive * grid.capacity
+    alive_capacity = group_sum(capacity, grid.group, grid.groups)[:, grid.group]
+    share = np.zeros_like(load)
+    np.divide(capacity, alive_capacity, out=share, where=alive_capacity > 0)
+    return load + orphan[:, grid.group] * share
+
+
+def simulate(
+    grid: GridSnapshot,
+    *,
+    scenarios: int = ENERGY_SCENARIOS,
+    outage_probability: float = ENERGY_OUTAGE_PROBABILITY,
+    demand_sigma: float = ENERGY_DEMAND_SIGMA,
+    trip_ratio: float = ENERGY_TRIP_RATIO,
+    cascade_steps: int = ENERGY_CASCADE_STEPS,
+    rng: np.random.Generator | None = None,
+) -> SimulationResult:
+    """
+    Все сценарии считаются одной матрицей (сценарии x системы). В каждом сценарии
+    системы независимо отказывают с вероятностью outage_probability, а спрос объекта
+    умножается на логнормальный множитель со средним 1 и делится между системами
+    пропорционально их текущей нагрузке. Нагрузка отказавших систем переходит к
+    оставшимся на том же объекте; система, загруженная выше trip_ratio, отключается
+    защитой, и ее нагрузка на следующем шаге снова перераспределяется — до
+    cascade_steps шагов. Нагрузка сверх оставшейся мощности объекта отключается.
+    """
+    rng = rng or np.random.default_rng()
+    multiplier = rng.lognormal(
+        -(demand_sigma**2) / 2, demand_sigma, size=(scenarios, grid.groups)
+    )
+    demand = grid.demand[None, :] * multiplier
+    group_load = group_sum(grid.load, grid.group, grid.groups)
+    weight = np.zeros_like(grid.load)
+    np.divide(
+        grid.load, group_load[grid.group], out=weight, where=group_load[grid.group] > 0
+    )
+    load = demand[:, grid.group] * weight[None, :]
+    alive = grid.online[None, :] & (
+        rng.random((scenarios, len(grid.ids))) >= outage_probability
+    )
+
+    load = redistribute_load(load, alive, demand, grid)
+    for _ in range(cascade_steps):
+        tripped = alive & (load > trip_ratio * grid.capacity)
+        if not tripped.any():
+            break
+        alive &= ~tripped
+        load = redistribute_load(load, alive, demand, grid)
+
+    capacity = group_sum(alive * grid.capacity, grid.group, grid.groups)
+    shed = np.maximum(demand - capacity, 0.0)
+    return SimulationResult(
+        scenarios=scenarios,
+        overload_probability=(alive & (load > grid.capacity)).mean(axis=0),
+        trip_probability=(grid.online[None, :] & ~alive).mean(axis=0),
+        expected_shed=shed.mean(axis=0),
+        total_shed=shed.sum(axis=1),
+    )
+
+
+def overload_statuses(grid: GridSnapshot) -> tuple[np.ndarray, np.ndarray]:
+    """Статусы работающих систем по текущей нагрузке: overloaded или operational."""
+    online = grid.online
+    status = np.where(grid.load > grid.capacity, "overloaded", "operational")
+    changed = online & (status != grid.status)
+    return grid.ids[changed], status[changed]
+
+
+async def apply_statuses(ids: np.ndarray, statuses: np.ndarray, conn=None) -> int:
+    """Записывает статусы одним UPDATE ... FROM unnest(); возвращает число строк."""
+    if conn is None:
+        async with raw_connection() as conn:
+            return await apply_statuses(ids, statuses, conn)
+    if not len(ids):
+        return 0
+    result = await conn.execute(UPDATE_STATUS_SQL, ids.tolist(), statuses.tolist())
+    return int(result.split()[-1])
+
+
+def print_grid(
+    grid: GridSnapshot,
+    infrastructure: pd.DataFrame,
+    settlements: pd.DataFrame,
+    simulation: SimulationResult,
+):
+    expected_shed = pd.Series(simulation.expected_shed)
+    table = Table(title="Загрузка энергосети по объектам инфраструктуры")
+    for column in (
+        "Объект",
+        "Поселение",
+        "Мощность",
+        "Нагрузка",
+        "Устройства",
+        "Загрузка",
+        "Запас",
+        "Отключение (ср.)",
+    ):
+        table.add_column(column)
+    for row in infrastructure.itertuples():
+        table.add_row(
+            str(row.infrastructure),
+            row.settlement,
+            f"{row.capacity:.0f}",
+            f"{row.load:.0f}",
+            f"{row.devices:.0f}",
+            f"{row.utilisation:.0%}",
+            f"{row.headroom:.0f}",
+            f"{expected_shed[row.Index]:.1f}",
+        )
+    console.print(table)
+
+    table = Table(title="Загрузка энергосети по поселениям")
+    for column in ("Поселение", "Мощность", "Нагрузка", "Загрузка", "Запас"):
+        table.add_column(column)
+    for row in settlements.itertuples():
+        table.add_row(
+            row.settlement,
+            f"{row.capacity:.0f}",
+            f"{row.load:.0f}",
+            f"{row.utilisation:.0%}",
+            f"{row.headroom:.0f}",
+        )
+    console.print(table)
+
+    table = Table(title=f"Системы под риском ({simulation.scenarios} сценариев)")
+    for column in ("Система", "Загрузка", "P(перегрузка)", "P(отключение)"):
+        table.add_column(column)
+    risky = np.argsort(-simulation.overload_probability - simulation.trip_probability)
+    for i in risky[:15]:
+        table.add_row(
+            grid.names[i],
+            f"{load_ratio(grid.load[i], grid.capacity[i]):.0%}",
+            f"{simulation.overload_probability[i]:.1%}",
+            f"{simulation.trip_probability[i]:.1%}",
+        )
+    console.print(table)
+    p50, p95, p99 = np.percentile(simulation.total_shed, [50, 95, 99])
+    console.print(
+        f"Отключаемая нагрузка сети: p50 {p50:.0f}, p95 {p95:.0f}, p99 {p99:.0f}"
+    )
+
+
+async def main(
+    scenarios: int = ENERGY_SCENARIOS, seed: int | None = None, dry_run: bool = False
+):
+    async with get_session() as session:
+        grid = await load_grid(session)
+    if not len(grid.ids):
+        console.print("[yellow]⚠ Энергосистем нет[/]")
+        return
+    infrastructure, settlements = grid_utilisation(grid)
+    simulation = simulate(grid, scenarios=scenarios, rng=np.random.default_rng(seed))
+    print_grid(grid, infrastructure, settlements, simulation)
+
+    ids, statuses = overload_statuses(grid)
+    if dry_run:
+        console.print(f"Статус изменился бы у систем: {len(ids)}")
+        return
+    updated = await apply_statuses(ids, statuses)
+    console.print(f"[green]✔[/] Статусы обновлены одним UPDATE: {updated} систем")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка энергосети и сценарии")
+    parser.add_argument("--scenarios", type=int, default=ENERGY_SCENARIOS)
+    parser.add_argument("--seed", type=int, help="зерно генератора сценариев")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="не записывать статусы в базу"
+    )
+    args = parser.parse_args()
+    run(main(args.scenarios, args.seed, args.dry_run))
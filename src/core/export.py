@@ -0,0 +1,95 @@
+import argparse
+import csv
+from pathlib import Path
+from typing import AsyncIterator
+
+import pandas as pd
+from geoalchemy2 import Geometry
+from rich.console import Console
+from sqlalchemy import func, select
+
+from src.config import EXPORT_CHUNK_SIZE, EXPORT_DIR, EXPORT_FORMATS
+from src.core.db import run
+from src.core.models import Base
+from src.core.routing import routed_session
+
+console = Console()
+
+
+def _export_columns(model):
+    # Геометрия выгружается как WKT, а не как WKB-объекты geoalchemy2
+    return [
+        (
+            func.ST_AsText(column).label(column.name)
+            if isinstance(column.type, Geometry)
+            else column
+        )
+        for column in model.__table__.columns
+    ]
+
+
+async def stream_chunks(
+    model, *, chunk_size: int = EXPORT_CHUNK_SIZE, as_dataframe: bool = False
+) -> AsyncIterator[list[tuple] | pd.DataFrame]:
+    """
+    Читает таблицу модели серверным курсором и отдает порции по chunk_size строк
+    (кортежами или DataFrame); в памяти одновременно находится не больше одной порции.
+    """
+    columns = [column.name for column in model.__table__.columns]
+    statement = select(*_export_columns(model)).execution_options(yield_per=chunk_size)
+    # Чистое чтение: уходит на реплику, если она есть и не отстала
+    async with routed_session() as session:
+        result = await session.stream(statement)
+        async for partition in result.partitions(chunk_size):
+            rows = [tuple(row) for row in partition]
+            yield (
+                pd.DataFrame.from_records(rows, columns=columns)
+                if as_dataframe
+                else rows
+            )
+
+
+async def export_csv(model, path, *, chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    rows = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(column.name for column in model.__table__.columns)
+        async for chunk in stream_chunks(model, chunk_size=chunk_size):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+async def export_table(
+    model, directory=EXPORT_DIR, fmt: str = "csv", chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Path:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{model.__tablename__}.{fmt}"
+    rows = await export_csv(model, path, chunk_size=chunk_size)
+    console.print(f"[green]✔[/] {model.__tablename__}: {rows} строк → [bold]{path}[/]")
+    return path
+
+
+async def main(
+    tables=None, directory=EXPORT_DIR, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE
+):
+    models = [
+        mapper.class_
+        for mapper in Base.registry.mappers
+        if tables is None or mapper.class_.__tablename__ in tables
+    ]
+    for model in sorted(models, key=lambda model: model.__tablename__):
+        await export_table(model, directory, fmt, chunk_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка таблиц")
+    parser.add_argument("tables", nargs="*", help="таблицы (по умолчанию все)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--dir", default=EXPORT_DIR)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    run(main(args.tables or None, args.dir, args.format, args.chunk_size))
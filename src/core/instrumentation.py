@@ -0,0 +1,388 @@
+import bisect
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import asyncpg
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import (
+    INSTRUMENTATION_REPORT_PATH,
+    INSTRUMENTATION_TOP,
+    SLOW_QUERY_EXPLAIN_LIMIT,
+    SLOW_QUERY_THRESHOLD,
+)
+from src.core.db import raw_connection
+
+# Верхние границы корзин гистограммы задержек, мс (последняя — все остальное)
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+SPARK = " ▁▂▃▄▅▆▇█"
+
+# EXPLAIN ANALYZE выполняет запрос, поэтому объясняются только DML/SELECT (и откатываются)
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.I)
+_VALUES_RE = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_PARAMS_RE = re.compile(r"\$\d+(?:::\w+)?(?:\s*,\s*\$\d+(?:::\w+)?){3,}")
+
+console = Console()
+
+
+def normalize(statement: str) -> str:
+    """Ключ статистики: без лишних пробелов, со свернутыми списками VALUES и параметров."""
+    statement = " ".join(statement.split())
+    statement = _VALUES_RE.sub(r"\1, ...", statement)
+    return _PARAMS_RE.sub("$n, ...", statement)
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    )
+
+    def add(self, elapsed_ms: float):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Оценка процентиля по гистограмме: верхняя граница корзины."""
+        target, seen = q / 100 * self.calls, 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return (
+                    LATENCY_BUCKETS_MS[i]
+                    if i < len(LATENCY_BUCKETS_MS)
+                    else self.max_ms
+                )
+        return self.max_ms
+
+    def sparkline(self) -> str:
+        peak = max(self.buckets) or 1
+        return "".join(
+            SPARK[round(count / peak * (len(SPARK) - 1))] for count in self.buckets
+        )
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    parameters: list
+    elapsed_ms: float
+    plan: str | None = None
+
+
+class Instrumentation:
+    """
+    Хуки before/after_cursor_execute на всех движках SQLAlchemy процесса: гистограммы
+    задержек по нормализованным запросам и журнал медленных запросов. Планы медленных
+    запросов снимаются позже (explain_slow_queries), чтобы не мешать замерам.
+    Нативные вызовы asyncpg (COPY, реестр подготовленных запросов) хуки не видят —
+    их учитывает разница pg_stat_statements.
+    """
+
+    def __init__(self, slow_threshold: float = SLOW_QUERY_THRESHOLD):
+        self.slow_threshold_ms = slow_threshold * 1000
+        self.statements: dict[str, StatementStats] = {}
+        self.slow_queries: dict[str, SlowQuery] = {}
+        self.installed = False
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        key = normalize(statement)
+        self.statements.setdefault(key, StatementStats()).add(elapsed_ms)
+        if elapsed_ms >= self.slow_threshold_ms:
+            slow = self.slow_queries.get(key)
+            if slow is None or slow.elapsed_ms < elapsed_ms:
+                # Для executemany план снимается по первому набору параметров
+                params = parameters[0] if executemany and parameters else parameters
+                self.slow_queries[key] = SlowQuery(
+                    statement, list(params or ()), elapsed_ms
+                )
+
+    def _error(self, context):
+        # Упавший запрос не доходит до after_cursor_execute
+        if context.connection is not None and context.connection.info.get(
+            "query_start"
+        ):
+            context.connection.info["query_start"].pop()
+
+    def install(self):
+        # Слушатели на классе Engine переживают dispose_engine() и пересоздание движка
+        event.listen(Engine, "before_cursor_execute", self._before)
+        event.listen(Engine, "after_cursor_execute", self._after)
+        event.listen(Engine, "handle_error", self._error)
+        self.installed = True
+
+    def uninstall(self):
+        if self.installed:
+            event.remove(Engine, "before_cursor_execute", self._before)
+            event.remove(Engine, "after_cursor_execute", self._after)
+            event.remove(Engine, "handle_error", self._error)
+            self.installed = False
+
+    async def explain_slow_queries(self, limit: int = SLOW_QUERY_EXPLAIN_LIMIT):
+        """EXPLAIN (ANALYZE, BUFFERS) самых медленных запросов в откатываемой транзакции."""
+        slowest = sorted(
+            self.slow_queries.values(), key=lambda slow: slow.elapsed_ms, reverse=True
+        )[:limit]
+        async with raw_connection() as conn:
+            for slow in slowest:
+                if not _EXPLAINABLE_RE.match(slow.statement):
+                    continue
+                transaction = conn.transaction()
+                await transaction.start()
+                try:
+                    rows = await conn.fetch(
+                        f"EXPLAIN (ANALYZE, BUFFERS) {slow.statement}", *slow.parameters
+                    )
+                    slow.plan = "\n".join(row[0] for row in rows)
+                except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                    slow.plan = f"EXPLAIN не выполнен: {e}"
+                finally:
+                    await transaction.rollback()
+
+    def report(self, before: dict | None = None, after: dict | None = None) -> dict:
+        statements = sorted(
+            self.statements.items(), key=lambda item: item[1].total_ms, reverse=True
+        )
+        return {
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            "statements": [_statement_entry(key, stats) for key, stats in statements],
+            "slow_queries": [
+                asdict(slow)
+                for slow in sorted(
+                    self.slow_queries.values(),
+                    key=lambda slow: slow.elapsed_ms,
+                    reverse=True,
+                )
+            ],
+            **stat_deltas(before, after),
+        }
+
+
+def _statement_entry(key: str, stats: StatementStats) -> dict:
+    return {
+        "statement": key,
+        **asdict(stats),
+        "mean_ms": stats.total_ms / stats.calls,
+        "p50_ms": stats.percentile(50),
+        "p95_ms": stats.percentile(95),
+        "p99_ms": stats.percentile(99),
+    }
+
+
+def merge_reports(reports: list[dict], top: int = INSTRUMENTATION_TOP) -> dict:
+    """Сводит отчеты нескольких процессов (по одному на тестовый модуль) в один."""
+    statements: dict[str, StatementStats] = {}
+    functions: dict[str, dict] = {}
+    queries: dict[str, dict] = {}
+    slow_queries, have_statements = [], False
+    for report in reports:
+        for item in report["statements"]:
+            stats = statements.setdefault(item["statement"], StatementStats())
+            stats.calls += item["calls"]
+            stats.total_ms += item["total_ms"]
+            stats.max_ms = max(stats.max_ms, item["max_ms"])
+            stats.buckets = [a + b for a, b in zip(stats.buckets, item["buckets"])]
+        for item in report["functions"]:
+            merged = functions.setdefault(
+                item["function"],
+                {"function": item["function"], "calls": 0, "total_ms": 0, "self_ms": 0},
+            )
+            for key in ("calls", "total_ms", "self_ms"):
+                merged[key] += item[key]
+        if report["pg_stat_statements"] is not None:
+            have_statements = True
+            for item in report["pg_stat_statements"]:
+                merged = queries.setdefault(
+                    item["query"],
+                    {"query": item["query"], "calls": 0, "total_ms": 0, "rows": 0},
+                )
+                for key in ("calls", "total_ms", "rows"):
+                    merged[key] += item[key]
+        slow_queries.extend(report["slow_queries"])
+
+    def by_total(items):
+        return sorted(items, key=lambda item: item["total_ms"], reverse=True)
+
+    return {
+        "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+        "statements": by_total(
+            _statement_entry(key, stats) for key, stats in statements.items()
+        ),
+        "slow_queries": sorted(
+            slow_queries, key=lambda slow: slow["elapsed_ms"], reverse=True
+        ),
+        "functions": by_total(functions.values()),
+        "pg_stat_statements": (
+            by_total(queries.values())[:top] if have_statements else None
+        ),
+    }
+
+
+async def snapshot_stats() -> dict:
+    """Снимок pg_stat_user_functions и pg_stat_statements (если расширение загружено)."""
+    async with raw_connection() as conn:
+        # Статистика в транзакции кэшируется: сбрасываем, чтобы прочитать свежую
+        await conn.execute("SELECT pg_stat_clear_snapshot()")
+        functions = await conn.fetch(
+            "SELECT schemaname || '.' || funcname AS name, calls, total_time, self_time "
+            "FROM pg_stat_user_functions"
+        )
+        try:
+            statements = await conn.fetch(
+                "SELECT queryid, query, calls, total_exec_time, rows "
+                "FROM pg_stat_statements WHERE dbid = "
+                "(SELECT oid FROM pg_database WHERE datname = current_database())"
+            )
+        except (
+            asyncpg.UndefinedTableError,
+            asyncpg.ObjectNotInPrerequisiteStateError,
+        ):
+            statements = None
+    return {
+        "functions": {row["name"]: dict(row) for row in functions},
+        "statements": (
+            None
+            if statements is None
+            else {row["queryid"]: dict(row) for row in statements}
+        ),
+    }
+
+
+def stat_deltas(
+    before: dict | None, after: dict | None, top: int = INSTRUMENTATION_TOP
+):
+    """Разница снимков: функции (в том числе триггерные) и запросы за время прогона."""
+    if not before or not after:
+        return {"functions": [], "pg_stat_statements": None}
+
+    functions = []
+    for name, row in after["functions"].items():
+        old = before["functions"].get(
+            name, {"calls": 0, "total_time": 0, "self_time": 0}
+        )
+        calls = row["calls"] - old["calls"]
+        if calls > 0:
+            functions.append(
+                {
+                    "function": name,
+                    "calls": calls,
+                    "total_ms": row["total_time"] - old["total_time"],
+                    "self_ms": row["self_time"] - old["self_time"],
+                }
+            )
+    functions.sort(key=lambda item: item["total_ms"], reverse=True)
+
+    statements = None
+    if before["statements"] is not None and after["statements"] is not None:
+        statements = []
+        for queryid, row in after["statements"].items():
+            old = before["statements"].get(
+                queryid, {"calls": 0, "total_exec_time": 0, "rows": 0}
+            )
+            calls = row["calls"] - old["calls"]
+            if calls > 0:
+                statements.append(
+                    {
+                        "query": row["query"],
+                        "calls": calls,
+                        "total_ms": row["total_exec_time"] - old["total_exec_time"],
+                        "rows": row["rows"] - old["rows"],
+                    }
+                )
+        statements.sort(key=lambda item: item["total_ms"], reverse=True)
+        statements = statements[:top]
+    return {"functions": functions, "pg_stat_statements": statements}
+
+
+def _short(statement: str, width: int = 80) -> str:
+    return statement if len(statement) <= width else statement[: width - 1] + "…"
+
+
+def print_report(report: dict, top: int = INSTRUMENTATION_TOP):
+    table = Table(title="Запросы SQLAlchemy: задержки (мс)")
+    for column in (
+        "Запрос",
+        "Вызовов",
+        "Всего",
+        "Среднее",
+        "p95",
+        "Макс",
+        "Гистограмма",
+    ):
+        table.add_column(column)
+    for item in report["statements"][:top]:
+        table.add_row(
+            _short(item["statement"]),
+            str(item["calls"]),
+            f"{item['total_ms']:.1f}",
+            f"{item['mean_ms']:.2f}",
+            f"≤{item['p95_ms']:g}",
+            f"{item['max_ms']:.1f}",
+            StatementStats(buckets=item["buckets"]).sparkline(),
+        )
+    console.print(table)
+
+    if report["functions"]:
+        table = Table(title="Функции и триггеры PostgreSQL (pg_stat_user_functions)")
+        for column in (
+            "Функция",
+            "Вызовов",
+            "Всего, мс",
+            "Собственное, мс",
+            "мс/вызов",
+        ):
+            table.add_column(column)
+        for item in report["functions"][:top]:
+            table.add_row(
+                item["function"],
+                str(item["calls"]),
+                f"{item['total_ms']:.1f}",
+                f"{item['self_ms']:.1f}",
+                f"{item['total_ms'] / item['calls']:.3f}",
+            )
+        console.print(table)
+    else:
+        console.print(
+            "[yellow]⚠ pg_stat_user_functions пуст: нужен TRACK_FUNCTIONS = 'pl' "
+            "(и права суперпользователя)[/]"
+        )
+
+    if report["pg_stat_statements"] is not None:
+        table = Table(title="pg_stat_statements за прогон")
+        for column in ("Запрос", "Вызовов", "Всего, мс", "Строк"):
+            table.add_column(column)
+        for item in report["pg_stat_statements"]:
+            table.add_row(
+                _short(" ".join(item["query"].split())),
+                str(item["calls"]),
+                f"{item['total_ms']:.1f}",
+                str(item["rows"]),
+            )
+        console.print(table)
+
+    for slow in report["slow_queries"][:top]:
+        console.rule(f"[bold red]Медленный запрос: {slow['elapsed_ms']:.1f} мс[/]")
+        console.print(_short(" ".join(slow["statement"].split()), 300))
+        if slow["plan"]:
+            console.print(slow["plan"], highlight=False)
+
+
+def write_report(report: dict, path: str = INSTRUMENTATION_REPORT_PATH):
+    Path(path).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+    )
@@ -0,0 +1,175 @@
+import argparse
+from dataclasses import dataclass
+
+import asyncpg
+from rich.console import Console
+from rich.table import Table
+
+from src.config import MIGRATION_LOCK_TIMEOUT
+from src.core.db import raw_connection, run
+
+console = Console()
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+# Применяются по возрастанию версии, каждая в своей транзакции вместе с записью в
+# schema_migrations. Выполненные миграции не меняются: исправления — новой версией.
+# IF NOT EXISTS: базы, где индекс уже создан вручную, мигрируют без ошибки.
+MIGRATIONS = [
+    Migration(
+        1,
+        "trigger_access_paths",
+        (
+            # Операции ресурса по времени: история ресурса и каскадное удаление
+            # из resources (FK resource_id); на секционированной таблице индекс
+            # создается в каждой партиции, включая будущие
+            "CREATE INDEX IF NOT EXISTS idx_resource_operations_resource_date "
+            "ON resource_operations (resource_id, date)",
+            "CREATE INDEX IF NOT EXISTS idx_resource_operations_settlement_date "
+            "ON resource_operations (settlement_id, date)",
+            # update_incident_status(): закрываются только открытые инциденты ресурса
+            "CREATE INDEX IF NOT EXISTS idx_incidents_open_resource "
+            "ON incidents (resource_id) WHERE status = 'open'",
+            # Эскалация просроченных задач (src/core/sweeper.py): первый по id
+            # сотрудник с нужной должностью без сортировки
+            "CREATE INDEX IF NOT EXISTS idx_personnel_position "
+            "ON personnel (position, id)",
+            # Непрочитанные уведомления, новые первыми
+            "CREATE INDEX IF NOT EXISTS idx_notifications_unread "
+            "ON notifications (timestamp) WHERE status = 'unread'",
+        ),
+    ),
+    Migration(
+        2,
+        "foreign_key_indexes",
+        (
+            # Каскадное удаление объекта инфраструктуры и выборки по нему
+            "CREATE INDEX IF NOT EXISTS idx_sensors_devices_infrastructure "
+            "ON sensors_devices (infrastructure_id)",
+            "CREATE INDEX IF NOT EXISTS idx_energy_systems_infrastructure "
+            "ON energy_systems (infrastructure_id)",
+            "CREATE INDEX IF NOT EXISTS idx_personnel_infrastructure "
+            "ON personnel (infrastructure_id)",
+            # Каскадное удаление ресурса: инциденты любого статуса и планы
+            "CREATE INDEX IF NOT EXISTS idx_incidents_resource "
+            "ON incidents (resource_id)",
+            "CREATE INDEX IF NOT EXISTS idx_resource_plans_resource "
+            "ON resource_plans (resource_id)",
+            "CREATE INDEX IF NOT EXISTS idx_events_settlement "
+            "ON events (settlement_id)",
+        ),
+    ),
+]
+
+
+async def ensure_migrations_table(conn: asyncpg.Connection):
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """
+    )
+
+
+async def applied_versions(conn: asyncpg.Connection) -> set[int]:
+    await ensure_migrations_table(conn)
+    return {
+        row["version"]
+        for row in await conn.fetch("SELECT version FROM schema_migrations")
+    }
+
+
+async def migrate(
+    conn: asyncpg.Connection | None = None,
+    *,
+    target: int | None = None,
+    lock_timeout: str = MIGRATION_LOCK_TIMEOUT,
+) -> list[Migration]:
+    """
+    Применяет недостающие миграции до версии target (по умолчанию все); возвращает
+    примененные. CREATE INDEX держит блокировку записи в таблицу, поэтому ожидание
+    ее ограничено lock_timeout: миграция падает, а не выстраивает очередь запросов
+    за долгой транзакцией. Параллельные вызовы упорядочены advisory-блокировкой.
+    """
+    if conn is None:
+        async with raw_connection() as conn:
+            return await migrate(conn, target=target, lock_timeout=lock_timeout)
+
+    applied = []
+    done = await applied_versions(conn)
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done or (
+            target is not None and migration.version > target
+        ):
+            continue
+        async with conn.transaction():
+            await conn.execute(
+                "SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"
+            )
+            # Версию мог применить параллельный вызов, пока мы ждали блокировку
+            if await conn.fetchval(
+                "SELECT 1 FROM schema_migrations WHERE version = $1", migration.version
+            ):
+                continue
+            await conn.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+            for statement in migration.statements:
+                await conn.execute(statement)
+            await conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                migration.version,
+                migration.name,
+            )
+        applied.append(migration)
+        console.print(
+            f"[green]✔[/] Миграция [bold]{migration.version}[/] {migration.name} применена"
+        )
+    return applied
+
+
+async def print_status(conn: asyncpg.Connection | None = None):
+    if conn is None:
+        async with raw_connection() as conn:
+            return await print_status(conn)
+    await ensure_migrations_table(conn)
+    applied = {
+        row["version"]: row["applied_at"]
+        for row in await conn.fetch("SELECT version, applied_at FROM schema_migrations")
+    }
+    table = Table(title="Миграции схемы")
+    for column in ("Версия", "Название", "Применена"):
+        table.add_column(column)
+    for migration in MIGRATIONS:
+        applied_at = applied.get(migration.version)
+        table.add_row(
+            str(migration.version),
+            migration.name,
+            "[yellow]нет[/]" if applied_at is None else f"{applied_at:%Y-%m-%d %H:%M}",
+        )
+    console.print(table)
+
+
+async def main(target: int | None = None, status: bool = False):
+    if not status:
+        applied = await migrate(target=target)
+        if not applied:
+            console.print("[bold green]✅ Схема актуальна[/]")
+    await print_status()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Миграции схемы")
+    parser.add_argument("--target", type=int, help="применить миграции до версии")
+    parser.add_argument(
+        "--status", action="store_true", help="только показать примененные версии"
+    )
+    args = parser.parse_args()
+    run(main(args.target, args.status))
@@ -1,12 +1,14 @@
 from typing import Optional
 
-import Geometry
 from sqlalchemy import (
+    BigInteger,
     Integer,
     String,
     ForeignKey,
     Text,
     DateTime,
+    Date,
+    UniqueConstraint,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, mapped_column
@@ -44,7 +46,9 @@ class GeoZone(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(50), nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
-    coordinates: Mapped[Geometry] = mapped_column(Geometry("POLYGON"), nullable=False)
+    coordinates: Mapped[Geometry] = mapped_column(
+        Geometry("POLYGON", srid=4326), nullable=False
+    )
     description: Mapped[str] = mapped_column(String(255), nullable=True)
     usage_type: Mapped[str] = mapped_column(String(50), nullable=False)
 
@@ -63,10 +67,20 @@ class Incident(Base):
 
 class Infrastructure(Base):
     __tablename__ = "infrastructure"
+    __table_args__ = (
+        UniqueConstraint(
+            "settlement_id",
+            "name",
+            name="infrastructure_settlement_name_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
-    settlement_id: Mapped[int] = mapped_column(Integer, ForeignKey("settlements.id"))
+    settlement_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("settlements.id")
+    )
 
 
 class LogisticRoute(Base):
@@ -74,8 +88,14 @@ class LogisticRoute(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[Text] = mapped_column(Text, nullable=False)
-    waypoints: Mapped[Text] = mapped_column(Text)  # Assuming geometry is stored as text
+    waypoints: Mapped[Geometry] = mapped_column(Geometry("LINESTRING", srid=4326))
     status: Mapped[str] = mapped_column(String(50), nullable=False)
+    from_settlement_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("settlements.id")
+    )
+    to_settlement_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("settlements.id")
+    )
 
 
 class Notification(Base):
@@ -99,6 +119,20 @@ class Personnel(Base):
     )
 
 
+class ResourceBalance(Base):
+    __tablename__ = "resource_balances"
+    resource_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("resources.id"), primary_key=True
+    )
+    settlement_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("settlements.id"), primary_key=True
+    )
+    quantity: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime, default=func.now(), nullable=False
+    )
+
+
 class ResourceOperation(Base):
     __tablename__ = "resource_operations"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -109,6 +143,34 @@ class ResourceOperation(Base):
     operation_type: Mapped[str] = mapped_column(String(20), nullable=False)
 
 
+class ResourceOperationHourly(Base):
+    __tablename__ = "resource_operations_hourly"
+    resource_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("resources.id"), primary_key=True
+    )
+    settlement_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("settlements.id"), primary_key=True
+    )
+    bucket: Mapped[DateTime] = mapped_column(DateTime, primary_key=True)
+    consumed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    replenished: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    operations: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ResourceOperationDaily(Base):
+    __tablename__ = "resource_operations_daily"
+    resource_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("resources.id"), primary_key=True
+    )
+    settlement_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("settlements.id"), primary_key=True
+    )
+    bucket: Mapped[Date] = mapped_column(Date, primary_key=True)
+    consumed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    replenished: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    operations: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 class ResourcePlan(Base):
     __tablename__ = "resource_plans"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -121,11 +183,31 @@ class ResourcePlan(Base):
 
 class Resource(Base):
     __tablename__ = "resources"
+    __table_args__ = (
+        UniqueConstraint(
+            "settlement_id",
+            "name",
+            name="resources_settlement_name_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     unit: Mapped[str] = mapped_column(String(20), nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
-    settlement_id: Mapped[int] = mapped_column(Integer, ForeignKey("settlements.id"))
+    settlement_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("settlements.id")
+    )
+
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_batch: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    refreshed_at: Mapped[DateTime] = mapped_column(
+        DateTime, default=func.now(), nullable=False
+    )
 
 
 class Route(Base):
@@ -133,7 +215,7 @@ class Route(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[Text] = mapped_column(Text, nullable=False)
-    waypoints: Mapped[Text] = mapped_column(Text)  # Assuming geometry is stored as text
+    waypoints: Mapped[Geometry] = mapped_column(Geometry("LINESTRING", srid=4326))
     status: Mapped[str] = mapped_column(String(50), nullable=False)
 
 
@@ -152,8 +234,17 @@ class SensorDevice(Base):
     energy_consumption: Mapped[int] = mapped_column(Integer, nullable=False)
 
 
+class SensorReading(Base):
+    __tablename__ = "sensor_readings"
+    # В таблице нет первичного ключа; для ORM ключом служит пара (датчик, время)
+    sensor_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    recorded_at: Mapped[DateTime] = mapped_column(DateTime, primary_key=True)
+    energy_consumption: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
 class Settlement(Base):
     __tablename__ = "settlements"
+    __table_args__ = (UniqueConstraint("name", name="settlements_name_key"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     region: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -176,7 +267,5 @@ class TransportVehicle(Base):
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
     status: Mapped[str] = mapped_column(String(50), nullable=False)
-    current_location: Mapped[Text] = mapped_column(
-        Text
-    )  # Assuming geometry is stored as text
+    current_location: Mapped[Geometry] = mapped_column(Geometry("POINT", srid=4326))
     fuel_reserve: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,184 @@
+import re
+from datetime import datetime, timedelta
+
+import asyncpg
+from rich.console import Console
+
+from src.config import PARTITION_INTERVAL, PARTITION_PREMAKE
+from src.core.db import raw_connection, run
+
+# Партиционированные по диапазону таблицы и их ключ партиционирования
+PARTITIONED_TABLES = {
+    "resource_operations": "date",
+    "sensor_readings": "recorded_at",
+}
+PARTITION_INTERVALS = ("month", "week")
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+console = Console()
+
+
+def period_start(value: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    """Начало месяца или недели (понедельник), совпадает с date_trunc в PostgreSQL."""
+    day = datetime(value.year, value.month, value.day)
+    if interval == "month":
+        return day.replace(day=1)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Неизвестный интервал партиционирования: {interval}")
+
+
+def next_period(start: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(weeks=1)
+
+
+def partition_name(table: str, start: datetime, interval: str) -> str:
+    if interval == "month":
+        return f"{table}_y{start:%Y}m{start:%m}"
+    iso_year, iso_week, _ = start.isocalendar()
+    return f"{table}_y{iso_year}w{iso_week:02d}"
+
+
+def _parse_bound(bound: str) -> datetime:
+    if bound == "MINVALUE":
+        return datetime.min
+    if bound == "MAXVALUE":
+        return datetime.max
+    return datetime.fromisoformat(bound.strip("'"))
+
+
+async def get_partitions(conn: asyncpg.Connection, table: str):
+    """Возвращает (имя партиции по умолчанию, [(имя, нижняя граница, верхняя граница)])."""
+    rows = await conn.fetch(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+        """,
+        table,
+    )
+    default, ranges = None, []
+    for row in rows:
+        if row["bound"] == "DEFAULT":
+            default = row["relname"]
+            continue
+        match = _BOUND_RE.search(row["bound"])
+        if match:
+            lower, upper = (_parse_bound(bound) for bound in match.groups())
+            ranges.append((row["relname"], lower, upper))
+    return default, sorted(ranges, key=lambda item: item[1])
+
+
+async def ensure_default_partition(conn: asyncpg.Connection, table: str) -> str:
+    default, _ = await get_partitions(conn, table)
+    if default is None:
+        default = f"{table}_default"
+        await conn.execute(f"CREATE TABLE {default} PARTITION OF {table} DEFAULT")
+        console.print(f"[green]✔[/] Создана партиция по умолчанию [bold]{default}[/]")
+    return default
+
+
+async def create_partition(
+    conn: asyncpg.Connection,
+    table: str,
+    start: datetime,
+    interval: str = PARTITION_INTERVAL,
+) -> str | None:
+    """
+    Создает партицию [start, следующий период) и переносит в нее строки из партиции
+    по умолчанию. Возвращает имя созданной партиции или None, если диапазон уже покрыт.
+    """
+    column = PARTITIONED_TABLES[table]
+    end = next_period(start, interval)
+    default, ranges = await get_partitions(conn, table)
+    if any(lower < end and start < upper for _, lower, upper in ranges):
+        return None
+
+    name = partition_name(table, start, interval)
+    lower, upper = f"'{start.isoformat()}'", f"'{end.isoformat()}'"
+    bounds = f"FROM ({lower}) TO ({upper})"
+    async with conn.transaction():
+        if default is None:
+            await conn.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"
+            )
+            return name
+
+        # Строки переносятся как есть: триггеры уже отработали при исходной вставке
+        await conn.execute("SET LOCAL session_replication_role = replica")
+        await conn.execute(
+            f"""
+            CREATE TEMP TABLE moved_rows ON COMMIT DROP AS
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE {column} >= {lower} AND {column} < {upper}
+                RETURNING *
+            )
+            SELECT * FROM moved
+            """
+        )
+        await conn.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"
+        )
+        moved = await conn.execute(f"INSERT INTO {name} SELECT * FROM moved_rows")
+    console.print(
+        f"[green]✔[/] Создана партиция [bold]{name}[/] "
+        f"(перенесено строк из {default}: {moved.split()[-1]})"
+    )
+    return name
+
+
+async def maintain_partitions(
+    conn: asyncpg.Connection | None = None,
+    *,
+    table: str = "resource_operations",
+    interval: str = PARTITION_INTERVAL,
+    ahead: int = PARTITION_PREMAKE,
+) -> list[str]:
+    """
+    Идемпотентно готовит партиции таблицы: партицию по умолчанию, партиции с текущего
+    периода на ahead периодов вперед и партиции для строк, осевших в партиции по умолчанию.
+    """
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError(f"Неизвестный интервал партиционирования: {interval}")
+
+    if conn is None:
+        async with raw_connection() as conn:
+            return await maintain_partitions(
+                conn, table=table, interval=interval, ahead=ahead
+            )
+
+    default = await ensure_default_partition(conn, table)
+
+    starts = {period_start(datetime.now(), interval)}
+    for _ in range(ahead):
+        starts.add(next_period(max(starts), interval))
+
+    column = PARTITIONED_TABLES[table]
+    stray = await conn.fetch(
+        f"SELECT DISTINCT date_trunc('{interval}', {column}) AS start FROM {default}"
+    )
+    starts.update(row["start"] for row in stray)
+
+    created = []
+    for start in sorted(starts):
+        name = await create_partition(conn, table, start, interval)
+        if name:
+            created.append(name)
+    return created
+
+
+async def main():
+    for table in PARTITIONED_TABLES:
+        created = await maintain_partitions(table=table)
+        console.print(
+            f"[bold green]✅ Партиции {table} актуальны[/] (создано новых: {len(created)})"
+        )
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,137 @@
+import weakref
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import asyncpg
+
+from src.config import DB_PGBOUNCER, PREPARED_CACHE_SIZE
+from src.core.db import raw_connection
+
+QUERY_KINDS = ("fetch", "fetchrow", "fetchval")
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    sql: str  # Типы параметров задаются явными приведениями ($1::int)
+    kind: str = "fetchval"
+
+
+@dataclass
+class PreparedStats:
+    calls: int = 0
+    prepares: int = 0
+    hits: int = 0
+    evictions: int = 0
+    reprepares: int = 0  # Выражение стало недействительным (DDL, смена соединения)
+
+
+HOT_QUERIES: dict[str, HotQuery] = {}
+
+
+def register(name: str, sql: str, kind: str = "fetchval") -> HotQuery:
+    if kind not in QUERY_KINDS:
+        raise ValueError(f"Неизвестный вид запроса: {kind}")
+    query = HotQuery(name, sql, kind)
+    HOT_QUERIES[name] = query
+    return query
+
+
+# Текущий уровень ресурса по всем поселениям (проверка критического порога)
+register(
+    "resource_level",
+    "SELECT COALESCE(SUM(quantity), 0) FROM resource_balances WHERE resource_id = $1::int",
+)
+register(
+    "balance",
+    "SELECT quantity FROM resource_balances "
+    "WHERE resource_id = $1::int AND settlement_id = $2::int",
+)
+register(
+    "settlement_by_name",
+    "SELECT id FROM settlements WHERE name = $1::varchar",
+)
+register(
+    "notification_count",
+    "SELECT count(*) FROM notifications WHERE type = $1::varchar AND message LIKE $2::text",
+)
+
+
+class PreparedRegistry:
+    """
+    Выполняет зарегистрированные запросы через asyncpg: каждый подготавливается один
+    раз на соединение, подготовленные выражения хранятся в LRU-кэше соединения.
+    В режиме pgbouncer (транзакционный пул) серверное соединение между транзакциями
+    может смениться, поэтому выражения не хранятся: каждый вызов идет безымянным
+    выражением Parse/Bind/Execute.
+    """
+
+    def __init__(
+        self,
+        queries: dict[str, HotQuery] = HOT_QUERIES,
+        *,
+        cache_size: int = PREPARED_CACHE_SIZE,
+        pgbouncer: bool = DB_PGBOUNCER,
+    ):
+        self.queries = queries
+        self.cache_size = cache_size
+        self.pgbouncer = pgbouncer
+        self.stats = PreparedStats()
+        self._statements: weakref.WeakKeyDictionary[
+            asyncpg.Connection,
+            OrderedDict[str, asyncpg.prepared_stmt.PreparedStatement],
+        ] = weakref.WeakKeyDictionary()
+
+    async def _prepare(self, conn: asyncpg.Connection, query: HotQuery):
+        cache = self._statements.setdefault(conn, OrderedDict())
+        statement = cache.get(query.name)
+        if statement is not None:
+            cache.move_to_end(query.name)
+            self.stats.hits += 1
+            return statement
+        statement = await conn.prepare(query.sql)
+        self.stats.prepares += 1
+        cache[query.name] = statement
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+            self.stats.evictions += 1
+        return statement
+
+    async def execute(self, conn: asyncpg.Connection, name: str, *args):
+        query = self.queries[name]
+        self.stats.calls += 1
+        if self.pgbouncer:
+            return await getattr(conn, query.kind)(query.sql, *args)
+
+        statement = await self._prepare(conn, query)
+        try:
+            return await getattr(statement, query.kind)(*args)
+        except (
+            asyncpg.InvalidSQLStatementNameError,
+            asyncpg.InvalidCachedStatementError,
+        ):
+            # Выражение пропало на сервере или его план устарел после DDL
+            self._statements[conn].pop(name, None)
+            self.stats.reprepares += 1
+            statement = await self._prepare(conn, query)
+            return await getattr(statement, query.kind)(*args)
+
+    def invalidate(self, conn: asyncpg.Connection | None = None) -> None:
+        if conn is None:
+            self._statements.clear()
+        else:
+            self._statements.pop(conn, None)
+
+    def stats_dict(self) -> dict:
+        return asdict(self.stats)
+
+
+registry = PreparedRegistry()
+
+
+async def hot_query(name: str, *args, conn: asyncpg.Connection | None = None):
+    """Выполняет запрос из реестра на переданном или взятом из пула соединении."""
+    if conn is None:
+        async with raw_connection() as conn:
+            return await registry.execute(conn, name, *args)
+    return await registry.execute(conn, name, *args)
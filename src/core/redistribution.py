@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+from geoalchemy2 import Geography
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import cast, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    REDISTRIBUTION_INTERVAL,
+    REDISTRIBUTION_RESERVE,
+    REDISTRIBUTION_TARGET,
+    REDISTRIBUTION_UNROUTED_COST,
+)
+from src.core.db import get_session, run
+from src.core.models import LogisticRoute, ResourceBalance, ResourceOperation
+from src.core.triggers import get_redistribution_mode
+
+console = Console()
+
+
+@dataclass
+class Transfer:
+    resource_id: int
+    source_id: int
+    target_id: int
+    quantity: int
+    cost: int  # Стоимость перевозки единицы ресурса (длина пути, м)
+
+
+class MinCostFlow:
+    """Поток минимальной стоимости: последовательные кратчайшие пути (Дейкстра с потенциалами)."""
+
+    def __init__(self, nodes: int):
+        # Ребро: [куда, остаточная пропускная способность, стоимость, индекс обратного]
+        self.graph: list[list[list[int]]] = [[] for _ in range(nodes)]
+
+    def add_edge(self, u: int, v: int, capacity: int, cost: int) -> tuple[int, int]:
+        self.graph[u].append([v, capacity, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return u, len(self.graph[u]) - 1
+
+    def solve(self, source: int, sink: int) -> tuple[int, int]:
+        nodes = len(self.graph)
+        potential = [0] * nodes  # Стоимости исходных ребер неотрицательны
+        flow = cost = 0
+        while True:
+            dist = [None] * nodes
+            parent = [None] * nodes
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                for i, (v, capacity, edge_cost, _) in enumerate(self.graph[u]):
+                    if capacity <= 0:
+                        continue
+                    nd = d + edge_cost + potential[u] - potential[v]
+                    if dist[v] is None or nd < dist[v]:
+                        dist[v] = nd
+                        parent[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+            if dist[sink] is None:
+                return flow, cost
+
+            for v in range(nodes):
+                if dist[v] is not None:
+                    potential[v] += dist[v]
+
+            push = None
+            v = sink
+            while v != source:
+                u, i = parent[v]
+                capacity = self.graph[u][i][1]
+                push = capacity if push is None else min(push, capacity)
+                v = u
+            v = sink
+            while v != source:
+                u, i = parent[v]
+                edge = self.graph[u][i]
+                edge[1] -= push
+                self.graph[v][edge[3]][1] += push
+                cost += push * edge[2]
+                v = u
+            flow += push
+
+
+def shortest_route_costs(
+    routes: list[tuple[int, int, float]],
+) -> dict[tuple[int, int], int]:
+    """
+    Стоимость перевозки между всеми парами поселений по сети маршрутов: маршруты
+    считаются двусторонними, пути через промежуточные поселения — Флойд–Уоршелл.
+    """
+    settlements = sorted({s for route in routes for s in route[:2]})
+    index = {settlement: i for i, settlement in enumerate(settlements)}
+    dist = np.full((len(settlements), len(settlements)), np.inf)
+    np.fill_diagonal(dist, 0)
+    for source, target, length in routes:
+        i, j = index[source], index[target]
+        dist[i, j] = dist[j, i] = min(dist[i, j], length)
+    for k in range(len(settlements)):
+        dist = np.minimum(dist, dist[:, k, None] + dist[None, k, :])
+    return {
+        (a, b): int(round(dist[i, j]))
+        for a, i in index.items()
+        for b, j in index.items()
+        if a != b and np.isfinite(dist[i, j])
+    }
+
+
+def plan_transfers(
+    balances: list[tuple[int, int, int]],
+    route_costs: dict[tuple[int, int], int],
+    *,
+    reserve: int = REDISTRIBUTION_RESERVE,
+    target: int = REDISTRIBUTION_TARGET,
+    unrouted_cost: int | None = REDISTRIBUTION_UNROUTED_COST,
+) -> list[Transfer]:
+    """
+    Для каждого ресурса решает транспортную задачу: излишки сверх max(reserve, target)
+    покрывают дефициты до target с минимальной суммарной стоимостью перевозок.
+    Если излишков не хватает, покрывается максимально возможный объем.
+    """
+    by_resource = defaultdict(list)
+    for resource_id, settlement_id, quantity in balances:
+        by_resource[resource_id].append((settlement_id, quantity))
+
+    keep = max(reserve, target)
+    transfers = []
+    for resource_id, stocks in by_resource.items():
+        supplies = [(s, q - keep) for s, q in stocks if q > keep]
+        demands = [(s, target - q) for s, q in stocks if q < target]
+        if not supplies or not demands:
+            continue
+
+        # Узлы: 0 — исток, 1 — сток, затем доноры и получатели
+        network = MinCostFlow(2 + len(supplies) + len(demands))
+        edges = []
+        for i, (source_id, supply) in enumerate(supplies, start=2):
+            network.add_edge(0, i, supply, 0)
+            for j, (target_id, demand) in enumerate(demands, start=2 + len(supplies)):
+                cost = route_costs.get((source_id, target_id), unrouted_cost)
+                if cost is None:
+                    continue
+                edge = network.add_edge(i, j, min(supply, demand), cost)
+                edges.append((edge, source_id, target_id, cost))
+        for j, (_, demand) in enumerate(demands, start=2 + len(supplies)):
+            network.add_edge(j, 1, demand, 0)
+        network.solve(0, 1)
+
+        for (u, i), source_id, target_id, cost in edges:
+            v, _, _, reverse = network.graph[u][i]
+            moved = network.graph[v][reverse][1]
+            if moved > 0:
+                transfers.append(
+                    Transfer(resource_id, source_id, target_id, moved, cost)
+                )
+    return transfers
+
+
+async def load_route_costs(session: AsyncSession) -> dict[tuple[int, int], int]:
+    result = await session.execute(
+        select(
+            LogisticRoute.from_settlement_id,
+            LogisticRoute.to_settlement_id,
+            func.ST_Length(cast(LogisticRoute.waypoints, Geography)),
+        ).where(
+            LogisticRoute.from_settlement_id.is_not(None),
+            LogisticRoute.to_settlement_id.is_not(None),
+            LogisticRoute.from_settlement_id != LogisticRoute.to_settlement_id,
+            LogisticRoute.waypoints.is_not(None),
+        )
+    )
+    return shortest_route_costs([tuple(row) for row in result])
+
+
+async def redistribute(
+    session: AsyncSession | None = None, *, dry_run: bool = False, **options
+) -> list[Transfer]:
+    """
+    Загружает все остатки, решает задачу перераспределения и записывает пары
+    потребление/пополнение одной транзакцией. Остатки блокируются FOR UPDATE до
+    фиксации, поэтому план не расходится с параллельными операциями.
+    Запись разрешена только в режиме "engine": иначе триггер перераспределения
+    сработал бы на каждое записанное потребление и повторил перевозки.
+    """
+    if session is None:
+        async with get_session() as session:
+            return await redistribute(session, dry_run=dry_run, **options)
+
+    if not dry_run and await get_redistribution_mode(session) != "engine":
+        raise RuntimeError(
+            "Триггеры перераспределения включены: переключите базу "
+            "в режим 'engine' (set_resource_trigger_mode) или используйте --dry-run"
+        )
+    route_costs = await load_route_costs(session)
+    balances = await session.execute(
+        select(
+            ResourceBalance.resource_id,
+            ResourceBalance.settlement_id,
+            ResourceBalance.quantity,
+        ).with_for_update()
+    )
+    transfers = plan_transfers([tuple(row) for row in balances], route_costs, **options)
+    if dry_run or not transfers:
+        await session.rollback()
+        return transfers
+
+    operations = []
+    for transfer in transfers:
+        operations.append(
+            {
+                "resource_id": transfer.resource_id,
+                "settlement_id": transfer.source_id,
+                "quantity": -transfer.quantity,
+                "operation_type": "consumption",
+            }
+        )
+        operations.append(
+            {
+                "resource_id": transfer.resource_id,
+                "settlement_id": transfer.target_id,
+                "quantity": transfer.quantity,
+                "operation_type": "replenishment",
+            }
+        )
+    await session.execute(insert(ResourceOperation), operations)
+    await session.execute(
+        text("SELECT emit_alert('info', :message)"),
+        {
+            "message": f"Ресурсы перераспределены между поселениями: "
+            f"{len(transfers)} перевозок, {sum(t.quantity for t in transfers)} ед."
+        },
+    )
+    await session.commit()
+    return transfers
+
+
+async def redistribution_loop(interval: float = REDISTRIBUTION_INTERVAL):
+    while True:
+        transfers = await redistribute()
+        if transfers:
+            console.print(f"[green]✔[/] Выполнено перевозок: {len(transfers)}")
+        await asyncio.sleep(interval)
+
+
+def print_transfers(transfers: list[Transfer]):
+    table = Table(title="План перераспределения ресурсов")
+    for column in ("Ресурс", "Откуда", "Куда", "Количество", "Стоимость, м/ед."):
+        table.add_column(column)
+    for transfer in transfers:
+        table.add_row(
+            str(transfer.resource_id),
+            str(transfer.source_id),
+            str(transfer.target_id),
+            str(transfer.quantity),
+            str(transfer.cost),
+        )
+    console.print(table)
+
+
+async def main(watch: bool = False, dry_run: bool = False):
+    transfers = await redistribute(dry_run=dry_run)
+    print_transfers(transfers)
+    if watch:
+        await redistribution_loop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетное перераспределение ресурсов")
+    parser.add_argument(
+        "--watch", action="store_true", help="запускать оптимизатор по расписанию"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="только показать план без записи"
+    )
+    args = parser.parse_args()
+    run(main(args.watch, args.dry_run))
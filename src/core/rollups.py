@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    FORECAST_HALF_LIFE_DAYS,
+    FORECAST_WINDOW_DAYS,
+    ROLLUP_REFRESH_INTERVAL,
+)
+from src.core.db import get_session, raw_connection, run
+from src.core.models import (
+    Resource,
+    ResourceBalance,
+    ResourceOperationDaily,
+    Settlement,
+)
+
+KEYS = ["resource_id", "settlement_id"]
+
+console = Console()
+
+
+async def refresh_rollups(conn=None) -> int:
+    """Переносит в сводки операции выше отметки; возвращает их число."""
+    if conn is None:
+        async with raw_connection() as conn:
+            return await refresh_rollups(conn)
+    # Процедура сама фиксирует транзакции, поэтому вызывается вне conn.transaction()
+    await conn.execute("CALL refresh_resource_rollups()")
+    return await conn.fetchval(
+        "SELECT last_batch FROM rollup_watermarks WHERE name = 'resource_operations'"
+    )
+
+
+async def rebuild_rollups(conn=None) -> int:
+    """Пересчитывает сводки по всему журналу (после очистки или ручных правок)."""
+    if conn is None:
+        async with raw_connection() as conn:
+            return await rebuild_rollups(conn)
+    await conn.execute("CALL rebuild_resource_rollups()")
+    return await conn.fetchval(
+        "SELECT last_batch FROM rollup_watermarks WHERE name = 'resource_operations'"
+    )
+
+
+async def refresh_loop(interval: float = ROLLUP_REFRESH_INTERVAL):
+    while True:
+        processed = await refresh_rollups()
+        if processed:
+            console.print(f"[green]✔[/] В сводки добавлено операций: {processed}")
+        await asyncio.sleep(interval)
+
+
+async def daily_consumption(
+    session: AsyncSession, days: int = FORECAST_WINDOW_DAYS
+) -> pd.DataFrame:
+    """Потребление и пополнение по поселениям и ресурсам за последние days суток."""
+    since = date.today() - timedelta(days=days - 1)
+    result = await session.execute(
+        select(
+            Settlement.name.label("settlement"),
+            Resource.name.label("resource"),
+            ResourceOperationDaily.bucket.label("day"),
+            ResourceOperationDaily.consumed,
+            ResourceOperationDaily.replenished,
+        )
+        .join(Settlement, Settlement.id == ResourceOperationDaily.settlement_id)
+        .join(Resource, Resource.id == ResourceOperationDaily.resource_id)
+        .where(ResourceOperationDaily.bucket >= since)
+        .order_by(ResourceOperationDaily.bucket, Settlement.name, Resource.name)
+    )
+    return pd.DataFrame(
+        result.all(),
+        columns=["settlement", "resource", "day", "consumed", "replenished"],
+    )
+
+
+def project_depletion(
+    balances: pd.DataFrame,
+    daily: pd.DataFrame,
+    *,
+    today: date,
+    window: int = FORECAST_WINDOW_DAYS,
+    half_life: float = FORECAST_HALF_LIFE_DAYS,
+) -> pd.DataFrame:
+    """
+    Прогноз исчерпания для всех пар (ресурс, поселение) одним матричным проходом.
+    Суточный чистый расход (потребление минус пополнение) за window полных суток
+    усредняется с экспоненциально убывающими весами; дней до исчерпания = остаток / расход.
+    Ресурсы без чистого расхода получают inf, а слишком далекие даты исчерпания — NaT.
+    """
+    index = pd.MultiIndex.from_frame(balances[KEYS])
+    matrix = np.zeros((len(index), window))
+    if not daily.empty:
+        rows = index.get_indexer(pd.MultiIndex.from_frame(daily[KEYS]))
+        # Возраст 0 — вчерашние сутки: текущие еще не завершены и занижают расход
+        ages = (
+            pd.Timestamp(today) - pd.to_datetime(daily["bucket"])
+        ).dt.days.to_numpy() - 1
+        net = (daily["consumed"] - daily["replenished"]).to_numpy(dtype=float)
+        valid = (rows >= 0) & (ages >= 0) & (ages < window)
+        np.add.at(matrix, (rows[valid], ages[valid]), net[valid])
+
+    weights = 0.5 ** (np.arange(window) / half_life)
+    burn_rate = matrix @ weights / weights.sum()
+    stock = balances["quantity"].to_numpy(dtype=float)
+    days_left = np.full(len(stock), np.inf)
+    np.divide(stock, burn_rate, out=days_left, where=burn_rate > 0)
+    days_left = np.where(stock <= 0, 0.0, days_left)
+
+    depletion_date = pd.Series(pd.NaT, index=balances.index, dtype="datetime64[ns]")
+    # Дата за пределами диапазона Timestamp (~292 года) остается NaT
+    horizon = (pd.Timestamp.max - pd.Timestamp(today)).days
+    finite = np.isfinite(days_left) & (days_left < horizon)
+    depletion_date[finite] = pd.Timestamp(today) + pd.to_timedelta(
+        days_left[finite], unit="D"
+    )
+    return balances.assign(
+        burn_rate=burn_rate, days_left=days_left, depletion_date=depletion_date
+    ).sort_values("days_left", kind="stable")
+
+
+async def forecast_depletion(
+    session: AsyncSession,
+    *,
+    window: int = FORECAST_WINDOW_DAYS,
+    half_life: float = FORECAST_HALF_LIFE_DAYS,
+    today: date | None = None,
+) -> pd.DataFrame:
+    """Прогноз по текущим остаткам и посуточной сводке; журнал операций не читается."""
+    today = today or date.today()
+    balances = await session.execute(
+        select(
+            ResourceBalance.resource_id,
+            ResourceBalance.settlement_id,
+            Settlement.name.label("settlement"),
+            Resource.name.label("resource"),
+            ResourceBalance.quantity,
+        )
+        .join(Settlement, Settlement.id == ResourceBalance.settlement_id)
+        .join(Resource, Resource.id == ResourceBalance.resource_id)
+    )
+    daily = await session.execute(
+        select(
+            ResourceOperationDaily.resource_id,
+            ResourceOperationDaily.settlement_id,
+            ResourceOperationDaily.bucket,
+            ResourceOperationDaily.consumed,
+            ResourceOperationDaily.replenished,
+        ).where(
+            ResourceOperationDaily.bucket >= today - timedelta(days=window),
+            ResourceOperationDaily.bucket < today,
+        )
+    )
+    return project_depletion(
+        pd.DataFrame(
+            balances.all(), columns=KEYS + ["settlement", "resource", "quantity"]
+        ),
+        pd.DataFrame(daily.all(), columns=KEYS + ["bucket", "consumed", "replenished"]),
+        today=today,
+        window=window,
+        half_life=half_life,
+    )
+
+
+def print_forecast(forecast: pd.DataFrame):
+    table = Table(title="Прогноз исчерпания ресурсов")
+    for column in (
+        "Поселение",
+        "Ресурс",
+        "Остаток",
+        "Расход/сутки",
+        "Дней до исчерпания",
+        "Дата исчерпания",
+    ):
+        table.add_column(column)
+    for row in forecast.itertuples():
+        finite = np.isfinite(row.days_left)
+        table.add_row(
+            row.settlement,
+            row.resource,
+            str(row.quantity),
+            f"{row.burn_rate:.1f}",
+            f"{row.days_left:.1f}" if finite else "∞",
+            (
+                "—"
+                if pd.isna(row.depletion_date)
+                else row.depletion_date.strftime("%Y-%m-%d")
+            ),
+        )
+    console.print(table)
+
+
+async def main(watch: bool = False, rebuild: bool = False):
+    processed = await (rebuild_rollups() if rebuild else refresh_rollups())
+    console.print(f"[green]✔[/] Сводки обновлены, учтено операций: {processed}")
+
+    async with get_session() as session:
+        consumption = await daily_consumption(session)
+        forecast = await forecast_depletion(session)
+
+    if not consumption.empty:
+        by_settlement = (
+            consumption.groupby(["day", "settlement"])[["consumed", "replenished"]]
+            .sum()
+            .reset_index()
+        )
+        table = Table(title="Потребление по поселениям и суткам")
+        for column in ("Сутки", "Поселение", "Потреблено", "Пополнено"):
+            table.add_column(column)
+        for row in by_settlement.itertuples():
+            table.add_row(
+                str(row.day), row.settlement, str(row.consumed), str(row.replenished)
+            )
+        console.print(table)
+    print_forecast(forecast)
+
+    if watch:
+        await refresh_loop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сводки операций и прогноз исчерпания")
+    parser.add_argument(
+        "--watch", action="store_true", help="обновлять сводки в фоне по расписанию"
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="пересчитать сводки по всему журналу"
+    )
+    args = parser.parse_args()
+    run(main(args.watch, args.rebuild))
@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from sqlalchemy import Select, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from src.config import REPLICA_CHECK_INTERVAL, REPLICA_MAX_LAG
+from src.core.db import get_engine, get_replica_engines
+
+# Отставание реплики: 0, если все принятое WAL уже применено (на основном нет новых
+# записей), иначе возраст последней примененной транзакции. При отключенном приемнике
+# WAL обе позиции замирают и совпадают, поэтому реплика без потока (streaming = false)
+# считается отставшей независимо от lag
+LAG_SQL = text(
+    """
+SELECT pg_is_in_recovery() AS in_recovery,
+       EXISTS (
+           SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+       ) AS streaming,
+       CASE
+           WHEN NOT pg_is_in_recovery() THEN 0
+           WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+           ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+       END AS lag
+"""
+)
+
+# Куда ушли запросы: "primary" или URL реплики
+ROUTES: Counter[str] = Counter()
+
+
+@dataclass
+class ReplicaStatus:
+    url: str
+    in_recovery: bool | None = None
+    streaming: bool | None = None
+    lag: float | None = None
+    healthy: bool = False  # пока реплика не проверена, чтения идут на основной
+    error: str | None = None
+    checked_at: float | None = None
+
+
+class ReplicaMonitor:
+    """
+    Периодически измеряет отставание каждой реплики. Для чтений выбираются по кругу
+    только реплики, ответившие при последней проверке с отставанием не больше max_lag;
+    если таких нет, чтения уходят на основной сервер.
+    """
+
+    def __init__(
+        self,
+        max_lag: float = REPLICA_MAX_LAG,
+        interval: float = REPLICA_CHECK_INTERVAL,
+    ):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.statuses = [
+            ReplicaStatus(engine.url.render_as_string())
+            for engine in get_replica_engines()
+        ]
+        self._next = itertools.count()
+
+    async def _check(self, engine, status: ReplicaStatus):
+        try:
+            async with asyncio.timeout(self.interval):
+                async with engine.connect() as conn:
+                    row = (await conn.execute(LAG_SQL)).one()
+            status.in_recovery = row.in_recovery
+            status.streaming = row.streaming
+            status.lag = float(row.lag or 0)
+            status.error = (
+                None
+                if row.streaming or not row.in_recovery
+                else "приемник WAL не подключен к основному"
+            )
+            status.healthy = status.error is None and status.lag <= self.max_lag
+        except (SQLAlchemyError, OSError, TimeoutError) as e:
+            status.error = str(e) or type(e).__name__
+            status.healthy = False
+        status.checked_at = time.monotonic()
+
+    async def check(self):
+        # Движки берутся заново: dispose_engine() пересоздает их
+        await asyncio.gather(
+            *(
+                self._check(engine, status)
+                for engine, status in zip(get_replica_engines(), self.statuses)
+            )
+        )
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def mark_down(self, url: str, error: str):
+        for status in self.statuses:
+            if status.url == url:
+                status.healthy = False
+                status.error = error
+
+    def choose(self):
+        """Движок здоровой реплики (по кругу) или None."""
+        healthy = [
+            engine
+            for engine, status in zip(get_replica_engines(), self.statuses)
+            if status.healthy
+        ]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+
+_monitor: ReplicaMonitor | None = None
+_monitor_task: asyncio.Task | None = None
+
+
+def _on_replica_error(context):
+    # Разрыв соединения с репликой: выводим ее из ротации до следующей проверки
+    if _monitor is not None and context.is_disconnect and context.engine is not None:
+        _monitor.mark_down(
+            context.engine.url.render_as_string(), str(context.original_exception)
+        )
+
+
+def get_monitor() -> ReplicaMonitor | None:
+    return _monitor
+
+
+async def start_monitor() -> ReplicaMonitor | None:
+    """Первая проверка реплик и фоновый опрос в текущем цикле событий."""
+    global _monitor, _monitor_task
+    if not get_replica_engines():
+        return None
+    if _monitor is None:
+        _monitor = ReplicaMonitor()
+        event.listen(Engine, "handle_error", _on_replica_error)
+    if _monitor_task is None or _monitor_task.done():
+        await _monitor.check()
+        _monitor_task = asyncio.create_task(_monitor.run())
+    return _monitor
+
+
+async def stop_monitor():
+    global _monitor, _monitor_task
+    if _monitor_task is not None:
+        _monitor_task.cancel()
+        await asyncio.gather(_monitor_task, return_exceptions=True)
+    if _monitor is not None:
+        event.remove(Engine, "handle_error", _on_replica_error)
+    _monitor = _monitor_task = None
+
+
+def _is_plain_read(clause) -> bool:
+    # text() и прочие конструкции могут менять данные: их исполняет основной
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+class RoutingSession(Session):
+    """
+    Записи, SELECT ... FOR UPDATE и text() идут на основной сервер. После первой
+    записи сессия закрепляется за основным до конца жизни (read-your-writes): иначе
+    следующий SELECT мог бы попасть на реплику, еще не получившую эти строки.
+    Обычные чтения незакрепленной сессии распределяются по репликам.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # Сброс изменений (flush) тоже приходит сюда, с _flushing = True
+        if self._flushing or not _is_plain_read(clause):
+            self.info["primary"] = True
+        replica = None
+        if not self.info.get("primary") and _monitor is not None:
+            replica = _monitor.choose()
+        if replica is None:
+            ROUTES["primary"] += 1
+            return get_engine().sync_engine
+        ROUTES[replica.url.render_as_string()] += 1
+        return replica.sync_engine
+
+
+_routing_sessionmaker = async_sessionmaker(
+    sync_session_class=RoutingSession, expire_on_commit=False
+)
+
+
+@asynccontextmanager
+async def routed_session(primary: bool = False):
+    """
+    Сессия с разделением чтения и записи. primary=True закрепляет ее за основным
+    сервером сразу — для чтений, которые должны видеть записи других сессий.
+    """
+    await start_monitor()
+    async with _routing_sessionmaker() as session:
+        if primary:
+            session.info["primary"] = True
+        yield session
+
+
+def routing_stats() -> dict:
+    return {
+        "routes": dict(ROUTES),
+        "replicas": [] if _monitor is None else list(_monitor.statuses),
+    }
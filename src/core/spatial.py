@@ -0,0 +1,60 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.models import GeoZone, LogisticRoute, Route, TransportVehicle
+
+SRID = 4326
+
+
+def make_point(lon: float, lat: float):
+    return func.ST_SetSRID(func.ST_MakePoint(lon, lat), SRID)
+
+
+def _zone_geometry(zone_id: int):
+    return select(GeoZone.coordinates).where(GeoZone.id == zone_id).scalar_subquery()
+
+
+async def vehicles_in_zone(
+    session: AsyncSession, zone_id: int
+) -> list[TransportVehicle]:
+    """Транспорт внутри геозоны; ST_Intersects отбирает кандидатов по GiST-индексу."""
+    result = await session.execute(
+        select(TransportVehicle).where(
+            func.ST_Intersects(
+                TransportVehicle.current_location, _zone_geometry(zone_id)
+            )
+        )
+    )
+    return list(result.scalars())
+
+
+async def nearest_available_vehicles(
+    session: AsyncSession, lon: float, lat: float, k: int = 5
+) -> list[tuple[TransportVehicle, float]]:
+    """
+    k ближайших свободных машин к точке: ORDER BY <-> обходит частичный GiST-индекс
+    по свободному транспорту без сортировки всей таблицы. Расстояние — в метрах.
+    """
+    point = make_point(lon, lat)
+    result = await session.execute(
+        select(
+            TransportVehicle,
+            func.ST_DistanceSphere(TransportVehicle.current_location, point),
+        )
+        .where(TransportVehicle.status == "available")
+        .order_by(TransportVehicle.current_location.distance_centroid(point))
+        .limit(k)
+    )
+    return [tuple(row) for row in result]
+
+
+async def routes_intersecting_zone(
+    session: AsyncSession, zone_id: int, model=Route
+) -> list[Route | LogisticRoute]:
+    """Маршруты (Route или LogisticRoute), пересекающие геозону."""
+    result = await session.execute(
+        select(model).where(
+            func.ST_Intersects(model.waypoints, _zone_geometry(zone_id))
+        )
+    )
+    return list(result.scalars())
@@ -3,6 +3,12 @@ CREATE DATABASE settlement_management;
 -- Подключение расширений
 CREATE EXTENSION IF NOT EXISTS postgis;
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
+-- Статистика запросов для отчета src/core/instrumentation.py; представление работает,
+-- только если pg_stat_statements есть в shared_preload_libraries
+CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
+
+-- Время функций PL/pgSQL (track_functions = 'pl') включается при подключении
+-- в src/core/db.py: ALTER DATABASE ... SET не переносится в копии базы по шаблону
 
 
 -- Таблица поселений
@@ -10,7 +16,9 @@ CREATE TABLE settlements (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     region VARCHAR(100) NOT NULL,
-    climate_type VARCHAR(50) NOT NULL
+    climate_type VARCHAR(50) NOT NULL,
+    -- Естественный ключ для INSERT ... ON CONFLICT (src/core/upsert.py)
+    CONSTRAINT settlements_name_key UNIQUE (name)
 );
 
 -- Таблица инфраструктуры
@@ -18,7 +26,9 @@ CREATE TABLE infrastructure (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     type VARCHAR(50) NOT NULL,
-    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE
+    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
+    -- NULLS NOT DISTINCT: объекты без поселения тоже уникальны по имени (PostgreSQL 15+)
+    CONSTRAINT infrastructure_settlement_name_key UNIQUE NULLS NOT DISTINCT (settlement_id, name)
 );
 
 -- Таблица ресурсов
@@ -27,7 +37,8 @@ CREATE TABLE resources (
     name VARCHAR(100) NOT NULL,
     unit VARCHAR(20) NOT NULL,
     type VARCHAR(50) NOT NULL,
-    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE
+    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
+    CONSTRAINT resources_settlement_name_key UNIQUE NULLS NOT DISTINCT (settlement_id, name)
 );
 
 -- Создание таблицы операций с ресурсами (партиционирование по дате)
@@ -36,17 +47,63 @@ CREATE TABLE resource_operations (
     resource_id INTEGER REFERENCES resources(id) ON DELETE CASCADE,
     settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
     date TIMESTAMP NOT NULL DEFAULT now(),
-    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    quantity INTEGER NOT NULL,  -- Потребление хранится с минусом, пополнение с плюсом
     operation_type VARCHAR(20) NOT NULL CHECK (operation_type IN ('consumption', 'replenishment')),
+    CHECK ((operation_type = 'consumption') = (quantity < 0) OR quantity = 0),
     PRIMARY KEY (id, date)  -- Включаем date в PRIMARY KEY
 ) PARTITION BY RANGE (date);
 
--- Создание партиции для 2024 года
-CREATE TABLE resource_operations_2024 PARTITION OF resource_operations
-    FOR VALUES FROM ('2025-01-01') TO ('2026-01-01');
+-- Партиция по умолчанию: принимает строки, для дат которых еще нет партиции.
+-- Помесячные/понедельные партиции создает и поддерживает `python -m src.core.partitions`,
+-- он же переносит строки из партиции по умолчанию в нужные партиции.
+CREATE TABLE resource_operations_default PARTITION OF resource_operations DEFAULT;
 
 -- Создание индекса для ускорения работы с датами
 CREATE INDEX idx_resource_operations_date ON resource_operations (date);
+-- Индексы путей доступа триггеров и внешних ключей (resource_id, incidents по открытым,
+-- personnel по должности и др.) добавляют версионные миграции: `python -m src.core.migrations`
+
+-- Текущие остатки ресурсов по поселениям (поддерживаются триггером при каждой вставке операции)
+CREATE TABLE resource_balances (
+    resource_id INTEGER REFERENCES resources(id) ON DELETE CASCADE,
+    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (resource_id, settlement_id)
+);
+
+-- Почасовые и посуточные сводки операций с ресурсами. Пополняются инкрементально
+-- процедурой refresh_resource_rollups() от отметки rollup_watermarks, аналитика и
+-- прогноз исчерпания (src/core/rollups.py) читают только их, а не весь журнал.
+CREATE TABLE resource_operations_hourly (
+    resource_id INTEGER REFERENCES resources(id) ON DELETE CASCADE,
+    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
+    bucket TIMESTAMP NOT NULL,
+    consumed BIGINT NOT NULL DEFAULT 0,     -- Потребление за интервал (положительное число)
+    replenished BIGINT NOT NULL DEFAULT 0,  -- Пополнение за интервал
+    operations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resource_id, settlement_id, bucket)
+);
+
+CREATE TABLE resource_operations_daily (
+    resource_id INTEGER REFERENCES resources(id) ON DELETE CASCADE,
+    settlement_id INTEGER REFERENCES settlements(id) ON DELETE CASCADE,
+    bucket DATE NOT NULL,
+    consumed BIGINT NOT NULL DEFAULT 0,
+    replenished BIGINT NOT NULL DEFAULT 0,
+    operations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resource_id, settlement_id, bucket)
+);
+
+CREATE INDEX idx_resource_operations_daily_bucket ON resource_operations_daily (bucket);
+
+-- Отметка последнего учтенного в сводках id операции
+CREATE TABLE rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    last_batch BIGINT NOT NULL DEFAULT 0,  -- Сколько операций учтено последним обновлением
+    refreshed_at TIMESTAMP NOT NULL DEFAULT now()
+);
 
 -- Таблица персонала
 CREATE TABLE personnel (
@@ -67,6 +124,20 @@ CREATE TABLE sensors_devices (
     energy_consumption INTEGER NOT NULL CHECK (energy_consumption >= 0)
 );
 
+-- Временной ряд показаний датчиков (партиционирование по времени показания).
+-- Пишется пакетами COPY из src/core/telemetry.py; в sensors_devices остается только
+-- последнее значение. Внешнего ключа нет: проверка RI выполнялась бы построчно
+-- на каждой строке COPY.
+CREATE TABLE sensor_readings (
+    sensor_id INTEGER NOT NULL,
+    recorded_at TIMESTAMP NOT NULL,
+    energy_consumption INTEGER NOT NULL CHECK (energy_consumption >= 0)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE sensor_readings_default PARTITION OF sensor_readings DEFAULT;
+
+CREATE INDEX idx_sensor_readings_sensor_time ON sensor_readings (sensor_id, recorded_at);
+
 -- Таблица событий
 CREATE TABLE events (
     id SERIAL PRIMARY KEY,
@@ -115,12 +186,15 @@ CREATE TABLE tasks (
     deadline TIMESTAMP NOT NULL
 );
 
+-- Поиск просроченных задач планировщиком src/core/sweeper.py
+CREATE INDEX idx_tasks_status_deadline ON tasks (status, deadline);
+
 -- Таблица геозон
 CREATE TABLE geozones (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     type VARCHAR(50) NOT NULL,
-    coordinates GEOMETRY(Point, 4326),
+    coordinates GEOMETRY(Polygon, 4326),
     description TEXT NOT NULL,
     usage_type VARCHAR(50) NOT NULL
 );
@@ -161,24 +235,212 @@ CREATE TABLE logistic_routes (
     name VARCHAR(100) NOT NULL,
     description TEXT NOT NULL,
     waypoints GEOMETRY(LineString, 4326),
-    status VARCHAR(50) NOT NULL CHECK (status IN ('planned', 'active', 'completed'))
+    status VARCHAR(50) NOT NULL CHECK (status IN ('planned', 'active', 'completed')),
+    -- Конечные поселения маршрута: длина маршрута служит стоимостью перевозки
+    -- при перераспределении ресурсов (src/core/redistribution.py)
+    from_settlement_id INTEGER REFERENCES settlements(id) ON DELETE SET NULL,
+    to_settlement_id INTEGER REFERENCES settlements(id) ON DELETE SET NULL
 );
 
+-- Пространственные индексы (GiST) для ST_Intersects/ST_Within и KNN-поиска по <->
+CREATE INDEX idx_geozones_coordinates ON geozones USING GIST (coordinates);
+CREATE INDEX idx_routes_waypoints ON routes USING GIST (waypoints);
+CREATE INDEX idx_logistic_routes_waypoints ON logistic_routes USING GIST (waypoints);
+CREATE INDEX idx_transport_vehicles_location ON transport_vehicles USING GIST (current_location);
+-- Частичный индекс для поиска ближайших свободных машин
+CREATE INDEX idx_transport_vehicles_available_location ON transport_vehicles
+    USING GIST (current_location) WHERE status = 'available';
+
+
+-- Доставка уведомлений из триггеров. По умолчанию ('table') строка сразу пишется в notifications.
+-- При settlement.alert_delivery = 'notify' уведомление уходит компактным pg_notify в канал
+-- settlement_alerts: асинхронный потребитель (src/core/alerts.py) сворачивает повторы
+-- за окно времени и пишет их пакетом. Одинаковые NOTIFY в одной транзакции PostgreSQL
+-- и так доставляет один раз, поэтому в полезной нагрузке нет времени и счетчиков.
+CREATE OR REPLACE FUNCTION emit_alert(p_type TEXT, p_message TEXT) RETURNS VOID AS $$
+BEGIN
+    IF current_setting('settlement.alert_delivery', true) = 'notify' THEN
+        PERFORM pg_notify('settlement_alerts', json_build_object('t', p_type, 'm', p_message)::text);
+    ELSE
+        INSERT INTO notifications (type, message, timestamp, status)
+        VALUES (p_type, p_message, now(), 'unread');
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Пакетный вариант emit_alert: в режиме 'table' все сообщения вставляются одним INSERT
+CREATE OR REPLACE FUNCTION emit_alerts(p_type TEXT, p_messages TEXT[]) RETURNS VOID AS $$
+BEGIN
+    IF current_setting('settlement.alert_delivery', true) = 'notify' THEN
+        PERFORM pg_notify('settlement_alerts', json_build_object('t', p_type, 'm', m)::text)
+        FROM unnest(p_messages) AS m;
+    ELSE
+        INSERT INTO notifications (type, message, timestamp, status)
+        SELECT p_type, m, now(), 'unread' FROM unnest(p_messages) AS m;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_resource_balance() RETURNS TRIGGER AS $$
+BEGIN
+    -- Прибавляем операцию к остатку вместо пересчета SUM по всей истории
+    INSERT INTO resource_balances (resource_id, settlement_id, quantity, updated_at)
+    VALUES (NEW.resource_id, NEW.settlement_id, NEW.quantity, now())
+    ON CONFLICT (resource_id, settlement_id) DO UPDATE
+    SET quantity = resource_balances.quantity + EXCLUDED.quantity,
+        updated_at = EXCLUDED.updated_at;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры одного события срабатывают в алфавитном порядке имен:
+-- resource_balance_trigger должен выполниться раньше проверок порога и перераспределения
+CREATE TRIGGER resource_balance_trigger
+AFTER INSERT ON resource_operations
+FOR EACH ROW
+WHEN (NEW.resource_id IS NOT NULL AND NEW.settlement_id IS NOT NULL)
+EXECUTE FUNCTION update_resource_balance();
+
+
+-- Инвалидация кэша справочников (src/core/cache.py): один NOTIFY на оператор
+-- с именем таблицы; одинаковые уведомления в одной транзакции доставляются один раз
+CREATE OR REPLACE FUNCTION notify_reference_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('reference_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER settlements_changed_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON settlements
+FOR EACH STATEMENT EXECUTE FUNCTION notify_reference_changed();
+
+CREATE TRIGGER resources_changed_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON resources
+FOR EACH STATEMENT EXECUTE FUNCTION notify_reference_changed();
+
+CREATE TRIGGER infrastructure_changed_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON infrastructure
+FOR EACH STATEMENT EXECUTE FUNCTION notify_reference_changed();
+
+
+-- Пересчет остатков по журналу операций (после ручных правок или массовой загрузки без триггеров)
+CREATE OR REPLACE PROCEDURE rebuild_resource_balances()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE resource_balances IN EXCLUSIVE MODE;
+    DELETE FROM resource_balances;
+
+    INSERT INTO resource_balances (resource_id, settlement_id, quantity, updated_at)
+    SELECT resource_id, settlement_id, SUM(quantity), now()
+    FROM resource_operations
+    WHERE resource_id IS NOT NULL AND settlement_id IS NOT NULL
+    GROUP BY resource_id, settlement_id;
+END;
+$$;
+
+
+-- Инкрементальное обновление сводок: учитываются только операции с id выше отметки.
+-- Короткая блокировка EXCLUSIVE дожидается транзакций, которые уже вставляют операции,
+-- поэтому после нее все id до last_value последовательности зафиксированы и окно
+-- (отметка, last_value] не пропустит строку, закоммиченную позже строки с большим id.
+-- Процедура сама фиксирует транзакции, поэтому вызывается вне явной транзакции.
+CREATE OR REPLACE PROCEDURE refresh_resource_rollups()
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start BIGINT;
+    v_end BIGINT;
+    v_processed BIGINT;
+BEGIN
+    LOCK TABLE resource_operations IN EXCLUSIVE MODE;
+    v_end := COALESCE(pg_sequence_last_value('resource_operations_id_seq'), 0);
+    COMMIT;
+
+    INSERT INTO rollup_watermarks (name) VALUES ('resource_operations')
+    ON CONFLICT (name) DO NOTHING;
+
+    -- Параллельные обновления выстраиваются в очередь на строке отметки
+    SELECT last_id INTO v_start
+    FROM rollup_watermarks
+    WHERE name = 'resource_operations'
+    FOR UPDATE;
+
+    IF v_end <= v_start THEN
+        UPDATE rollup_watermarks SET last_batch = 0, refreshed_at = now()
+        WHERE name = 'resource_operations';
+        RETURN;
+    END IF;
+
+    -- Журнал читается один раз: посуточная сводка собирается из почасовой дельты
+    WITH delta AS (
+        SELECT resource_id, settlement_id, date_trunc('hour', date) AS bucket,
+               COALESCE(-SUM(quantity) FILTER (WHERE operation_type = 'consumption'), 0) AS consumed,
+               COALESCE(SUM(quantity) FILTER (WHERE operation_type = 'replenishment'), 0) AS replenished,
+               COUNT(*) AS operations
+        FROM resource_operations
+        WHERE id > v_start AND id <= v_end
+          AND resource_id IS NOT NULL AND settlement_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    ), hourly AS (
+        INSERT INTO resource_operations_hourly AS h
+            (resource_id, settlement_id, bucket, consumed, replenished, operations)
+        SELECT resource_id, settlement_id, bucket, consumed, replenished, operations
+        FROM delta
+        ON CONFLICT (resource_id, settlement_id, bucket) DO UPDATE
+        SET consumed = h.consumed + EXCLUDED.consumed,
+            replenished = h.replenished + EXCLUDED.replenished,
+            operations = h.operations + EXCLUDED.operations
+    ), daily AS (
+        INSERT INTO resource_operations_daily AS d
+            (resource_id, settlement_id, bucket, consumed, replenished, operations)
+        SELECT resource_id, settlement_id, bucket::date, SUM(consumed), SUM(replenished), SUM(operations)
+        FROM delta
+        GROUP BY 1, 2, 3
+        ON CONFLICT (resource_id, settlement_id, bucket) DO UPDATE
+        SET consumed = d.consumed + EXCLUDED.consumed,
+            replenished = d.replenished + EXCLUDED.replenished,
+            operations = d.operations + EXCLUDED.operations
+    )
+    SELECT COALESCE(SUM(operations), 0) INTO v_processed FROM delta;
+
+    UPDATE rollup_watermarks
+    SET last_id = v_end, last_batch = v_processed, refreshed_at = now()
+    WHERE name = 'resource_operations';
+END;
+$$;
+
+
+-- Полный пересчет сводок (после очистки журнала или сброса его последовательности)
+CREATE OR REPLACE PROCEDURE rebuild_resource_rollups()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE rollup_watermarks IN EXCLUSIVE MODE;
+    TRUNCATE resource_operations_hourly, resource_operations_daily;
+    DELETE FROM rollup_watermarks WHERE name = 'resource_operations';
+    COMMIT;
+
+    CALL refresh_resource_rollups();
+END;
+$$;
 
 CREATE OR REPLACE FUNCTION check_resource_threshold() RETURNS TRIGGER AS $$
 DECLARE
     current_level INTEGER;
     critical_threshold INTEGER := 50;  -- Условный критический порог
 BEGIN
-    -- Подсчет текущего количества ресурса
+    -- Текущее количество ресурса по всем поселениям
     SELECT COALESCE(SUM(quantity), 0) INTO current_level
-    FROM resource_operations
+    FROM resource_balances
     WHERE resource_id = NEW.resource_id;
 
     -- Если уровень ресурса ниже критического порога, создаем уведомление
     IF current_level < critical_threshold THEN
-        INSERT INTO notifications (type, message, timestamp, status)
-        VALUES ('warning', 'Критический уровень ресурса ID: ' || NEW.resource_id, now(), 'unread');
+        PERFORM emit_alert('warning', 'Критический уровень ресурса ID: ' || NEW.resource_id);
     END IF;
 
     RETURN NEW;
@@ -210,43 +472,17 @@ WHEN (NEW.operation_type = 'replenishment')
 EXECUTE FUNCTION update_incident_status();
 
 
-CREATE OR REPLACE FUNCTION escalate_overdue_tasks() RETURNS TRIGGER AS $$
-DECLARE
-    senior_staff VARCHAR(100);
-BEGIN
-    -- Проверяем, истек ли срок выполнения задачи
-    IF NEW.deadline < now() AND NEW.status = 'pending' THEN
-        UPDATE tasks SET status = 'overdue' WHERE id = NEW.id;
-
-        -- Определяем старшего персонала для эскалации задачи
-        SELECT full_name INTO senior_staff FROM personnel
-        WHERE position = 'Руководитель' LIMIT 1;
-
-        INSERT INTO notifications (type, message, timestamp, status)
-        VALUES ('alert', 'Задача "' || NEW.name || '" просрочена и передана ' || senior_staff, now(), 'unread');
-    END IF;
-
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER overdue_task_trigger
-AFTER INSERT OR UPDATE ON tasks
-FOR EACH ROW
-EXECUTE FUNCTION escalate_overdue_tasks();
-
-
 CREATE OR REPLACE FUNCTION redistribute_resources() RETURNS TRIGGER AS $$
 DECLARE
     surplus_settlement_id INTEGER;
     available_quantity INTEGER;
 BEGIN
     -- Ищем поселение с избыточным запасом данного ресурса
-    SELECT settlement_id, SUM(quantity) INTO surplus_settlement_id, available_quantity
-    FROM resource_operations
+    SELECT settlement_id, quantity INTO surplus_settlement_id, available_quantity
+    FROM resource_balances
     WHERE resource_id = NEW.resource_id
-    GROUP BY settlement_id
-    HAVING SUM(quantity) > 100  -- Условный порог избыточного запаса
+    AND settlement_id <> NEW.settlement_id
+    AND quantity > 100  -- Условный порог избыточного запаса
     LIMIT 1;
 
     -- Если есть избыточные запасы, выполняем перераспределение
@@ -257,8 +493,7 @@ BEGIN
         INSERT INTO resource_operations (resource_id, settlement_id, date, quantity, operation_type)
         VALUES (NEW.resource_id, NEW.settlement_id, now(), 50, 'replenishment');
 
-        INSERT INTO notifications (type, message, timestamp, status)
-        VALUES ('info', 'Ресурс перераспределен между поселениями', now(), 'unread');
+        PERFORM emit_alert('info', 'Ресурс перераспределен между поселениями');
     END IF;
 
     RETURN NEW;
@@ -268,27 +503,199 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER resource_redistribution_trigger
 AFTER INSERT ON resource_operations
 FOR EACH ROW
-WHEN (NEW.quantity < 50 AND NEW.operation_type = 'consumption')
+-- pg_trigger_depth() = 0: вставки самого перераспределения не запускают его повторно
+WHEN (NEW.quantity < 50 AND NEW.operation_type = 'consumption' AND pg_trigger_depth() = 0)
 EXECUTE FUNCTION redistribute_resources();
 
 
+-- Статементные версии триггеров resource_operations: один вызов на оператор INSERT/COPY,
+-- вставленные строки доступны через переходную таблицу new_operations.
+-- Включаются вместо построчных процедурой set_resource_trigger_mode('statement').
+CREATE OR REPLACE FUNCTION update_resource_balance_stmt() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO resource_balances (resource_id, settlement_id, quantity, updated_at)
+    SELECT resource_id, settlement_id, SUM(quantity), now()
+    FROM new_operations
+    WHERE resource_id IS NOT NULL AND settlement_id IS NOT NULL
+    GROUP BY resource_id, settlement_id
+    ON CONFLICT (resource_id, settlement_id) DO UPDATE
+    SET quantity = resource_balances.quantity + EXCLUDED.quantity,
+        updated_at = EXCLUDED.updated_at;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resource_balance_stmt_trigger
+AFTER INSERT ON resource_operations
+REFERENCING NEW TABLE AS new_operations
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_resource_balance_stmt();
+
+
+CREATE OR REPLACE FUNCTION check_resource_threshold_stmt() RETURNS TRIGGER AS $$
+DECLARE
+    critical_threshold INTEGER := 50;  -- Условный критический порог
+BEGIN
+    -- Одно уведомление на каждый затронутый ресурс, а не на каждую вставленную строку
+    PERFORM emit_alert('warning', 'Критический уровень ресурса ID: ' || affected.resource_id)
+    FROM (
+        SELECT DISTINCT resource_id FROM new_operations WHERE resource_id IS NOT NULL
+    ) AS affected
+    LEFT JOIN resource_balances b ON b.resource_id = affected.resource_id
+    GROUP BY affected.resource_id
+    HAVING COALESCE(SUM(b.quantity), 0) < critical_threshold;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resource_threshold_stmt_trigger
+AFTER INSERT ON resource_operations
+REFERENCING NEW TABLE AS new_operations
+FOR EACH STATEMENT
+EXECUTE FUNCTION check_resource_threshold_stmt();
+
+
+CREATE OR REPLACE FUNCTION update_incident_status_stmt() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE incidents
+    SET status = 'resolved'
+    WHERE status = 'open'
+    AND resource_id IN (
+        SELECT resource_id FROM new_operations WHERE operation_type = 'replenishment'
+    );
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER incident_status_update_stmt
+AFTER INSERT ON resource_operations
+REFERENCING NEW TABLE AS new_operations
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_incident_status_stmt();
+
+
+CREATE OR REPLACE FUNCTION redistribute_resources_stmt() RETURNS TRIGGER AS $$
+DECLARE
+    redistributed INTEGER[];
+BEGIN
+    -- Вставки самого перераспределения не должны запускать его повторно
+    IF pg_trigger_depth() > 1 THEN
+        RETURN NULL;
+    END IF;
+
+    -- Для каждой пары (ресурс, поселение) с мелким потреблением берем 50 единиц
+    -- у поселения с наибольшим избытком этого ресурса
+    WITH requests AS (
+        SELECT DISTINCT resource_id, settlement_id
+        FROM new_operations
+        WHERE quantity < 50 AND operation_type = 'consumption'
+        AND resource_id IS NOT NULL AND settlement_id IS NOT NULL
+    ), transfers AS (
+        SELECT r.resource_id, r.settlement_id AS target_id, surplus.settlement_id AS source_id
+        FROM requests r
+        CROSS JOIN LATERAL (
+            SELECT b.settlement_id
+            FROM resource_balances b
+            WHERE b.resource_id = r.resource_id
+            AND b.settlement_id <> r.settlement_id
+            AND b.quantity > 100  -- Условный порог избыточного запаса
+            ORDER BY b.quantity DESC
+            LIMIT 1
+        ) AS surplus
+    ), moved AS (
+        INSERT INTO resource_operations (resource_id, settlement_id, date, quantity, operation_type)
+        SELECT resource_id, source_id, now(), -50, 'consumption' FROM transfers
+        UNION ALL
+        SELECT resource_id, target_id, now(), 50, 'replenishment' FROM transfers
+        RETURNING resource_id
+    )
+    SELECT array_agg(DISTINCT resource_id) INTO redistributed FROM moved;
+
+    PERFORM emit_alert('info', 'Ресурс перераспределен между поселениями')
+    FROM unnest(redistributed);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resource_redistribution_stmt_trigger
+AFTER INSERT ON resource_operations
+REFERENCING NEW TABLE AS new_operations
+FOR EACH STATEMENT
+EXECUTE FUNCTION redistribute_resources_stmt();
+
+
+-- Переключение между построчными ('row') и статементными ('statement') триггерами resource_operations
+-- p_redistribution = 'engine' отключает оба триггера перераспределения: его выполняет
+-- пакетный оптимизатор src/core/redistribution.py по расписанию
+CREATE OR REPLACE PROCEDURE set_resource_trigger_mode(p_mode TEXT, p_redistribution TEXT DEFAULT 'trigger')
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    row_action TEXT;
+    stmt_action TEXT;
+BEGIN
+    IF p_redistribution NOT IN ('trigger', 'engine') THEN
+        RAISE EXCEPTION 'Неизвестный режим перераспределения: %', p_redistribution;
+    END IF;
+
+    IF p_mode = 'row' THEN
+        row_action := 'ENABLE';
+        stmt_action := 'DISABLE';
+    ELSIF p_mode = 'statement' THEN
+        row_action := 'DISABLE';
+        stmt_action := 'ENABLE';
+    ELSE
+        RAISE EXCEPTION 'Неизвестный режим триггеров: %', p_mode;
+    END IF;
+
+    EXECUTE format(
+        'ALTER TABLE resource_operations '
+        '%1$s TRIGGER resource_balance_trigger, '
+        '%1$s TRIGGER resource_threshold_trigger, '
+        '%1$s TRIGGER incident_status_update, '
+        '%1$s TRIGGER resource_redistribution_trigger, '
+        '%2$s TRIGGER resource_balance_stmt_trigger, '
+        '%2$s TRIGGER resource_threshold_stmt_trigger, '
+        '%2$s TRIGGER incident_status_update_stmt, '
+        '%2$s TRIGGER resource_redistribution_stmt_trigger',
+        row_action, stmt_action
+    );
+
+    IF p_redistribution = 'engine' THEN
+        ALTER TABLE resource_operations
+            DISABLE TRIGGER resource_redistribution_trigger,
+            DISABLE TRIGGER resource_redistribution_stmt_trigger;
+    END IF;
+END;
+$$;
+
+-- По умолчанию работают построчные триггеры
+CALL set_resource_trigger_mode('row');
+
+
 CREATE OR REPLACE FUNCTION check_energy_consumption() RETURNS TRIGGER AS $$
 DECLARE
     energy_limit INTEGER := 500;  -- Лимит потребления энергии
 BEGIN
     -- Если текущее потребление превышает лимит, создаем уведомление
     IF NEW.energy_consumption > energy_limit THEN
-        INSERT INTO notifications (type, message, timestamp, status)
-        VALUES ('critical', 'Превышение потребления энергии устройством ID: ' || NEW.id, now(), 'unread');
+        PERFORM emit_alert('critical', 'Превышение потребления энергии устройством ID: ' || NEW.id);
     END IF;
 
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+-- Функция вызывается только для строк сверх лимита и только при изменении потребления;
+-- конвейер телеметрии обновляет устройства без триггеров и проверяет лимит по пакету
 CREATE TRIGGER energy_consumption_trigger
-AFTER INSERT OR UPDATE ON sensors_devices
+AFTER INSERT OR UPDATE OF energy_consumption ON sensors_devices
 FOR EACH ROW
+WHEN (NEW.energy_consumption > 500)
 EXECUTE FUNCTION check_energy_consumption();
 
 
@@ -300,8 +707,8 @@ DECLARE
 BEGIN
     -- Проверяем доступные запасы ресурса
     SELECT COALESCE(SUM(quantity), 0) INTO available_stock
-    FROM resource_operations
-    WHERE resource_id = replenish_resource.resource_id;
+    FROM resource_balances
+    WHERE resource_balances.resource_id = replenish_resource.resource_id;
 
     -- Если ресурса достаточно, выполняем пополнение
     IF available_stock >= required_amount THEN
@@ -310,8 +717,7 @@ BEGIN
         FROM resources WHERE id = resource_id;
     ELSE
         -- Создаем уведомление о нехватке ресурса
-        INSERT INTO notifications (type, message, timestamp, status)
-        VALUES ('warning', 'Нехватка ресурса ID: ' || resource_id, now(), 'unread');
+        PERFORM emit_alert('warning', 'Нехватка ресурса ID: ' || replenish_resource.resource_id);
     END IF;
 END;
 $$;
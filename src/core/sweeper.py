@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+
+import asyncpg
+from rich.console import Console
+
+from src.config import SWEEP_BATCH_SIZE, SWEEP_INTERVAL
+from src.core.db import raw_connection, run
+
+console = Console()
+
+# Одна транзакция на пакет: отбор по индексу (status, deadline), перевод в overdue
+# и однократный поиск руководителя для всех задач пакета. SKIP LOCKED позволяет
+# нескольким планировщикам работать параллельно, не дожидаясь друг друга.
+SWEEP_SQL = """
+WITH due AS (
+    SELECT id FROM tasks
+    WHERE status = 'pending' AND deadline < now()
+    ORDER BY deadline
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+), overdue AS (
+    UPDATE tasks t SET status = 'overdue'
+    FROM due
+    WHERE t.id = due.id
+    RETURNING t.id, t.name
+), senior AS (
+    SELECT full_name FROM personnel
+    WHERE position = 'Руководитель'
+    ORDER BY id
+    LIMIT 1
+)
+SELECT overdue.id, overdue.name, senior.full_name AS senior_staff
+FROM overdue LEFT JOIN senior ON true
+"""
+
+
+def escalation_message(task_name: str, senior_staff: str | None) -> str:
+    return (
+        f'Задача "{task_name}" просрочена и передана {senior_staff or "руководителю"}'
+    )
+
+
+async def sweep_batch(conn: asyncpg.Connection, batch_size: int) -> list[int]:
+    async with conn.transaction():
+        rows = await conn.fetch(SWEEP_SQL, batch_size)
+        if rows:
+            await conn.execute(
+                "SELECT emit_alerts('alert', $1::text[])",
+                [escalation_message(row["name"], row["senior_staff"]) for row in rows],
+            )
+    return [row["id"] for row in rows]
+
+
+async def sweep_overdue_tasks(
+    conn: asyncpg.Connection | None = None, *, batch_size: int = SWEEP_BATCH_SIZE
+) -> list[int]:
+    """Переводит все просроченные pending-задачи в overdue пакетами; возвращает их id."""
+    if conn is None:
+        async with raw_connection() as conn:
+            return await sweep_overdue_tasks(conn, batch_size=batch_size)
+
+    escalated = []
+    while True:
+        batch = await sweep_batch(conn, batch_size)
+        escalated.extend(batch)
+        if len(batch) < batch_size:
+            return escalated
+
+
+async def sweeper_loop(interval: float = SWEEP_INTERVAL):
+    while True:
+        escalated = await sweep_overdue_tasks()
+        if escalated:
+            console.print(
+                f"[yellow]⚠[/] Просрочено и эскалировано задач: {len(escalated)}"
+            )
+        await asyncio.sleep(interval)
+
+
+async def main(watch: bool = False):
+    escalated = await sweep_overdue_tasks()
+    console.print(f"[green]✔[/] Эскалировано просроченных задач: {len(escalated)}")
+    if watch:
+        await sweeper_loop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Эскалация просроченных задач")
+    parser.add_argument(
+        "--watch", action="store_true", help="обходить задачи по расписанию"
+    )
+    args = parser.parse_args()
+    run(main(args.watch))
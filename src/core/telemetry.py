@@ -0,0 +1,202 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import asyncpg
+from rich.console import Console
+
+from src.config import (
+    ENERGY_LIMIT,
+    TELEMETRY_BATCH_SIZE,
+    TELEMETRY_FLUSH_INTERVAL,
+    TELEMETRY_QUEUE_SIZE,
+    TELEMETRY_WRITERS,
+)
+from src.core.db import raw_connection
+
+READING_COLUMNS = ("sensor_id", "recorded_at", "energy_consumption")
+
+console = Console()
+
+
+@dataclass
+class TelemetryStats:
+    received: int = 0
+    dropped: int = 0  # Отброшены submit_nowait при полной очереди
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+    alerts: int = 0
+    flush_seconds: float = 0.0
+    queue_max: int = 0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.written / self.flush_seconds if self.flush_seconds else 0.0
+
+
+class TelemetryPipeline:
+    """
+    Прием показаний датчиков: ограниченная очередь (при заполнении submit ждет —
+    обратное давление на производителей) и писатели, собирающие микропакеты
+    до batch_size строк или flush_interval секунд. Пакет записывается одной
+    транзакцией: COPY в sensor_readings, одно UPDATE последних значений
+    sensors_devices и проверка ENERGY_LIMIT по всему пакету.
+    """
+
+    def __init__(
+        self,
+        *,
+        queue_size: int = TELEMETRY_QUEUE_SIZE,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_interval: float = TELEMETRY_FLUSH_INTERVAL,
+        writers: int = TELEMETRY_WRITERS,
+        energy_limit: int = ENERGY_LIMIT,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.energy_limit = energy_limit
+        self.stats = TelemetryStats()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._writer_count = writers
+        self._writers: list[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def start(self):
+        self._writers = [
+            asyncio.create_task(self._writer()) for _ in range(self._writer_count)
+        ]
+
+    async def stop(self):
+        """Дожидается записи всего, что уже в очереди, и останавливает писателей."""
+        for _ in self._writers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._writers)
+        self._writers = []
+
+    def _record(self, sensor_id, energy_consumption, recorded_at) -> tuple:
+        self.stats.received += 1
+        return (sensor_id, recorded_at or datetime.now(), energy_consumption)
+
+    async def submit(
+        self,
+        sensor_id: int,
+        energy_consumption: int,
+        recorded_at: datetime | None = None,
+    ) -> None:
+        await self._queue.put(self._record(sensor_id, energy_consumption, recorded_at))
+        self.stats.queue_max = max(self.stats.queue_max, self._queue.qsize())
+
+    def submit_nowait(
+        self,
+        sensor_id: int,
+        energy_consumption: int,
+        recorded_at: datetime | None = None,
+    ) -> bool:
+        """Вариант без ожидания для производителей, которым лучше потерять показание."""
+        if self._queue.full():
+            self.stats.dropped += 1
+            return False
+        self._queue.put_nowait(self._record(sensor_id, energy_consumption, recorded_at))
+        return True
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple]):
+        start = time.perf_counter()
+        try:
+            async with raw_connection() as conn:
+                async with conn.transaction():
+                    alerts = await write_batch(conn, batch, self.energy_limit)
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            self.stats.failed += len(batch)
+            console.print(
+                f"[bold red]❌ Пакет телеметрии ({len(batch)} строк) не записан: {e}[/]"
+            )
+            return
+        self.stats.flush_seconds += time.perf_counter() - start
+        self.stats.written += len(batch)
+        self.stats.batches += 1
+        self.stats.alerts += alerts
+
+
+async def write_batch(
+    conn: asyncpg.Connection, batch: list[tuple], energy_limit: int = ENERGY_LIMIT
+) -> int:
+    """
+    Записывает пакет (sensor_id, recorded_at, energy_consumption) в текущей транзакции
+    и возвращает число уведомлений о превышении лимита (по одному на устройство).
+    """
+    await conn.copy_records_to_table(
+        "sensor_readings", records=batch, columns=READING_COLUMNS
+    )
+
+    # Последнее показание и пик потребления каждого устройства в пакете
+    latest, peaks = {}, {}
+    for sensor_id, recorded_at, energy in batch:
+        if sensor_id not in latest or latest[sensor_id][0] <= recorded_at:
+            latest[sensor_id] = (recorded_at, energy)
+        peaks[sensor_id] = max(peaks.get(sensor_id, energy), energy)
+    sensor_ids = sorted(latest)
+
+    # Построчный триггер лимита не нужен: лимит проверяется ниже одним запросом
+    await conn.execute("SET LOCAL session_replication_role = replica")
+    await conn.execute(
+        """
+        UPDATE sensors_devices d
+        SET last_update = r.recorded_at, energy_consumption = r.energy_consumption
+        FROM unnest($1::int[], $2::timestamp[], $3::int[])
+            AS r(sensor_id, recorded_at, energy_consumption)
+        WHERE d.id = r.sensor_id AND d.last_update <= r.recorded_at
+        """,
+        sensor_ids,
+        [latest[sensor_id][0] for sensor_id in sensor_ids],
+        [latest[sensor_id][1] for sensor_id in sensor_ids],
+    )
+    await conn.execute("SET LOCAL session_replication_role = origin")
+
+    return await conn.fetchval(
+        """
+        SELECT count(*) FROM (
+            SELECT emit_alert(
+                'critical', 'Превышение потребления энергии устройством ID: ' || sensor_id
+            )
+            FROM unnest($1::int[], $2::int[]) AS p(sensor_id, peak)
+            WHERE peak > $3
+        ) AS sent
+        """,
+        sensor_ids,
+        [peaks[sensor_id] for sensor_id in sensor_ids],
+        energy_limit,
+    )
@@ -0,0 +1,56 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import REDISTRIBUTION_MODE, RESOURCE_TRIGGER_MODE
+
+RESOURCE_TRIGGER_MODES = ("row", "statement")
+REDISTRIBUTION_MODES = ("trigger", "engine")
+
+
+async def set_resource_trigger_mode(
+    session: AsyncSession,
+    mode: str = RESOURCE_TRIGGER_MODE,
+    redistribution: str = REDISTRIBUTION_MODE,
+) -> None:
+    """
+    Включает построчные или статементные триггеры resource_operations.
+    redistribution="engine" отключает триггеры перераспределения в пользу
+    пакетного оптимизатора src/core/redistribution.py.
+    """
+    if mode not in RESOURCE_TRIGGER_MODES:
+        raise ValueError(f"Неизвестный режим триггеров: {mode}")
+    if redistribution not in REDISTRIBUTION_MODES:
+        raise ValueError(f"Неизвестный режим перераспределения: {redistribution}")
+    await session.execute(
+        text("CALL set_resource_trigger_mode(:mode, :redistribution)"),
+        {"mode": mode, "redistribution": redistribution},
+    )
+    await session.commit()
+
+
+async def get_resource_trigger_mode(session: AsyncSession) -> str:
+    """Возвращает текущий режим по состоянию статементного триггера порога."""
+    result = await session.execute(
+        text(
+            "SELECT tgenabled FROM pg_trigger "
+            "WHERE tgrelid = 'resource_operations'::regclass "
+            "AND tgname = 'resource_threshold_stmt_trigger'"
+        )
+    )
+    return "row" if result.scalar() == "D" else "statement"
+
+
+async def get_redistribution_mode(session: AsyncSession) -> str:
+    """
+    "engine", если оба триггера перераспределения отключены, иначе "trigger":
+    включенный триггер перераспределяет каждое потребление поверх оптимизатора.
+    """
+    result = await session.execute(
+        text(
+            "SELECT bool_and(tgenabled = 'D') FROM pg_trigger "
+            "WHERE tgrelid = 'resource_operations'::regclass "
+            "AND tgname IN ('resource_redistribution_trigger', "
+            "'resource_redistribution_stmt_trigger')"
+        )
+    )
+    return "engine" if result.scalar() else "trigger"
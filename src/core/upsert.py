@@ -0,0 +1,143 @@
+from typing import Any, Mapping, Sequence
+
+import asyncpg
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.db import raw_connection
+from src.core.models import Infrastructure, Resource, Settlement
+
+_DIALECT = postgresql.dialect()
+
+
+def natural_key(model) -> tuple[str, ...]:
+    """Столбцы первого UNIQUE-ограничения модели — ключ для ON CONFLICT."""
+    for constraint in model.__table__.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            return tuple(column.name for column in constraint.columns)
+    raise ValueError(f"У таблицы {model.__tablename__} нет естественного ключа")
+
+
+def _key_equals(table, left: str, right: str, column: str) -> str:
+    """
+    Равенство по столбцу ключа. IS NOT DISTINCT FROM не использует индекс ключа и не
+    годится для hash/merge join, поэтому NULL (NULLS NOT DISTINCT) сравнивается
+    отдельной веткой только для столбцов, допускающих NULL.
+    """
+    equals = f"{left}.{column} = {right}.{column}"
+    if not table.c[column].nullable:
+        return equals
+    return f"({equals} OR ({left}.{column} IS NULL AND {right}.{column} IS NULL))"
+
+
+def upsert_sql(model, columns: Sequence[str], key: Sequence[str], update: bool) -> str:
+    """
+    Один запрос на любое число строк: входные строки приходят массивами в unnest(),
+    новые вставляются, существующие находятся по ключу. ON CONFLICT DO NOTHING не
+    возвращает уже существующие строки, поэтому их id добираются соединением с
+    таблицей (снимок запроса видит их, но не только что вставленные строки).
+    """
+    table = model.__table__
+    arrays = ", ".join(
+        f"${i}::{table.c[column].type.compile(dialect=_DIALECT)}[]"
+        for i, column in enumerate(columns, start=1)
+    )
+    names = ", ".join(columns)
+    returning = ", ".join(["id", *key])
+    matches = " AND ".join(_key_equals(table, "t", "i", column) for column in key)
+    written = " AND ".join(_key_equals(table, "w", "t", column) for column in key)
+    if update and (changed := [column for column in columns if column not in key]):
+        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in changed)
+        differs = (
+            f"({', '.join(f'{table.name}.{column}' for column in changed)}) "
+            f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{column}' for column in changed)})"
+        )
+        conflict = f"DO UPDATE SET {assignments} WHERE {differs}"
+    else:
+        conflict = "DO NOTHING"
+    return f"""
+    WITH i AS (
+        SELECT * FROM unnest({arrays}) AS i({names})
+    ), w AS (
+        INSERT INTO {table.name} ({names})
+        SELECT {names} FROM i
+        ON CONFLICT ({', '.join(key)}) {conflict}
+        RETURNING {returning}
+    )
+    SELECT {returning} FROM w
+    UNION ALL
+    SELECT {', '.join(f't.{column}' for column in ['id', *key])}
+    FROM {table.name} t JOIN i ON {matches}
+    WHERE NOT EXISTS (SELECT 1 FROM w WHERE {written})
+    """
+
+
+async def upsert(
+    model,
+    rows: Sequence[Mapping[str, Any]],
+    *,
+    update: bool = False,
+    conn: asyncpg.Connection | None = None,
+) -> dict[tuple, int]:
+    """
+    Находит или создает строки справочника по естественному ключу за один запрос;
+    возвращает {ключ: id}. update=True перезаписывает остальные столбцы существующих
+    строк, если они отличаются. Повторы ключа во входных данных схлопываются
+    (последняя строка побеждает): ON CONFLICT не может задеть строку дважды.
+    """
+    if conn is None:
+        async with raw_connection() as conn:
+            return await upsert(model, rows, update=update, conn=conn)
+    if not rows:
+        return {}
+
+    key = natural_key(model)
+    columns = list(rows[0])
+    unique = {tuple(row[column] for column in key): row for row in rows}
+    sql = upsert_sql(model, columns, key, update)
+    arrays = [[row[column] for row in unique.values()] for column in columns]
+
+    ids = {tuple(record)[1:]: record["id"] for record in await conn.fetch(sql, *arrays)}
+    if len(ids) < len(unique):
+        # Ключ вставлен параллельной транзакцией после снимка: DO NOTHING его
+        # пропустил, а соединение со снимком не видит. Повторный запрос увидит.
+        missing = [row for row_key, row in unique.items() if row_key not in ids]
+        arrays = [[row[column] for row in missing] for column in columns]
+        ids.update(
+            {
+                tuple(record)[1:]: record["id"]
+                for record in await conn.fetch(sql, *arrays)
+            }
+        )
+    return ids
+
+
+async def session_connection(session: AsyncSession) -> asyncpg.Connection:
+    """
+    asyncpg-соединение текущей транзакции сессии: upsert фиксируется вместе с ней.
+    Адаптер asyncpg посылает BEGIN лишь перед первым своим запросом, поэтому на
+    свежей сессии транзакция открывается пустым запросом — иначе запросы напрямую
+    через драйвер шли бы в автокоммите и не откатывались вместе с сессией.
+    """
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    if not raw.driver_connection.is_in_transaction():
+        await conn.exec_driver_sql("SELECT 1")
+    return raw.driver_connection
+
+
+async def upsert_settlements(rows, **kwargs) -> dict[str, int]:
+    """{название: id}."""
+    ids = await upsert(Settlement, rows, **kwargs)
+    return {name: row_id for (name,), row_id in ids.items()}
+
+
+async def upsert_resources(rows, **kwargs) -> dict[tuple[int, str], int]:
+    """{(settlement_id, название): id}."""
+    return await upsert(Resource, rows, **kwargs)
+
+
+async def upsert_infrastructure(rows, **kwargs) -> dict[tuple[int, str], int]:
+    """{(settlement_id, название): id}."""
+    return await upsert(Infrastructure, rows, **kwargs)
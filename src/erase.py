@@ -1,45 +1,153 @@
-import asyncio
+import argparse
+
 import asyncpg
 from rich.console import Console
 from rich.panel import Panel
 
-from src.config import DB_CONFIG, TABLES
+from src.config import DB_CONFIG, RESET_MODES, SNAPSHOT_STRATEGY, TABLES
+from src.core.db import dispose_engine, raw_connection, run
 
 # Настройки подключения к БД
 console = Console()
 
 
-async def clear_tables_and_reset_sequences():
-    conn = await asyncpg.connect(**DB_CONFIG)
-    try:
-        console.print(
-            Panel(
-                "[bold cyan]Очистка всех таблиц и сброс последовательностей...[/]",
-                expand=False,
+async def clear_tables_and_reset_sequences(mode: str = "truncate"):
+    """
+    Очищает все таблицы TABLES. "truncate" — один TRUNCATE ... RESTART IDENTITY CASCADE,
+    "delete" — прежний построчный DELETE и сброс каждой последовательности.
+    """
+    if mode not in RESET_MODES:
+        raise ValueError(f"Неизвестный режим очистки: {mode}")
+
+    async with raw_connection() as conn:
+        try:
+            console.print(
+                Panel(
+                    "[bold cyan]Очистка всех таблиц и сброс последовательностей...[/]",
+                    expand=False,
+                )
             )
-        )
-
-        for table in TABLES:
-            # Clear the table
-            await conn.execute(f"DELETE FROM {table} CASCADE;")
-            console.print(f"[green]✔[/] Таблица [bold]{table}[/] очищена.")
-            sequence_name = f"{table}_id_seq"
-            await conn.execute(f"ALTER SEQUENCE {sequence_name} RESTART WITH 1;")
+
+            if mode == "truncate":
+                await conn.execute(
+                    f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE;"
+                )
+                console.print(
+                    f"[green]✔[/] Таблицы очищены одним TRUNCATE ({len(TABLES)} шт.)."
+                )
+            else:
+                for table in TABLES:
+                    # Clear the table
+                    await conn.execute(f"DELETE FROM {table} CASCADE;")
+                    console.print(f"[green]✔[/] Таблица [bold]{table}[/] очищена.")
+                    sequence_name = f"{table}_id_seq"
+                    # У таблиц с составным ключом (resource_balances) последовательности нет
+                    await conn.execute(
+                        f"ALTER SEQUENCE IF EXISTS {sequence_name} RESTART WITH 1;"
+                    )
+                    console.print(
+                        f"[green]✔[/] Последовательность [bold]{sequence_name}[/] сброшена."
+                    )
+
             console.print(
-                f"[green]✔[/] Последовательность [bold]{sequence_name}[/] сброшена."
+                Panel(
+                    "[bold green]✅ Все таблицы и последовательности успешно очищены и сброшены![/]",
+                    expand=False,
+                )
             )
+        except Exception as e:
+            console.print(f"[bold red]❌ Ошибка при очистке: {e}[/]")
+
 
-        console.print(
-            Panel(
-                "[bold green]✅ Все таблицы и последовательности успешно очищены и сброшены![/]",
-                expand=False,
+def snapshot_database(name: str) -> str:
+    return f"{DB_CONFIG['database']}_snap_{name}"
+
+
+async def _maintenance_connection() -> asyncpg.Connection:
+    # CREATE/DROP DATABASE выполняются из служебной базы, а не из клонируемой
+    return await asyncpg.connect(**{**DB_CONFIG, "database": "postgres"})
+
+
+async def clone_database(source: str, target: str, *, terminate: bool = False) -> None:
+    """
+    Пересоздает базу target копией source (CREATE DATABASE ... TEMPLATE). У шаблона
+    не должно быть других подключений: terminate=True обрывает их (только для
+    служебных шаблонов и снимков), иначе клонирование отказывает с их списком —
+    рабочую базу могут держать settlement serve и слушатели LISTEN.
+    """
+    # Пул этого процесса закрывается в любом случае
+    await dispose_engine()
+    conn = await _maintenance_connection()
+    try:
+        if terminate:
+            await conn.execute(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                "WHERE datname = $1 AND pid <> pg_backend_pid()",
+                source,
+            )
+        else:
+            sessions = await conn.fetch(
+                "SELECT pid, application_name FROM pg_stat_activity "
+                "WHERE datname = $1 AND pid <> pg_backend_pid()",
+                source,
             )
-        )
-    except Exception as e:
-        console.print(f"[bold red]❌ Ошибка при очистке: {e}[/]")
+            if sessions:
+                listed = ", ".join(
+                    f"{row['pid']} ({row['application_name'] or '—'})"
+                    for row in sessions
+                )
+                raise RuntimeError(
+                    f"К базе {source} подключены другие сеансы: {listed}. "
+                    f"Остановите их (например, settlement serve) перед копированием"
+                )
+        await conn.execute(f'DROP DATABASE IF EXISTS "{target}" WITH (FORCE)')
+        strategy = f" STRATEGY = {SNAPSHOT_STRATEGY}" if SNAPSHOT_STRATEGY else ""
+        await conn.execute(f'CREATE DATABASE "{target}" TEMPLATE "{source}"{strategy}')
     finally:
         await conn.close()
 
 
+async def drop_database(name: str) -> None:
+    conn = await _maintenance_connection()
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await conn.close()
+
+
+async def create_snapshot(name: str = "seed") -> str:
+    """Сохраняет текущее состояние рабочей базы как шаблон-снимок."""
+    snapshot = snapshot_database(name)
+    await clone_database(DB_CONFIG["database"], snapshot)
+    console.print(f"[green]✔[/] Снимок [bold]{snapshot}[/] создан.")
+    return snapshot
+
+
+async def restore_snapshot(name: str = "seed") -> None:
+    """Пересоздает рабочую базу из снимка; пул переподключится при следующем запросе."""
+    snapshot = snapshot_database(name)
+    await clone_database(snapshot, DB_CONFIG["database"], terminate=True)
+    console.print(f"[green]✔[/] База восстановлена из снимка [bold]{snapshot}[/].")
+
+
+async def drop_snapshot(name: str = "seed") -> None:
+    await drop_database(snapshot_database(name))
+
+
+async def main(mode="truncate", snapshot=None, restore=None):
+    if snapshot:
+        await create_snapshot(snapshot)
+    elif restore:
+        await restore_snapshot(restore)
+    else:
+        await clear_tables_and_reset_sequences(mode)
+
+
 if __name__ == "__main__":
-    asyncio.run(clear_tables_and_reset_sequences())
+    parser = argparse.ArgumentParser(description="Очистка базы и снимки состояния")
+    parser.add_argument("--mode", choices=RESET_MODES, default="truncate")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--snapshot", metavar="NAME", help="сохранить снимок базы")
+    group.add_argument("--restore", metavar="NAME", help="восстановить базу из снимка")
+    args = parser.parse_args()
+    run(main(args.mode, args.snapshot, args.restore))
@@ -0,0 +1,111 @@
+import numpy as np
+from rich.console import Console
+
+from src.core.db import run
+from src.core.energy_grid import (
+    GridSnapshot,
+    group_sum,
+    grid_utilisation,
+    overload_statuses,
+    simulate,
+)
+
+console = Console()
+
+
+def grid(sites: list[list[tuple[str, float, float]]], devices: list[float]):
+    """Сеть из объектов; система объекта — (статус, мощность, нагрузка)."""
+    systems = [(i, system) for i, site in enumerate(sites) for system in site]
+    status = np.array([system[0] for _, system in systems], dtype=object)
+    load = np.array([system[2] for _, system in systems], dtype=float)
+    return GridSnapshot(
+        ids=np.arange(1, len(systems) + 1),
+        names=[f"System {i}" for i in range(1, len(systems) + 1)],
+        status=status,
+        capacity=np.array([system[1] for _, system in systems], dtype=float),
+        metered_load=load,
+        load=np.where(status != "offline", load, 0.0),
+        group=np.array([i for i, _ in systems]),
+        group_names=[f"Site {i}" for i in range(len(sites))],
+        group_demand=np.array(devices, dtype=float),
+        group_settlement=np.zeros(len(sites), dtype=int),
+        settlement_names=["Settlement"],
+    )
+
+
+def deterministic(snapshot: GridSnapshot, cascade_steps: int):
+    """Без случайных отказов и колебаний спроса: один сценарий."""
+    return simulate(
+        snapshot,
+        scenarios=1,
+        outage_probability=0.0,
+        demand_sigma=0.0,
+        trip_ratio=1.2,
+        cascade_steps=cascade_steps,
+        rng=np.random.default_rng(0),
+    )
+
+
+async def main():
+    failures = []
+
+    group = np.array([0, 1, 0, 2])
+    sums = group_sum(np.array([1.0, 2.0, 3.0, 4.0]), group, 3)
+    matrix = group_sum(np.array([[1.0, 2.0, 3.0, 4.0], [0.0, 1.0, 0.0, 1.0]]), group, 3)
+    if not np.array_equal(sums, [4, 2, 4]) or not np.array_equal(
+        matrix, [[4, 2, 4], [0, 1, 1]]
+    ):
+        failures.append("group_sum считает суммы по группам неверно")
+
+    # Каскад: перегруженная система отключается, ее нагрузка валит соседей по очереди
+    cascade = grid(
+        [
+            [
+                ("operational", 100, 130),
+                ("operational", 100, 70),
+                ("operational", 100, 30),
+            ]
+        ],
+        [0],
+    )
+    one, five = deterministic(cascade, 1), deterministic(cascade, 5)
+    if one.total_shed[0] != 30 or five.total_shed[0] != 230:
+        failures.append(
+            f"каскад: отключение за 1 шаг {one.total_shed[0]:.0f} (ожидалось 30), "
+            f"за 5 шагов {five.total_shed[0]:.0f} (ожидалось 230)"
+        )
+    if not np.array_equal(five.trip_probability, [1, 1, 1]):
+        failures.append("каскад должен отключить все системы объекта")
+
+    # Все системы объекта отключены: спрос устройств не обслуживается целиком
+    dark = grid([[("offline", 300, 0), ("offline", 300, 0)]], [500])
+    infrastructure, _ = grid_utilisation(dark)
+    if deterministic(dark, 5).expected_shed[0] != 500:
+        failures.append("спрос объекта без работающих систем должен отключаться")
+    if infrastructure["load"].iloc[0] != 500:
+        failures.append(
+            "нагрузка объекта без работающих систем должна равняться спросу"
+        )
+
+    statuses = grid(
+        [
+            [
+                ("operational", 100, 150),
+                ("overloaded", 100, 50),
+                ("offline", 100, 500),
+                ("operational", 100, 50),
+            ]
+        ],
+        [0],
+    )
+    ids, values = overload_statuses(statuses)
+    if ids.tolist() != [1, 2] or values.tolist() != ["overloaded", "operational"]:
+        failures.append(f"overload_statuses: {ids.tolist()} {values.tolist()}")
+
+    if failures:
+        raise RuntimeError(f"Модель энергосети: {'; '.join(failures)}")
+    console.print("[green]✔ Модель энергосети: суммы, каскад и статусы верны[/green]")
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+import pandas as pd
+from rich.console import Console
+
+from src.core.db import run
+from src.core.rollups import KEYS, print_forecast, project_depletion
+
+TODAY = date(2025, 3, 1)
+
+console = Console()
+
+
+def balances(*quantities: float) -> pd.DataFrame:
+    """Остатки ресурса 1 в поселениях 1..n."""
+    return pd.DataFrame(
+        [
+            (1, settlement_id, f"Settlement {settlement_id}", "Water", quantity)
+            for settlement_id, quantity in enumerate(quantities, 1)
+        ],
+        columns=KEYS + ["settlement", "resource", "quantity"],
+    )
+
+
+def daily(settlement_id: int, consumed: float, days: int = 10) -> pd.DataFrame:
+    """Сводка за последние days полных суток: суммарный расход consumed поровну по дням."""
+    return pd.DataFrame(
+        [
+            (1, settlement_id, TODAY - timedelta(days=age), consumed / days, 0.0)
+            for age in range(1, days + 1)
+        ],
+        columns=KEYS + ["bucket", "consumed", "replenished"],
+    )
+
+
+async def main():
+    # 1 — нет расхода, 2 — отрицательный остаток, 3 — очень медленный расход, 4 — обычный
+    projected = project_depletion(
+        balances(500, -20, 100000, 100),
+        pd.concat([daily(3, 1), daily(4, 100)], ignore_index=True),
+        today=TODAY,
+    )
+    # Печать таблицы тоже проходит через NaT и inf
+    print_forecast(projected)
+    forecast = projected.set_index("settlement_id")
+
+    failures = []
+    idle, negative, slow, regular = (forecast.loc[i] for i in (1, 2, 3, 4))
+    if idle["days_left"] != float("inf") or not pd.isna(idle["depletion_date"]):
+        failures.append("без расхода ожидается inf и NaT")
+    if negative["days_left"] != 0 or negative["depletion_date"] != pd.Timestamp(TODAY):
+        failures.append("отрицательный остаток должен исчерпываться сегодня")
+    if not pd.isna(slow["depletion_date"]):
+        failures.append("дата за пределами диапазона Timestamp должна быть NaT")
+    if pd.isna(regular["depletion_date"]) or not 0 < regular["days_left"] < 100:
+        failures.append("обычный расход должен давать конечную дату")
+
+    if failures:
+        raise RuntimeError(f"Прогноз исчерпания: {'; '.join(failures)}")
+    console.print("[green]✔ Прогноз исчерпания устойчив к краевым случаям[/green]")
+
+
+if __name__ == "__main__":
+    run(main())
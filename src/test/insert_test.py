@@ -1,13 +1,10 @@
-import asyncio
 import random
 import datetime
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy import func
 
 from rich.console import Console
 
-from src.config import DATABASE_URL
+from src.core.db import get_session, run
 from src.core.models import (
     EnergySystem,
     Event,
@@ -26,46 +23,50 @@ from src.core.models import (
     Task,
     TransportVehicle,
 )
+from src.core.upsert import (
+    session_connection,
+    upsert_infrastructure,
+    upsert_resources,
+    upsert_settlements,
+)
 
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 console = Console()
 
 
+# Справочники создаются через INSERT ... ON CONFLICT: повторный запуск находит
+# уже существующие строки по естественному ключу, а не дублирует их
 async def add_settlement(session):
-    settlement = Settlement(
-        name="Arctic Base", region="North Pole", climate_type="Arctic"
-    )
-    session.add(settlement)
+    values = {"name": "Arctic Base", "region": "North Pole", "climate_type": "Arctic"}
+    ids = await upsert_settlements([values], conn=await session_connection(session))
     await session.commit()
     console.print("[green]✔ Поселение добавлено[/green]")
-    return settlement
+    return Settlement(id=ids[values["name"]], **values)
 
 
 async def add_infrastructure(session, settlement):
-    infrastructure = Infrastructure(
-        name="Solar Power Plant", type="Energy", settlement_id=settlement.id
-    )
-    session.add(infrastructure)
+    values = {
+        "name": "Solar Power Plant",
+        "type": "Energy",
+        "settlement_id": settlement.id,
+    }
+    ids = await upsert_infrastructure([values], conn=await session_connection(session))
     await session.commit()
     console.print("[green]✔ Инфраструктура добавлена[/green]")
-    return infrastructure
+    return Infrastructure(id=ids[(settlement.id, values["name"])], **values)
 
 
 async def add_resources(session, settlement):
-    resources = [
-        Resource(
-            name="Water", unit="Liters", type="Liquid", settlement_id=settlement.id
-        ),
-        Resource(name="Food", unit="Kg", type="Solid", settlement_id=settlement.id),
-        Resource(
-            name="Fuel", unit="Liters", type="Liquid", settlement_id=settlement.id
-        ),
+    rows = [
+        {"name": "Water", "unit": "Liters", "type": "Liquid"},
+        {"name": "Food", "unit": "Kg", "type": "Solid"},
+        {"name": "Fuel", "unit": "Liters", "type": "Liquid"},
     ]
-    session.add_all(resources)
+    rows = [{**row, "settlement_id": settlement.id} for row in rows]
+    # Все ресурсы поселения — одним запросом
+    ids = await upsert_resources(rows, conn=await session_connection(session))
     await session.commit()
     console.print("[green]✔ Ресурсы добавлены[/green]")
-    return resources
+    return [Resource(id=ids[(settlement.id, row["name"])], **row) for row in rows]
 
 
 async def add_resource_operations(session, settlement, resources):
@@ -182,7 +183,7 @@ async def add_logistic_route(session):
     logistic_route = LogisticRoute(
         name="Supply Route",
         description="Route for supply deliveries",
-        waypoints=func.ST_GeomFromText("LINESTRING(0 0, 1 1)"),
+        waypoints=func.ST_GeomFromText("LINESTRING(0 0, 1 1)", 4326),
         status="active",
     )
     session.add(logistic_route)
@@ -207,7 +208,7 @@ async def add_route(session):
     route = Route(
         name="Emergency Evacuation Route",
         description="Route for emergency evacuations",
-        waypoints=func.ST_GeomFromText("LINESTRING(0 0, 1 1)"),
+        waypoints=func.ST_GeomFromText("LINESTRING(0 0, 1 1)", 4326),
         status="active",
     )
     session.add(route)
@@ -231,7 +232,7 @@ async def add_geozone(session):
     geozone = GeoZone(
         name="Protected Area",
         type="Conservation",
-        coordinates=func.ST_GeomFromText("POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))"),
+        coordinates=func.ST_GeomFromText("POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))", 4326),
         description="Area protected for conservation",
         usage_type="Restricted",
     )
@@ -255,7 +256,7 @@ async def add_energy_system(session, infrastructure):
 
 
 async def main():
-    async with AsyncSessionLocal() as session:
+    async with get_session() as session:
         console.print("[bold cyan]Заполняем базу данных...[/bold cyan]")
 
         settlement = await add_settlement(session)
@@ -279,4 +280,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
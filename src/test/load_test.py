@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import queue
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+from aiomultiprocess import Worker
+from aiomultiprocess.core import get_manager
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from sqlalchemy import func, insert, select, update
+
+from src.config import (
+    LOAD_ARRIVAL_RATES,
+    LOAD_CLIENTS_PER_PROCESS,
+    LOAD_MIX,
+    LOAD_PROCESSES,
+    LOAD_REPORT_INTERVAL,
+    LOAD_STEP_DURATION,
+)
+from src.core.db import configure_engine, dispose_engine, get_session, run
+from src.core.models import (
+    ResourceOperation,
+    SensorDevice,
+    Resource,
+    Task,
+)
+from src.core.prepared import hot_query
+from src.test import insert_test
+
+console = Console()
+
+
+async def op_resource_operation(session, fixtures, rng):
+    resource_id, settlement_id = rng.choice(fixtures["resources"])
+    operation_type = rng.choice(["consumption", "replenishment"])
+    quantity = rng.randint(1, 100)
+    await session.execute(
+        insert(ResourceOperation).values(
+            resource_id=resource_id,
+            settlement_id=settlement_id,
+            quantity=quantity if operation_type == "replenishment" else -quantity,
+            operation_type=operation_type,
+        )
+    )
+    await session.commit()
+
+
+async def op_sensor_update(session, fixtures, rng):
+    await session.execute(
+        update(SensorDevice)
+        .where(SensorDevice.id == rng.choice(fixtures["sensors"]))
+        .values(energy_consumption=rng.randint(0, 600), last_update=func.now())
+    )
+    await session.commit()
+
+
+async def op_task_update(session, fixtures, rng):
+    await session.execute(
+        update(Task)
+        .where(Task.id == rng.choice(fixtures["tasks"]))
+        .values(status=rng.choice(["pending", "completed"]))
+    )
+    await session.commit()
+
+
+async def op_read(session, fixtures, rng):
+    # Горячий запрос уровня ресурса идет через реестр подготовленных выражений
+    resource_id, _ = rng.choice(fixtures["resources"])
+    await hot_query("resource_level", resource_id)
+
+
+OPERATIONS = {
+    "resource_operation": op_resource_operation,
+    "sensor_update": op_sensor_update,
+    "task_update": op_task_update,
+    "read": op_read,
+}
+
+
+async def load_fixtures() -> dict:
+    """Идентификаторы, по которым работает нагрузка; при пустой базе заполняет ее."""
+    async with get_session() as session:
+        resources = (
+            await session.execute(select(Resource.id, Resource.settlement_id))
+        ).all()
+        if not resources:
+            await insert_test.main()
+            resources = (
+                await session.execute(select(Resource.id, Resource.settlement_id))
+            ).all()
+        sensors = (await session.execute(select(SensorDevice.id))).scalars().all()
+        tasks = (await session.execute(select(Task.id))).scalars().all()
+    return {
+        "resources": [tuple(row) for row in resources],
+        "sensors": list(sensors),
+        "tasks": list(tasks),
+    }
+
+
+async def worker(worker_id, fixtures, rate, duration, clients, mix, reports):
+    """
+    Процесс нагрузки: открытая модель — запросы поступают пуассоновским потоком с
+    интенсивностью rate независимо от скорости ответов, clients клиентов их обслуживают.
+    Задержка считается от запланированного момента поступления, включая ожидание в очереди.
+    """
+    configure_engine(pool_size=clients, max_overflow=0)
+    rng = random.Random(worker_id)
+    names, weights = zip(*mix.items())
+    arrivals = asyncio.Queue()
+    samples = []
+
+    async def schedule():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        arrival = loop.time()
+        while True:
+            arrival += rng.expovariate(rate)
+            if arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, arrival - loop.time()))
+            # Момент поступления в часах time.time(), чтобы родитель мог свести процессы
+            lag = loop.time() - arrival
+            arrivals.put_nowait((rng.choices(names, weights)[0], time.time() - lag))
+        for _ in range(clients):
+            arrivals.put_nowait(None)
+
+    async def client():
+        while (item := await arrivals.get()) is not None:
+            name, scheduled = item
+            ok = True
+            try:
+                async with get_session() as session:
+                    await OPERATIONS[name](session, fixtures, rng)
+            except Exception:
+                ok = False
+            finished = time.time()
+            samples.append((finished, name, finished - scheduled, ok))
+
+    async def report():
+        while True:
+            await asyncio.sleep(LOAD_REPORT_INTERVAL)
+            if samples:
+                batch = samples[:]
+                del samples[: len(batch)]
+                reports.put(batch)
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(schedule(), *(client() for _ in range(clients)))
+    finally:
+        reporter.cancel()
+        if samples:
+            reports.put(samples[:])
+        reports.put(None)
+        await dispose_engine()
+
+
+def percentiles(latencies) -> tuple[float, float, float]:
+    if not latencies:
+        return (0.0, 0.0, 0.0)
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return p50, p95, p99
+
+
+def build_table(title, windows) -> Table:
+    table = Table(title=title)
+    for column in ("Секунда", "Операций/с", "p50, мс", "p95, мс", "p99, мс", "Ошибки"):
+        table.add_column(column, justify="right")
+    for second in sorted(windows)[-15:]:
+        window = windows[second]
+        p50, p95, p99 = percentiles(window["latencies"])
+        table.add_row(
+            str(second),
+            f"{len(window['latencies']) / LOAD_REPORT_INTERVAL:.0f}",
+            f"{p50:.1f}",
+            f"{p95:.1f}",
+            f"{p99:.1f}",
+            str(window["errors"]),
+        )
+    return table
+
+
+async def run_step(fixtures, rate, duration, processes, clients, mix) -> dict:
+    reports = get_manager().Queue()
+    workers = [
+        Worker(
+            target=worker,
+            args=(i, fixtures, rate / processes, duration, clients, mix, reports),
+        )
+        for i in range(processes)
+    ]
+    started = time.time()
+    for process in workers:
+        process.start()
+
+    windows = defaultdict(lambda: {"latencies": [], "errors": 0})
+    latencies = []
+    errors = 0
+    finished = 0
+    title = f"Нагрузка {rate} запросов/с: {processes} процессов × {clients} клиентов"
+    with Live(build_table(title, windows), console=console) as live:
+        while finished < processes:
+            try:
+                batch = await asyncio.to_thread(reports.get, True, 0.5)
+            except queue.Empty:
+                # Процесс, упавший до отправки завершающего None, не должен подвесить шаг
+                if all(process.exitcode is not None for process in workers):
+                    break
+                continue
+            if batch is None:
+                finished += 1
+                continue
+            for completed, _, latency, ok in batch:
+                window = windows[int((completed - started) // LOAD_REPORT_INTERVAL)]
+                window["latencies"].append(latency)
+                latencies.append(latency)
+                if not ok:
+                    window["errors"] += 1
+                    errors += 1
+            live.update(build_table(title, windows))
+
+    for process in workers:
+        await process.join()
+
+    p50, p95, p99 = percentiles(latencies)
+    return {
+        "rate": rate,
+        "throughput": len(latencies) / duration,
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "errors": errors,
+    }
+
+
+def print_summary(steps):
+    table = Table(title="Сводка по шагам нагрузки")
+    for column in (
+        "Запросов/с",
+        "Выполнено/с",
+        "p50, мс",
+        "p95, мс",
+        "p99, мс",
+        "Ошибки",
+    ):
+        table.add_column(column, justify="right")
+    for step in steps:
+        table.add_row(
+            str(step["rate"]),
+            f"{step['throughput']:.1f}",
+            f"{step['p50']:.1f}",
+            f"{step['p95']:.1f}",
+            f"{step['p99']:.1f}",
+            str(step["errors"]),
+        )
+    console.print(table)
+
+    # Насыщение: система перестает успевать за входящим потоком
+    saturated = next(
+        (step for step in steps if step["throughput"] < step["rate"] * 0.95), None
+    )
+    if saturated:
+        console.print(
+            f"[bold red]❗ Насыщение при {saturated['rate']} запросах/с: "
+            f"выполнено {saturated['throughput']:.1f}/с, p99 {saturated['p99']:.1f} мс[/]"
+        )
+    else:
+        console.print("[bold green]✅ Насыщение не достигнуто[/]")
+
+
+async def main(
+    rates=LOAD_ARRIVAL_RATES,
+    duration=LOAD_STEP_DURATION,
+    processes=LOAD_PROCESSES,
+    clients=LOAD_CLIENTS_PER_PROCESS,
+    mix=LOAD_MIX,
+):
+    fixtures = await load_fixtures()
+    # Дочерние процессы открывают собственные пулы
+    await dispose_engine()
+
+    # Операции без подходящих строк в базе исключаются из смеси
+    required = {
+        "resource_operation": "resources",
+        "sensor_update": "sensors",
+        "task_update": "tasks",
+        "read": "resources",
+    }
+    mix = {name: weight for name, weight in mix.items() if fixtures[required[name]]}
+
+    steps = []
+    for rate in rates:
+        steps.append(await run_step(fixtures, rate, duration, processes, clients, mix))
+    print_summary(steps)
+    return steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор смешанной нагрузки")
+    parser.add_argument("--rate", type=float, nargs="+", default=LOAD_ARRIVAL_RATES)
+    parser.add_argument("--duration", type=float, default=LOAD_STEP_DURATION)
+    parser.add_argument("--processes", type=int, default=LOAD_PROCESSES)
+    parser.add_argument("--clients", type=int, default=LOAD_CLIENTS_PER_PROCESS)
+    args = parser.parse_args()
+    run(main(args.rate, args.duration, args.processes, args.clients))
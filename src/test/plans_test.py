@@ -0,0 +1,212 @@
+"""
+Регрессия планов: каждый запрос триггеров и горячий запрос приложения объясняется
+EXPLAIN (FORMAT JSON) на заполненной базе; Seq Scan по таблице (партиции) не меньше
+PLANS_LARGE_TABLE_ROWS строк считается ошибкой.
+
+Планы строятся обобщенными (plan_cache_mode = force_generic_plan): PL/pgSQL кэширует
+запросы триггеров именно так, и план не должен зависеть от конкретного значения NEW.
+"""
+
+import json
+import re
+
+import asyncpg
+from rich.console import Console
+from rich.table import Table
+
+from src.config import PLANS_LARGE_TABLE_ROWS, PLANS_PRESET
+from src.core.datagen import generate
+from src.core.db import raw_connection, run
+from src.core.energy_grid import UPDATE_STATUS_SQL
+from src.core.migrations import migrate
+from src.core.models import Infrastructure, Resource, Settlement
+from src.core.prepared import HOT_QUERIES
+from src.core.sweeper import SWEEP_SQL
+from src.core.upsert import natural_key, upsert_sql
+
+# Запросы тел триггеров из db.sql; NEW.* и параметры процедур заменены на $n,
+# переходная таблица new_operations — на массивы unnest()
+TRIGGER_QUERIES = {
+    "update_resource_balance": """
+        INSERT INTO resource_balances (resource_id, settlement_id, quantity, updated_at)
+        VALUES ($1::int, $2::int, $3::int, now())
+        ON CONFLICT (resource_id, settlement_id) DO UPDATE
+        SET quantity = resource_balances.quantity + EXCLUDED.quantity,
+            updated_at = EXCLUDED.updated_at
+    """,
+    "check_resource_threshold": """
+        SELECT COALESCE(SUM(quantity), 0) FROM resource_balances
+        WHERE resource_id = $1::int
+    """,
+    "update_incident_status": """
+        UPDATE incidents SET status = 'resolved'
+        WHERE resource_id = $1::int AND status = 'open'
+    """,
+    "redistribute_resources": """
+        SELECT settlement_id, quantity FROM resource_balances
+        WHERE resource_id = $1::int AND settlement_id <> $2::int AND quantity > 100
+        LIMIT 1
+    """,
+    "update_incident_status_stmt": """
+        UPDATE incidents SET status = 'resolved'
+        WHERE status = 'open' AND resource_id IN (SELECT unnest($1::int[]))
+    """,
+    "redistribute_resources_stmt": """
+        SELECT r.resource_id, r.settlement_id, surplus.settlement_id
+        FROM unnest($1::int[], $2::int[]) AS r(resource_id, settlement_id)
+        CROSS JOIN LATERAL (
+            SELECT b.settlement_id FROM resource_balances b
+            WHERE b.resource_id = r.resource_id
+            AND b.settlement_id <> r.settlement_id
+            AND b.quantity > 100
+            ORDER BY b.quantity DESC
+            LIMIT 1
+        ) AS surplus
+    """,
+    "refresh_resource_rollups": """
+        SELECT resource_id, settlement_id, date_trunc('hour', date), SUM(quantity)
+        FROM resource_operations
+        WHERE id > $1::bigint AND id <= $2::bigint
+        GROUP BY 1, 2, 3
+    """,
+    "replenish_resource": "SELECT settlement_id FROM resources WHERE id = $1::int",
+}
+
+# Горячие запросы приложения и каскадные удаления внешних ключей
+APP_QUERIES = {
+    "sweeper": SWEEP_SQL,
+    "energy_grid.apply_statuses": UPDATE_STATUS_SQL,
+    "resource_history": """
+        SELECT date, quantity, operation_type FROM resource_operations
+        WHERE resource_id = $1::int ORDER BY date DESC LIMIT 50
+    """,
+    "sensor_history": """
+        SELECT recorded_at, energy_consumption FROM sensor_readings
+        WHERE sensor_id = $1::int AND recorded_at >= $2::timestamp
+        ORDER BY recorded_at
+    """,
+    "unread_notifications": """
+        SELECT id, type, message FROM notifications
+        WHERE status = 'unread' ORDER BY timestamp DESC LIMIT 50
+    """,
+    "daily_rollups": """
+        SELECT resource_id, settlement_id, bucket, consumed, replenished
+        FROM resource_operations_daily WHERE bucket >= $1::date
+    """,
+    "cascade:resources": "DELETE FROM resource_operations WHERE resource_id = $1::int",
+    "cascade:settlements": (
+        "DELETE FROM resource_operations WHERE settlement_id = $1::int"
+    ),
+    "cascade:infrastructure": (
+        "DELETE FROM sensors_devices WHERE infrastructure_id = $1::int"
+    ),
+    **{f"prepared:{name}": query.sql for name, query in HOT_QUERIES.items()},
+    # Поиск существующих строк справочника должен идти по индексу *_name_key
+    **{
+        f"upsert:{model.__tablename__}": upsert_sql(
+            model,
+            [c.name for c in model.__table__.columns if not c.primary_key],
+            natural_key(model),
+            update=False,
+        )
+        for model in (Settlement, Resource, Infrastructure)
+    },
+}
+
+console = Console()
+
+
+async def explain(conn: asyncpg.Connection, sql: str) -> dict:
+    """Обобщенный план запроса; сам запрос не выполняется."""
+    params = max(map(int, re.findall(r"\$(\d+)", sql)), default=0)
+    arguments = f"({', '.join(['NULL'] * params)})" if params else ""
+    async with conn.transaction():
+        await conn.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+        await conn.execute(f"PREPARE plan_check AS {sql}")
+        try:
+            plan = await conn.fetchval(
+                f"EXPLAIN (FORMAT JSON) EXECUTE plan_check{arguments}"
+            )
+        finally:
+            await conn.execute("DEALLOCATE plan_check")
+    return json.loads(plan)[0]["Plan"]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Таблицы, которые план читает последовательным сканированием."""
+    found = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def relations(plan: dict) -> set[str]:
+    """Все таблицы, которые читает план, любым способом доступа."""
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= relations(child)
+    return found
+
+
+async def table_sizes(conn: asyncpg.Connection) -> dict[str, float]:
+    rows = await conn.fetch(
+        "SELECT relname, reltuples FROM pg_class "
+        "WHERE relkind IN ('r', 'p') AND relnamespace = 'public'::regnamespace"
+    )
+    return {row["relname"]: row["reltuples"] for row in rows}
+
+
+async def check_plans(
+    conn: asyncpg.Connection, large_rows: int = PLANS_LARGE_TABLE_ROWS
+) -> list[str]:
+    """
+    Печатает планы всех запросов; возвращает имена запросов с регрессией. Запрос,
+    все таблицы которого меньше large_rows, не проверяется: на малой таблице Seq
+    Scan оправдан и не говорит о том, будет ли использован индекс.
+    """
+    sizes = await table_sizes(conn)
+    table = Table(title=f"Планы запросов (крупная таблица — от {large_rows:,} строк)")
+    for column in ("Запрос", "Верхний узел", "Стоимость", "Seq Scan", "Итог"):
+        table.add_column(column)
+
+    failed, unchecked = [], []
+    for name, sql in {**TRIGGER_QUERIES, **APP_QUERIES}.items():
+        plan = await explain(conn, sql)
+        scans = seq_scans(plan)
+        large = [scan for scan in scans if sizes.get(scan, 0) >= large_rows]
+        checked = any(sizes.get(rel, 0) >= large_rows for rel in relations(plan))
+        if large:
+            failed.append(name)
+        elif not checked:
+            unchecked.append(name)
+        table.add_row(
+            name,
+            plan["Node Type"],
+            f"{plan['Total Cost']:,.1f}",
+            ", ".join(f"{scan} ({sizes.get(scan, 0):,.0f})" for scan in scans) or "—",
+            "[red]✖[/]" if large else "[green]✔[/]" if checked else "[yellow]—[/]",
+        )
+    console.print(table)
+    if unchecked:
+        console.print(
+            f"[yellow]⚠ Не проверены (все таблицы меньше {large_rows:,} строк): "
+            f"{', '.join(unchecked)}[/]"
+        )
+    return failed
+
+
+async def main(preset: str | None = PLANS_PRESET):
+    if preset is not None:
+        await generate(preset)
+    await migrate()
+    async with raw_connection() as conn:
+        # reltuples и обобщенные планы опираются на свежую статистику
+        await conn.execute("ANALYZE")
+        failed = await check_plans(conn)
+    if failed:
+        raise RuntimeError(f"Seq Scan по крупной таблице: {', '.join(failed)}")
+    console.print("[green]✔ Запросы триггеров и горячие запросы идут по индексам[/]")
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import func, select
+
+from src.config import PREPARED_BENCH_CALLS
+from src.core.db import get_session, raw_connection, run
+from src.core.models import Notification, ResourceBalance, Settlement
+from src.core.prepared import registry
+
+console = Console()
+
+
+def orm_statements(resource_id, settlement_id, settlement_name):
+    """Те же запросы, что в реестре, в виде обычных select() через сессию."""
+    return {
+        "resource_level": select(
+            func.coalesce(func.sum(ResourceBalance.quantity), 0)
+        ).where(ResourceBalance.resource_id == resource_id),
+        "balance": select(ResourceBalance.quantity).where(
+            ResourceBalance.resource_id == resource_id,
+            ResourceBalance.settlement_id == settlement_id,
+        ),
+        "settlement_by_name": select(Settlement.id).where(
+            Settlement.name == settlement_name
+        ),
+        "notification_count": select(func.count()).where(
+            Notification.type == "warning",
+            Notification.message.like("%Критический уровень ресурса ID:%"),
+        ),
+    }
+
+
+async def timed(calls, call) -> np.ndarray:
+    timings = []
+    for _ in range(calls):
+        start_time = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - start_time)
+    return np.asarray(timings) * 1000
+
+
+async def main(calls: int = PREPARED_BENCH_CALLS):
+    async with get_session() as session:
+        balance = (
+            await session.execute(
+                select(ResourceBalance.resource_id, ResourceBalance.settlement_id)
+            )
+        ).first()
+        settlement_name = (await session.execute(select(Settlement.name))).scalar()
+    resource_id, settlement_id = balance or (1, 1)
+    arguments = {
+        "resource_level": (resource_id,),
+        "balance": (resource_id, settlement_id),
+        "settlement_by_name": (settlement_name or "Arctic Base",),
+        "notification_count": ("warning", "%Критический уровень ресурса ID:%"),
+    }
+    statements = orm_statements(resource_id, settlement_id, settlement_name)
+
+    table = Table(
+        title=f"Горячие запросы: select() через сессию и реестр ({calls} вызовов)"
+    )
+    for column in (
+        "Запрос",
+        "select(), мс p50",
+        "select(), мс p95",
+        "Реестр, мс p50",
+        "Реестр, мс p95",
+        "Ускорение",
+    ):
+        table.add_column(column)
+
+    for name, args in arguments.items():
+        async with get_session() as session:
+            statement = statements[name]
+            adhoc = await timed(calls, lambda: session.execute(statement))
+        async with raw_connection() as conn:
+            prepared = await timed(calls, lambda: registry.execute(conn, name, *args))
+        table.add_row(
+            name,
+            f"{np.percentile(adhoc, 50):.3f}",
+            f"{np.percentile(adhoc, 95):.3f}",
+            f"{np.percentile(prepared, 50):.3f}",
+            f"{np.percentile(prepared, 95):.3f}",
+            f"×{np.mean(adhoc) / np.mean(prepared):.1f}",
+        )
+    console.print(table)
+    console.print(f"Реестр: {registry.stats_dict()}")
+
+
+if __name__ == "__main__":
+    run(main())
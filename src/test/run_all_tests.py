@@ -1,7 +1,30 @@
+import argparse
 import asyncio
 import importlib
+import time
+
+from aiomultiprocess import Worker
 from rich.console import Console
 from rich.table import Table
+from sqlalchemy.engine import make_url
+
+from src.config import (
+    DATABASE_URL,
+    DB_CONFIG,
+    INSTRUMENTATION_ENABLED,
+    TESTS_MAX_PARALLEL,
+    TESTS_PARALLEL,
+)
+from src.core.cache import cache_stats
+from src.core.db import configure_engine, dispose_engine, pool_status, run
+from src.core.instrumentation import (
+    Instrumentation,
+    merge_reports,
+    print_report,
+    snapshot_stats,
+    write_report,
+)
+from src.erase import clear_tables_and_reset_sequences, clone_database, drop_database
 
 # Список модулей тестов (указываем полные пути относительно корня проекта)
 TEST_MODULES = [
@@ -9,40 +32,243 @@ TEST_MODULES = [
     "src.test.triggers_test",
     # "src.test.select_test",
     "src.test.stress_test",
+    "src.test.upsert_test",
+    # Без реплик (в том числе в копиях баз) проверка маршрутизации пропускается
+    "src.test.replica_test",
+    # Не обращаются к базе
+    "src.test.forecast_test",
+    "src.test.energy_grid_test",
+    "src.test.startup_test",
+    # plans_test требует синтетического набора (PLANS_PRESET), load_test, spatial_test,
+    # telemetry_test и prepared_test — бенчмарки без порога: запускаются через bench
 ]
 
+# Модули, которым нужна пустая база; остальные получают копию базы после insert_test
+UNSEEDED_MODULES = {"src.test.insert_test"}
+SEED_MODULE = "src.test.insert_test"
+
 console = Console()
 
 
-async def run_all_tests():
-    results = []  # для накопления результатов тестов
-    for mod_name in TEST_MODULES:
-        console.rule(f"[bold cyan]Запуск теста: {mod_name}[/bold cyan]")
-        try:
-            mod = importlib.import_module(mod_name)
-            # Предполагается, что в каждом модуле реализована функция main(), возвращающая awaitable
-            if hasattr(mod, "main"):
-                await mod.main()
-                console.print(f"[green]✔ Тест {mod_name} успешно выполнен[/green]")
-                results.append((mod_name, "Успешно"))
+def database_url(name: str) -> str:
+    return (
+        make_url(DATABASE_URL).set(database=name).render_as_string(hide_password=False)
+    )
+
+
+async def run_module(mod_name: str) -> str:
+    console.rule(f"[bold cyan]Запуск теста: {mod_name}[/bold cyan]")
+    try:
+        mod = importlib.import_module(mod_name)
+        # Предполагается, что в каждом модуле реализована функция main(), возвращающая awaitable
+        if hasattr(mod, "main"):
+            await mod.main()
+            console.print(f"[green]✔ Тест {mod_name} успешно выполнен[/green]")
+            return "Успешно"
+        console.print(
+            f"[yellow]⚠ В модуле {mod_name} не найдено определение 'main'[/yellow]"
+        )
+        return "Не найдено 'main'"
+    except Exception as e:
+        console.print(f"[red]✖ Тест {mod_name} завершился с ошибкой: {e}[/red]")
+        return f"Ошибка: {e}"
+
+
+async def run_instrumented(mod_name: str) -> dict:
+    """Прогон модуля на общем движке процесса со снимками метрик до и после."""
+    if INSTRUMENTATION_ENABLED:
+        instrumentation = Instrumentation()
+        instrumentation.install()
+        stats_before = await snapshot_stats()
+    start_time = time.perf_counter()
+    status = await run_module(mod_name)
+    result = {
+        "module": mod_name,
+        "status": status,
+        "seconds": time.perf_counter() - start_time,
+        "pool": pool_status(),
+        "cache": cache_stats(),
+        "report": None,
+    }
+    if INSTRUMENTATION_ENABLED:
+        instrumentation.uninstall()
+        stats_after = await snapshot_stats()
+        await instrumentation.explain_slow_queries()
+        result["report"] = instrumentation.report(stats_before, stats_after)
+    return result
+
+
+async def run_isolated(mod_name: str, database: str) -> dict:
+    """Точка входа дочернего процесса: свой движок, подключенный к копии шаблона."""
+    configure_engine(url=database_url(database))
+    try:
+        return await run_instrumented(mod_name)
+    finally:
+        await dispose_engine()
+
+
+async def prepare_template(database: str, seed: bool) -> None:
+    """Дочерний процесс: очищает копию рабочей базы и при seed заполняет ее insert_test."""
+    configure_engine(url=database_url(database))
+    try:
+        await clear_tables_and_reset_sequences()
+        if seed:
+            await importlib.import_module(SEED_MODULE).main()
+    finally:
+        await dispose_engine()
+
+
+async def in_process(target, *args):
+    # Worker возвращает исключение дочернего процесса как результат
+    worker = Worker(target=target, args=args)
+    worker.start()
+    result = await worker.join()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+async def run_parallel(max_parallel: int = TESTS_MAX_PARALLEL) -> list[dict]:
+    """
+    Каждый модуль выполняется в своем процессе на своей базе, клонированной
+    CREATE DATABASE ... TEMPLATE из пустого или заполненного шаблона, поэтому модули
+    не видят данных друг друга, а общее время близко к времени самого долгого.
+    Рабочая база копируется без обрыва чужих сеансов: при подключенных клиентах
+    (settlement serve, слушатели LISTEN) прогон отказывает до запуска тестов.
+    """
+    database = DB_CONFIG["database"]
+    empty, seeded = f"{database}_test_empty", f"{database}_test_seeded"
+    # Шаблон нельзя копировать, пока к нему подключена другая копия: клоны по очереди
+    clone_lock = asyncio.Lock()
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def isolated(i: int, mod_name: str) -> dict:
+        template = empty if mod_name in UNSEEDED_MODULES else seeded
+        target = f"{database}_test_{i}"
+        async with semaphore:
+            async with clone_lock:
+                await clone_database(template, target, terminate=True)
+            try:
+                return await in_process(run_isolated, mod_name, target)
+            except Exception as e:
+                console.print(f"[red]✖ Процесс теста {mod_name} упал: {e}[/red]")
+                return {
+                    "module": mod_name,
+                    "status": f"Ошибка: {e}",
+                    "seconds": 0.0,
+                    "pool": {},
+                    "cache": {},
+                    "report": None,
+                }
+            finally:
+                await drop_database(target)
+
+    console.rule("[bold cyan]Подготовка шаблонов баз[/bold cyan]")
+    try:
+        await clone_database(database, empty)
+        await in_process(prepare_template, empty, False)
+        await clone_database(empty, seeded, terminate=True)
+        await in_process(prepare_template, seeded, True)
+        return await asyncio.gather(
+            *(isolated(i, mod_name) for i, mod_name in enumerate(TEST_MODULES))
+        )
+    finally:
+        await drop_database(seeded)
+        await drop_database(empty)
+
+
+async def run_sequential() -> list[dict]:
+    """Прежний режим: модули по очереди на рабочей базе и общем движке."""
+    results = [await run_instrumented(mod_name) for mod_name in TEST_MODULES]
+    # Пул и кэш общие для всех модулей и копят метрики: в сводку идет итог последнего
+    for result in results[:-1]:
+        result["pool"] = result["cache"] = {}
+    return results
+
+
+def merge_pool(stats: list[dict]) -> dict:
+    merged = {}
+    for values in stats:
+        for name, value in values.items():
+            if "max" in name:
+                merged[name] = max(merged.get(name, value), value)
             else:
-                console.print(
-                    f"[yellow]⚠ В модуле {mod_name} не найдено определение 'main'[/yellow]"
-                )
-                results.append((mod_name, "Не найдено 'main'"))
-        except Exception as e:
-            console.print(f"[red]✖ Тест {mod_name} завершился с ошибкой: {e}[/red]")
-            results.append((mod_name, f"Ошибка: {e}"))
+                merged[name] = merged.get(name, 0) + value
+    if merged:
+        checkouts = merged.get("checkouts", 0)
+        merged["wait_avg"] = merged["wait_total"] / checkouts if checkouts else 0.0
+    return merged
+
+
+def merge_cache(stats: list[dict]) -> dict:
+    merged = {}
+    for values in stats:
+        for table_name, metrics in values.items():
+            target = merged.setdefault(table_name, dict.fromkeys(metrics, 0))
+            for metric, value in metrics.items():
+                target[metric] += value
+    return merged
+
+
+async def run_all_tests(parallel: bool = TESTS_PARALLEL):
+    start_time = time.perf_counter()
+    if parallel:
+        results = await run_parallel()
+    else:
+        results = await run_sequential()
+    wall_time = time.perf_counter() - start_time
 
     # Вывод сводной таблицы результатов
     table = Table(title="Результаты тестирования")
     table.add_column("Модуль", style="cyan", no_wrap=True)
     table.add_column("Статус", style="magenta")
-    for mod, status in results:
-        table.add_row(mod, status)
-
+    table.add_column("Время, с", justify="right")
+    for result in results:
+        table.add_row(result["module"], result["status"], f"{result['seconds']:.2f}")
     console.print(table)
+    console.print(
+        f"Общее время: {wall_time:.2f} с, сумма по модулям: "
+        f"{sum(result['seconds'] for result in results):.2f} с"
+    )
+
+    # Метрики пулов соединений за весь прогон (суммарно по процессам)
+    pool_table = Table(title="Пул соединений")
+    pool_table.add_column("Метрика", style="cyan", no_wrap=True)
+    pool_table.add_column("Значение", style="magenta")
+    for name, value in merge_pool([result["pool"] for result in results]).items():
+        pool_table.add_row(
+            name, f"{value:.4f}" if isinstance(value, float) else str(value)
+        )
+    console.print(pool_table)
+
+    # Попадания и промахи кэша справочников по таблицам
+    stats = merge_cache([result["cache"] for result in results])
+    if stats:
+        cache_table = Table(title="Кэш справочников")
+        cache_table.add_column("Таблица", style="cyan", no_wrap=True)
+        metrics = next(iter(stats.values())).keys()
+        for metric in metrics:
+            cache_table.add_column(metric, style="magenta")
+        for table_name, values in stats.items():
+            cache_table.add_row(
+                table_name, *(str(values[metric]) for metric in metrics)
+            )
+        console.print(cache_table)
+
+    # Куда ушло время: задержки запросов, функции и триггеры, медленные запросы
+    reports = [result["report"] for result in results if result["report"]]
+    if reports:
+        report = merge_reports(reports)
+        print_report(report)
+        write_report(report)
 
 
 if __name__ == "__main__":
-    asyncio.run(run_all_tests())
+    parser = argparse.ArgumentParser(description="Прогон всех тестовых модулей")
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="по очереди на рабочей базе, без копий и процессов",
+    )
+    args = parser.parse_args()
+    run(run_all_tests(parallel=TESTS_PARALLEL and not args.sequential))
@@ -1,11 +1,9 @@
-import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
 from rich.console import Console
 from rich.table import Table
 
-from src.config import DATABASE_URL
+from src.config import EXPORT_CHUNK_SIZE
+from src.core.db import run
+from src.core.export import stream_chunks
 from src.core.models import (
     EnergySystem,
     Event,
@@ -25,55 +23,49 @@ from src.core.models import (
     TransportVehicle,
 )
 
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(
-    bind=engine, class_=AsyncSession, expire_on_commit=False
-)
 
+# Сколько строк каждой таблицы выводить на экран; остальные только подсчитываются
+PREVIEW_ROWS = 50
 
-async def main():
-    async with AsyncSessionLocal() as session:
-        console = Console()
-        models = [
-            EnergySystem,
-            Event,
-            GeoZone,
-            Incident,
-            Infrastructure,
-            LogisticRoute,
-            Notification,
-            Personnel,
-            ResourceOperation,
-            ResourcePlan,
-            Resource,
-            Route,
-            SensorDevice,
-            Settlement,
-            Task,
-            TransportVehicle,
-        ]
 
-        for model in models:
-            result = await session.execute(select(model))
-            rows = result.scalars().all()  # Use scalars() to get ORM objects
+async def main():
+    console = Console()
+    models = [
+        EnergySystem,
+        Event,
+        GeoZone,
+        Incident,
+        Infrastructure,
+        LogisticRoute,
+        Notification,
+        Personnel,
+        ResourceOperation,
+        ResourcePlan,
+        Resource,
+        Route,
+        SensorDevice,
+        Settlement,
+        Task,
+        TransportVehicle,
+    ]
 
-            table = Table(title=f"Data from {model.__tablename__}")
+    for model in models:
+        table = Table(title=f"Data from {model.__tablename__}")
 
-            # Add columns based on the model's attributes
-            for column in model.__table__.columns:
-                table.add_column(column.name)
+        # Add columns based on the model's attributes
+        for column in model.__table__.columns:
+            table.add_column(column.name)
 
-            # Add rows to the table
-            for row in rows:
-                table.add_row(
-                    *[
-                        str(getattr(row, column.name))
-                        for column in model.__table__.columns
-                    ]
-                )
+        # Строки читаются порциями серверным курсором, а не загружаются целиком
+        total = 0
+        async for chunk in stream_chunks(model, chunk_size=EXPORT_CHUNK_SIZE):
+            for row in chunk[: max(PREVIEW_ROWS - total, 0)]:
+                table.add_row(*[str(value) for value in row])
+            total += len(chunk)
 
-            console.print(table)
+        table.caption = f"Показано {min(total, PREVIEW_ROWS)} из {total} строк"
+        console.print(table)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
@@ -0,0 +1,127 @@
+import random
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import select, text
+
+from src.config import SPATIAL_BENCH_QUERIES, SPATIAL_BENCH_SIZE
+from src.core.db import get_session, run
+from src.core.models import GeoZone, LogisticRoute, Route
+from src.core.spatial import (
+    nearest_available_vehicles,
+    routes_intersecting_zone,
+    vehicles_in_zone,
+)
+
+console = Console()
+
+# Случайные геометрии по всему земному шару (без полярных областей)
+SEED_SQL = [
+    "SELECT setseed(0.42)",
+    """
+    INSERT INTO transport_vehicles (name, type, status, current_location, fuel_reserve)
+    SELECT 'bench vehicle ' || g, 'Truck',
+           (ARRAY['available', 'in_use', 'maintenance'])[1 + g % 3],
+           ST_SetSRID(ST_MakePoint(random() * 360 - 180, random() * 160 - 80), 4326),
+           100
+    FROM generate_series(1, :size) AS g
+    """,
+    """
+    INSERT INTO geozones (name, type, coordinates, description, usage_type)
+    SELECT 'bench zone ' || g, 'Benchmark',
+           ST_MakeEnvelope(x, y, x + 2, y + 2, 4326), 'Benchmark zone', 'Restricted'
+    FROM (
+        SELECT g, random() * 356 - 178 AS x, random() * 156 - 78 AS y
+        FROM generate_series(1, :size) AS g
+    ) AS zones
+    """,
+    """
+    INSERT INTO routes (name, description, waypoints, status)
+    SELECT 'bench route ' || g, 'Benchmark route',
+           ST_SetSRID(ST_MakeLine(ST_MakePoint(x, y), ST_MakePoint(x + random() * 4 - 2, y + random() * 4 - 2)), 4326),
+           'active'
+    FROM (
+        SELECT g, random() * 356 - 178 AS x, random() * 156 - 78 AS y
+        FROM generate_series(1, :size) AS g
+    ) AS lines
+    """,
+    """
+    INSERT INTO logistic_routes (name, description, waypoints, status)
+    SELECT 'bench route ' || g, 'Benchmark route',
+           ST_SetSRID(ST_MakeLine(ST_MakePoint(x, y), ST_MakePoint(x + random() * 4 - 2, y + random() * 4 - 2)), 4326),
+           'active'
+    FROM (
+        SELECT g, random() * 356 - 178 AS x, random() * 156 - 78 AS y
+        FROM generate_series(1, :size) AS g
+    ) AS lines
+    """,
+    "ANALYZE transport_vehicles, geozones, routes, logistic_routes",
+]
+
+
+async def measure(name, queries, call) -> tuple:
+    timings = []
+    found = 0
+    for args in queries:
+        start_time = time.perf_counter()
+        found += len(await call(*args))
+        timings.append(time.perf_counter() - start_time)
+    timings = np.asarray(timings) * 1000
+    return (
+        name,
+        len(queries),
+        found / len(queries),
+        np.mean(timings),
+        np.percentile(timings, 95),
+    )
+
+
+async def main(size: int = SPATIAL_BENCH_SIZE, queries: int = SPATIAL_BENCH_QUERIES):
+    rng = random.Random(42)
+    async with get_session() as session:
+        # Все данные бенчмарка живут в одной транзакции и откатываются в конце
+        console.print(f"[bold cyan]Генерация {size} геометрий каждого типа...[/]")
+        for statement in SEED_SQL:
+            await session.execute(text(statement.replace(":size", str(size))))
+
+        zone_ids = (
+            (await session.execute(select(GeoZone.id).order_by(GeoZone.id)))
+            .scalars()
+            .all()
+        )
+        zones = [(session, rng.choice(zone_ids)) for _ in range(queries)]
+        points = [
+            (session, rng.uniform(-180, 180), rng.uniform(-80, 80), 5)
+            for _ in range(queries)
+        ]
+
+        results = [
+            await measure("vehicles_in_zone", zones, vehicles_in_zone),
+            await measure(
+                "nearest_available_vehicles", points, nearest_available_vehicles
+            ),
+            await measure(
+                "routes_intersecting_zone",
+                [args + (Route,) for args in zones],
+                routes_intersecting_zone,
+            ),
+            await measure(
+                "logistic_routes_intersecting_zone",
+                [args + (LogisticRoute,) for args in zones],
+                routes_intersecting_zone,
+            ),
+        ]
+        await session.rollback()
+
+    table = Table(title=f"Пространственные запросы ({size} геометрий каждого типа)")
+    for column in ("Запрос", "Вызовов", "Строк в ответе", "Среднее, мс", "p95, мс"):
+        table.add_column(column)
+    for name, calls, rows, mean, p95 in results:
+        table.add_row(name, str(calls), f"{rows:.1f}", f"{mean:.2f}", f"{p95:.2f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,101 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from src.config import (
+    STARTUP_FORBIDDEN_MODULES,
+    STARTUP_IMPORT_BUDGET_MS,
+    STARTUP_RUNS,
+)
+from src.core.db import run
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Команды, которые не должны касаться базы и тяжелых библиотек
+CHEAP_COMMANDS = [
+    ["--help"],
+    *(
+        [command, "--help"]
+        for command in ("seed", "reset", "migrate", "bench", "export", "sweep", "serve")
+    ),
+]
+
+console = Console()
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Строки -X importtime: модуль -> (собственное, накопленное время, мкс)."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+async def measure(args: list[str]) -> tuple[float, float, dict]:
+    """Время процесса и время импортов (мс) одного запуска python -m src.cli."""
+    start_time = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-X",
+        "importtime",
+        "-m",
+        "src.cli",
+        *args,
+        cwd=ROOT,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    wall_ms = (time.perf_counter() - start_time) * 1000
+    modules = parse_importtime(stderr.decode())
+    import_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+    return wall_ms, import_ms, modules
+
+
+async def main(runs: int = STARTUP_RUNS, budget_ms: float = STARTUP_IMPORT_BUDGET_MS):
+    table = Table(
+        title=f"Запуск CLI (лучший из {runs}, бюджет импортов {budget_ms} мс)"
+    )
+    for column in ("Команда", "Процесс, мс", "Импорты, мс", "Самый долгий импорт"):
+        table.add_column(column)
+
+    failures = []
+    for args in CHEAP_COMMANDS:
+        # Процессы запускаются по очереди, чтобы не мешать друг другу
+        samples = [await measure(args) for _ in range(runs)]
+        wall_ms = min(sample[0] for sample in samples)
+        import_ms, modules = min(
+            ((sample[1], sample[2]) for sample in samples), key=lambda item: item[0]
+        )
+        cumulative = {name: total for name, (_, total) in modules.items()}
+        slowest = max(cumulative, key=cumulative.get) if cumulative else "—"
+        command = " ".join(args)
+        table.add_row(
+            command,
+            f"{wall_ms:.1f}",
+            f"{import_ms:.1f}",
+            f"{slowest} ({cumulative.get(slowest, 0) / 1000:.1f} мс)",
+        )
+
+        loaded = {name.split(".")[0] for name in modules}
+        forbidden = sorted(loaded.intersection(STARTUP_FORBIDDEN_MODULES))
+        if forbidden:
+            failures.append(f"{command}: загружены {', '.join(forbidden)}")
+        if import_ms > budget_ms:
+            failures.append(f"{command}: импорты {import_ms:.1f} мс > {budget_ms} мс")
+    console.print(table)
+
+    if failures:
+        raise RuntimeError(f"Бюджет запуска превышен: {'; '.join(failures)}")
+    console.print("[green]✔ Дешевые команды укладываются в бюджет запуска[/green]")
+
+
+if __name__ == "__main__":
+    run(main())
@@ -1,55 +1,243 @@
-import asyncio
+import argparse
+import json
 import random
 import time
 from datetime import datetime
+from pathlib import Path
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import insert, text
 
-from src.config import DATABASE_URL
+from src.config import (
+    BENCH_BASELINE_PATH,
+    BENCH_REGRESSION_TOLERANCE,
+    BENCH_RESULTS_PATH,
+    RESOURCE_TRIGGER_MODE,
+)
+from src.core.bulk import OPERATION_COLUMNS, copy_resource_operations
+from src.core.db import get_engine, get_session, raw_connection, run
 from src.core.models import ResourceOperation
+from src.core.triggers import set_resource_trigger_mode
 from src.erase import clear_tables_and_reset_sequences
 from src.test.insert_test import add_settlement, add_resources
 
-# Создание асинхронного движка
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# Матрица нагрузочного тестирования
+ROW_COUNTS = (1_000, 10_000)
+BATCH_SIZES = (500, 5_000)
+# "row"/"statement" — режим триггеров resource_operations, "off" — без триггеров
+TRIGGER_SETTINGS = ("row", "statement", "off")
+
+operations_table = ResourceOperation.__table__
+console = Console()
+
+
+def generate_operations(settlement_id: int, count: int = 10000, seed: int = 42):
+    rng = random.Random(seed)
+    operations = []
+    for _ in range(count):
+        operation_type = rng.choice(["consumption", "replenishment"])
+        quantity = (
+            rng.randint(1, 500)
+            if operation_type == "replenishment"
+            else rng.randint(-500, -1)
+        )
+        operations.append(
+            {
+                "resource_id": 1,
+                "settlement_id": settlement_id,
+                "date": datetime.now(),
+                "quantity": quantity,
+                "operation_type": operation_type,
+            }
+        )
+    return operations
+
+
+def batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start : start + batch_size]
+
+
+async def _disable_triggers(conn):
+    await conn.execute(text("SET LOCAL session_replication_role = replica"))
+
+
+async def insert_orm_add_all(rows, batch_size, triggers):
+    for batch in batches(rows, batch_size):
+        async with get_session() as session, session.begin():
+            if not triggers:
+                await _disable_triggers(session)
+            session.add_all(ResourceOperation(**row) for row in batch)
+
+
+async def insert_core_executemany(rows, batch_size, triggers):
+    # Без RETURNING SQLAlchemy передает пакет в executemany драйвера
+    for batch in batches(rows, batch_size):
+        async with get_engine().begin() as conn:
+            if not triggers:
+                await _disable_triggers(conn)
+            await conn.execute(insert(operations_table), batch)
+
+
+async def insert_core_values(rows, batch_size, triggers):
+    # Один многострочный INSERT ... VALUES на пакет
+    for batch in batches(rows, batch_size):
+        async with get_engine().begin() as conn:
+            if not triggers:
+                await _disable_triggers(conn)
+            await conn.execute(insert(operations_table).values(batch))
+
+
+async def insert_insertmanyvalues(rows, batch_size, triggers):
+    # С RETURNING SQLAlchemy сам режет пакет на многострочные INSERT (insertmanyvalues)
+    statement = insert(operations_table).returning(operations_table.c.id)
+    for batch in batches(rows, batch_size):
+        async with get_engine().begin() as conn:
+            if not triggers:
+                await _disable_triggers(conn)
+            conn = await conn.execution_options(insertmanyvalues_page_size=batch_size)
+            await conn.execute(statement, batch)
+
+
+async def insert_asyncpg_executemany(rows, batch_size, triggers):
+    columns = ", ".join(OPERATION_COLUMNS)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(OPERATION_COLUMNS) + 1))
+    sql = f"INSERT INTO resource_operations ({columns}) VALUES ({placeholders})"
+    async with raw_connection() as conn:
+        for batch in batches(rows, batch_size):
+            async with conn.transaction():
+                if not triggers:
+                    await conn.execute("SET LOCAL session_replication_role = replica")
+                await conn.executemany(
+                    sql, [tuple(row[c] for c in OPERATION_COLUMNS) for row in batch]
+                )
+
+
+async def insert_copy(rows, batch_size, triggers):
+    await copy_resource_operations(rows, chunk_size=batch_size, triggers=triggers)
+
+
+STRATEGIES = {
+    "orm_add_all": insert_orm_add_all,
+    "core_executemany": insert_core_executemany,
+    "core_values": insert_core_values,
+    "insertmanyvalues": insert_insertmanyvalues,
+    "asyncpg_executemany": insert_asyncpg_executemany,
+    "copy": insert_copy,
+}
+
+
+async def reset_operations():
+    async with raw_connection() as conn:
+        await conn.execute(
+            "TRUNCATE resource_operations, resource_balances, resource_operations_hourly, "
+            "resource_operations_daily, rollup_watermarks, notifications RESTART IDENTITY"
+        )
+
+
+async def run_case(strategy, rows, batch_size, trigger_setting) -> dict:
+    await reset_operations()
+    async with get_session() as session:
+        if trigger_setting != "off":
+            await set_resource_trigger_mode(session, trigger_setting)
+
+    start_time = time.perf_counter()
+    await STRATEGIES[strategy](rows, batch_size, trigger_setting != "off")
+    elapsed_time = time.perf_counter() - start_time
+    return {
+        "case": f"{strategy}/{len(rows)}/{batch_size}/{trigger_setting}",
+        "strategy": strategy,
+        "rows": len(rows),
+        "batch_size": batch_size,
+        "triggers": trigger_setting,
+        "seconds": elapsed_time,
+        "rows_per_sec": len(rows) / elapsed_time,
+    }
+
+
+def find_regressions(results, baseline, tolerance=BENCH_REGRESSION_TOLERANCE):
+    expected = {item["case"]: item["rows_per_sec"] for item in baseline}
+    regressions = []
+    for result in results:
+        reference = expected.get(result["case"])
+        if reference and result["rows_per_sec"] < reference * (1 - tolerance):
+            regressions.append((result["case"], reference, result["rows_per_sec"]))
+    return regressions
+
+
+def print_results(results):
+    table = Table(title="Нагрузочное тестирование вставки")
+    for column in ("Стратегия", "Строк", "Пакет", "Триггеры", "Секунд", "Строк/с"):
+        table.add_column(column)
+    for result in results:
+        table.add_row(
+            result["strategy"],
+            str(result["rows"]),
+            str(result["batch_size"]),
+            result["triggers"],
+            f"{result['seconds']:.3f}",
+            f"{result['rows_per_sec']:.0f}",
+        )
+    console.print(table)
 
 
 # Нагрузочное тестирование
-async def main():
+async def main(update_baseline: bool = False):
     await clear_tables_and_reset_sequences()
-    async with AsyncSessionLocal() as session:
+    async with get_session() as session:
         settlement = await add_settlement(session)
         await add_resources(session, settlement)
 
-        # Массовая вставка данных (10000 записей)
-        operations = []
-        for _ in range(10000):
-            operation_type = random.choice(["consumption", "replenishment"])
-            quantity = (
-                random.randint(1, 500)
-                if operation_type == "replenishment"
-                else random.randint(-500, -1)
-            )
-            operations.append(
-                ResourceOperation(
-                    resource_id=1,
-                    settlement_id=settlement.id,
-                    date=datetime.now(),
-                    quantity=quantity,
-                    operation_type=operation_type,
-                )
-            )
-        start_time = time.time()
-        session.add_all(operations)
-        await session.commit()
-        elapsed_time = time.time() - start_time
-        print(
-            f"🚀 Нагрузочное тестирование завершено: 10 000 записей вставлено за {elapsed_time:.2f} секунд."
+    results = []
+    try:
+        for row_count in ROW_COUNTS:
+            rows = generate_operations(settlement.id, row_count)
+            for batch_size in BATCH_SIZES:
+                if batch_size > row_count:
+                    continue
+                for trigger_setting in TRIGGER_SETTINGS:
+                    for strategy in STRATEGIES:
+                        results.append(
+                            await run_case(strategy, rows, batch_size, trigger_setting)
+                        )
+    finally:
+        async with get_session() as session:
+            await set_resource_trigger_mode(session, RESOURCE_TRIGGER_MODE)
+        await clear_tables_and_reset_sequences()
+
+    print_results(results)
+    Path(BENCH_RESULTS_PATH).write_text(json.dumps(results, indent=2))
+    console.print(f"[green]✔ Результаты сохранены в {BENCH_RESULTS_PATH}[/green]")
+
+    baseline_path = Path(BENCH_BASELINE_PATH)
+    if update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        console.print(f"[green]✔ Базовая линия обновлена: {baseline_path}[/green]")
+        return results
+    if not baseline_path.exists():
+        # Без базовой линии проверка регрессии не может упасть: это ошибка, а не пропуск
+        raise RuntimeError(
+            f"Базовая линия {baseline_path} не найдена: "
+            f"запишите ее запуском с --update-baseline"
         )
-    await clear_tables_and_reset_sequences()
+
+    regressions = find_regressions(results, json.loads(baseline_path.read_text()))
+    if regressions:
+        details = "; ".join(
+            f"{case}: {reference:.0f} → {actual:.0f} строк/с"
+            for case, reference, actual in regressions
+        )
+        raise RuntimeError(f"Падение пропускной способности: {details}")
+    return results
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование вставки")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="сохранить результаты как базовую линию для сравнения",
+    )
+    args = parser.parse_args()
+    run(main(update_baseline=args.update_baseline))
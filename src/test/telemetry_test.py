@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import random
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from src.config import (
+    TELEMETRY_BENCH_DEVICES,
+    TELEMETRY_BENCH_DURATION,
+    TELEMETRY_BENCH_PERIOD,
+)
+from src.core.db import raw_connection, run
+from src.core.telemetry import TelemetryPipeline
+
+# Шаг генератора: показания за TICK секунд отправляются одной порцией
+TICK = 0.1
+
+console = Console()
+
+
+async def create_devices(count: int) -> list[int]:
+    async with raw_connection() as conn:
+        rows = await conn.fetch(
+            """
+            INSERT INTO sensors_devices (name, type, status, energy_consumption)
+            SELECT 'Telemetry bench ' || g, 'IoT', 'active', 0
+            FROM generate_series(1, $1) AS g
+            RETURNING id
+            """,
+            count,
+        )
+    return [row["id"] for row in rows]
+
+
+async def drop_devices(sensor_ids: list[int]):
+    async with raw_connection() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "DELETE FROM sensor_readings WHERE sensor_id = ANY($1::int[])",
+                sensor_ids,
+            )
+            await conn.execute(
+                "DELETE FROM sensors_devices WHERE id = ANY($1::int[])", sensor_ids
+            )
+
+
+async def produce(pipeline, sensor_ids, period, duration):
+    """Каждое устройство отчитывается раз в period секунд, равномерно по времени."""
+    rng = random.Random(42)
+    loop = asyncio.get_running_loop()
+    per_tick = len(sensor_ids) * TICK / period
+    position, credit = 0, 0.0
+    next_tick = loop.time()
+    deadline = next_tick + duration
+    while next_tick < deadline:
+        credit += per_tick
+        while credit >= 1:
+            # Около 2% показаний превышают ENERGY_LIMIT
+            await pipeline.submit(
+                sensor_ids[position % len(sensor_ids)], rng.randint(0, 510)
+            )
+            position += 1
+            credit -= 1
+        next_tick += TICK
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def main(
+    devices: int = TELEMETRY_BENCH_DEVICES,
+    period: float = TELEMETRY_BENCH_PERIOD,
+    duration: float = TELEMETRY_BENCH_DURATION,
+):
+    sensor_ids = await create_devices(devices)
+    console.print(
+        f"[bold cyan]Телеметрия: {devices} устройств, отчет раз в {period} с "
+        f"({devices / period:.0f} показаний/с), {duration} с[/]"
+    )
+    try:
+        start_time = time.perf_counter()
+        async with TelemetryPipeline() as pipeline:
+            await produce(pipeline, sensor_ids, period, duration)
+        elapsed_time = time.perf_counter() - start_time
+    finally:
+        await drop_devices(sensor_ids)
+
+    stats = pipeline.stats
+    table = Table(title="Конвейер телеметрии")
+    table.add_column("Метрика", style="cyan")
+    table.add_column("Значение", style="magenta")
+    for name, value in (
+        ("Принято показаний", stats.received),
+        ("Записано", stats.written),
+        ("Ошибок записи", stats.failed),
+        ("Пакетов", stats.batches),
+        ("Средний пакет", f"{stats.written / max(stats.batches, 1):.0f}"),
+        ("Максимум очереди", stats.queue_max),
+        ("Уведомлений о превышении", stats.alerts),
+        ("Показаний/с (сквозная)", f"{stats.written / elapsed_time:.0f}"),
+        ("Строк/с при записи", f"{stats.rows_per_sec:.0f}"),
+    ):
+        table.add_row(name, str(value))
+    console.print(table)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера телеметрии")
+    parser.add_argument("--devices", type=int, default=TELEMETRY_BENCH_DEVICES)
+    parser.add_argument("--period", type=float, default=TELEMETRY_BENCH_PERIOD)
+    parser.add_argument("--duration", type=float, default=TELEMETRY_BENCH_DURATION)
+    args = parser.parse_args()
+    run(main(args.devices, args.period, args.duration))
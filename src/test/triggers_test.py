@@ -1,38 +1,33 @@
 import asyncio
 from datetime import datetime, timedelta
+import asyncpg
 from rich.console import Console
-from sqlalchemy import select, update, func
+from sqlalchemy import select, text, func
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-
-from src.config import DATABASE_URL
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.alerts import AlertConsumer
+from src.core.cache import cache_invalidation, settlement_by_name
+from src.core.db import run
+from src.core.sweeper import sweep_overdue_tasks
+from src.core.upsert import session_connection, upsert_infrastructure
+from src.core.routing import routed_session
 from src.core.models import (
-    Infrastructure,
     Notification,
     ResourceOperation,
     Resource,
     SensorDevice,
     Task,
-    Settlement,
 )
 
-# Setup Async SQLAlchemy engine and session
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
 console = Console()
 
 
 async def get_settlement(session: AsyncSession, settlement_name: str) -> int:
-    """Get an existing settlement ID."""
+    """Get an existing settlement ID (через кэш справочников)."""
     try:
-        # Try to find an existing settlement
-        result = await session.execute(
-            select(Settlement.id).where(Settlement.name == settlement_name)
-        )
-        settlement_id = result.scalar()
-        return settlement_id
+        settlement = await settlement_by_name(session, settlement_name)
+        return settlement.id if settlement else None
     except SQLAlchemyError as e:
         console.print(f"[bold red]Error getting settlement:[/bold red] {str(e)}")
         await session.rollback()  # Rollback the transaction
@@ -40,44 +35,47 @@ async def get_settlement(session: AsyncSession, settlement_name: str) -> int:
 
 
 async def ensure_infrastructure_exists(
-    session: AsyncSession, infrastructure_id: int, settlement_id: int
-):
+    session: AsyncSession, settlement_id: int
+) -> int:
+    """Id объекта инфраструктуры поселения: находит или создает одним запросом."""
     try:
-        infrastructure_exists = await session.execute(
-            select(Infrastructure.id).filter(Infrastructure.id == infrastructure_id)
+        ids = await upsert_infrastructure(
+            [
+                {
+                    "name": "Solar Power Plant",
+                    "type": "Energy",
+                    "settlement_id": settlement_id,
+                }
+            ],
+            conn=await session_connection(session),
         )
-        if not infrastructure_exists.scalar():
-            # Create new infrastructure record if it doesn't exist
-            new_infrastructure = Infrastructure(
-                id=infrastructure_id,
-                name=f"Infrastructure {infrastructure_id}",
-                type="Default Type",  # Example type
-                settlement_id=settlement_id,
-            )
-            session.add(new_infrastructure)
-            await session.commit()
-    except SQLAlchemyError as e:
+        await session.commit()
+        return ids[(settlement_id, "Solar Power Plant")]
+    except (SQLAlchemyError, asyncpg.PostgresError) as e:
         console.print(
             f"[bold red]Error ensuring infrastructure exists:[/bold red] {str(e)}"
         )
         await session.rollback()  # Rollback the transaction
+        raise
 
 
 async def test_energy_consumption_trigger():
     try:
-        async with AsyncSessionLocal() as session:
+        async with routed_session() as session:
             # Get or create a settlement
             settlement_name = "Arctic Base"
             settlement_id = await get_settlement(session, settlement_name)
 
             # Ensure infrastructure exists
-            await ensure_infrastructure_exists(session, 1, settlement_id)
+            infrastructure_id = await ensure_infrastructure_exists(
+                session, settlement_id
+            )
 
             # Insert a new sensor device
             sensor = SensorDevice(
                 name="Test Sensor",
                 type="IoT",
-                infrastructure_id=1,
+                infrastructure_id=infrastructure_id,
                 status="active",
                 last_update=datetime.now(),
                 energy_consumption=501,
@@ -86,6 +84,7 @@ async def test_energy_consumption_trigger():
             await session.commit()
 
             # Verify if notification was created
+            # (сессия уже писала, поэтому подсчет идет на основной сервер, а не на реплику)
             notification_count = await session.execute(
                 select(func.count()).where(
                     Notification.type == "critical",
@@ -103,9 +102,9 @@ async def test_energy_consumption_trigger():
         await session.rollback()  # Rollback the transaction
 
 
-async def test_overdue_task_trigger():
+async def test_overdue_task_sweeper():
     try:
-        async with AsyncSessionLocal() as session:
+        async with routed_session() as session:
             # Insert a new task with a past deadline
             task = Task(
                 name="Test Overdue Task",
@@ -117,11 +116,11 @@ async def test_overdue_task_trigger():
             session.add(task)
             await session.commit()
 
-            # Simulate task status update to 'overdue'
-            await session.execute(
-                update(Task).where(Task.id == task.id).values(status="overdue")
-            )
-            await session.commit()
+            # Триггера на tasks больше нет: просрочку находит планировщик
+            escalated = await sweep_overdue_tasks()
+            status = (
+                await session.execute(select(Task.status).where(Task.id == task.id))
+            ).scalar()
 
             # Verify the expected outcome, e.g., notification for overdue task
             notification_count = await session.execute(
@@ -132,15 +131,16 @@ async def test_overdue_task_trigger():
             )
             count = notification_count.scalar()
             console.print(
-                f"[bold yellow]⚠️ Overdue Task Trigger:[/bold yellow] Notifications for overdue tasks: {count}"
+                f"[bold yellow]⚠️ Overdue Task Sweeper:[/bold yellow] Escalated {len(escalated)} task(s), "
+                f"test task status: {status}, notifications for overdue tasks: {count}"
             )
     except SQLAlchemyError as e:
-        console.print(f"[bold red]Error in overdue task trigger:[/bold red] {str(e)}")
+        console.print(f"[bold red]Error in overdue task sweeper:[/bold red] {str(e)}")
         await session.rollback()  # Rollback the transaction
 
 
 async def test_resource_threshold_trigger():
-    async with AsyncSessionLocal() as session:
+    async with routed_session() as session:
         try:
             settlement_name = "Arctic Base"
             settlement_id = await get_settlement(session, settlement_name)
@@ -174,13 +174,70 @@ async def test_resource_threshold_trigger():
             await session.rollback()  # Rollback the transaction
 
 
+async def test_alert_consumer():
+    # Окно длиннее теста: свертку выполняет явный flush, а не таймер
+    consumer = AlertConsumer(window=60)
+    consumer_task = asyncio.create_task(consumer.run())
+    alert = ("warning", "Критический уровень ресурса ID: 2")
+    try:
+        await consumer.wait_listening()
+        async with routed_session() as session:
+            settlement_id = await get_settlement(session, "Arctic Base")
+            started = datetime.now()
+
+            # Three separate transactions: each one sends its own NOTIFY
+            for _ in range(3):
+                await session.execute(
+                    text(
+                        "SELECT set_config('settlement.alert_delivery', 'notify', true)"
+                    )
+                )
+                session.add(
+                    ResourceOperation(
+                        resource_id=2,
+                        settlement_id=settlement_id,
+                        quantity=-5000,
+                        operation_type="consumption",
+                    )
+                )
+                await session.commit()
+
+            await asyncio.sleep(0.5)
+            received = consumer.pending[alert]
+            await consumer.flush()
+            notification_count = await session.execute(
+                select(func.count()).where(
+                    Notification.type == alert[0],
+                    Notification.message == f"{alert[1]} (повторов: 3)",
+                    Notification.timestamp >= started,
+                )
+            )
+            count = notification_count.scalar()
+            console.print(
+                f"[bold magenta]📨 Alert Consumer:[/bold magenta] Received {received}, "
+                f"coalesced notifications written: {count}"
+            )
+            if received != 3 or count != 1:
+                raise RuntimeError(
+                    f"Ожидались 3 NOTIFY, свернутые в одно уведомление: "
+                    f"получено {received}, записано {count}"
+                )
+    except SQLAlchemyError as e:
+        console.print(f"[bold red]Error in alert consumer:[/bold red] {str(e)}")
+    finally:
+        consumer_task.cancel()
+        await asyncio.gather(consumer_task, return_exceptions=True)
+
+
 async def main():
     console.print("[bold cyan]Running Trigger Tests[/bold cyan]")
-    await test_energy_consumption_trigger()
-    await test_overdue_task_trigger()
-    await test_resource_threshold_trigger()
+    async with cache_invalidation():
+        await test_energy_consumption_trigger()
+        await test_overdue_task_sweeper()
+        await test_resource_threshold_trigger()
+        await test_alert_consumer()
     console.print("[bold cyan]All Tests Completed[/bold cyan]")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
@@ -0,0 +1,115 @@
+import time
+
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import delete, select
+
+from src.config import UPSERT_BENCH_SIZE
+from src.core.db import get_session, raw_connection, run
+from src.core.models import Resource, Settlement
+from src.core.upsert import upsert_resources, upsert_settlements
+
+PREFIX = "upsert bench"
+RESOURCES = [("Water", "Liters", "Liquid"), ("Food", "Kg", "Solid")]
+
+console = Console()
+
+
+def settlement_rows(size: int) -> list[dict]:
+    return [
+        {"name": f"{PREFIX} {i}", "region": "Bench", "climate_type": "Temperate"}
+        for i in range(size)
+    ]
+
+
+async def one_by_one(size: int) -> dict[str, int]:
+    """Прежний путь: SELECT, при отсутствии INSERT и фиксация на каждую запись."""
+    ids = {}
+    async with get_session() as session:
+        for row in settlement_rows(size):
+            settlement = (
+                await session.execute(
+                    select(Settlement).where(Settlement.name == row["name"])
+                )
+            ).scalar()
+            if settlement is None:
+                settlement = Settlement(**row)
+                session.add(settlement)
+                await session.commit()
+            ids[row["name"]] = settlement.id
+            for name, unit, kind in RESOURCES:
+                resource = (
+                    await session.execute(
+                        select(Resource.id).where(
+                            Resource.settlement_id == settlement.id,
+                            Resource.name == name,
+                        )
+                    )
+                ).scalar()
+                if resource is None:
+                    session.add(
+                        Resource(
+                            name=name,
+                            unit=unit,
+                            type=kind,
+                            settlement_id=settlement.id,
+                        )
+                    )
+                    await session.commit()
+    return ids
+
+
+async def bulk(size: int) -> dict[str, int]:
+    """Два запроса на весь объем: поселения, затем их ресурсы."""
+    async with raw_connection() as conn:
+        async with conn.transaction():
+            ids = await upsert_settlements(settlement_rows(size), conn=conn)
+            await upsert_resources(
+                [
+                    {
+                        "name": name,
+                        "unit": unit,
+                        "type": kind,
+                        "settlement_id": settlement_id,
+                    }
+                    for settlement_id in ids.values()
+                    for name, unit, kind in RESOURCES
+                ],
+                conn=conn,
+            )
+    return ids
+
+
+async def cleanup():
+    async with get_session() as session:
+        await session.execute(
+            delete(Settlement).where(Settlement.name.like(f"{PREFIX} %"))
+        )
+        await session.commit()
+
+
+async def main(size: int = UPSERT_BENCH_SIZE):
+    table = Table(title=f"Справочники: {size} поселений × {len(RESOURCES)} ресурса")
+    for column in ("Способ", "Создание, с", "Повтор (все есть), с"):
+        table.add_column(column)
+
+    await cleanup()
+    try:
+        for name, call in (("SELECT + INSERT по одной", one_by_one), ("upsert", bulk)):
+            start_time = time.perf_counter()
+            created = await call(size)
+            create_seconds = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            resolved = await call(size)
+            resolve_seconds = time.perf_counter() - start_time
+            if resolved != created:
+                raise RuntimeError(f"{name}: повторный вызов вернул другие id")
+            table.add_row(name, f"{create_seconds:.2f}", f"{resolve_seconds:.2f}")
+            await cleanup()
+    finally:
+        await cleanup()
+    console.print(table)
+
+
+if __name__ == "__main__":
+    run(main())